@@ -0,0 +1,91 @@
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from click import command, option
+
+# What example_api_versions.py does up to its first decoded response, timed from within the process
+_FIRST_REQUEST = """
+import time
+start = time.perf_counter()
+from kafka.client import SyncKafkaClient
+from kafka.datatypes import CompactString, EMPTY_TAG_BUFFER
+from kafka.messages import ApiVersionsV3ApiRequest
+imported = time.perf_counter()
+client = SyncKafkaClient({bootstrap_server!r})
+response = client.send(ApiVersionsV3ApiRequest(CompactString("benchmark"), CompactString("1.0.0"), EMPTY_TAG_BUFFER))
+assert response.error_code.val == 0
+decoded = time.perf_counter()
+client.close()
+print(imported - start, decoded - imported)
+"""
+
+
+# Answers every ApiVersions request with the same response, so that the benchmark doesn't need a broker
+def _serve_api_versions() -> str:
+    import kafka.dataclass_binding
+    from kafka.datatypes import CompactArray, Int16, Int32, EMPTY_TAG_BUFFER
+    from kafka.messages import ApiVersionsV3ApiResponse
+
+    body = kafka.dataclass_binding.serialize_data_class(ApiVersionsV3ApiResponse(
+        error_code=Int16(0),
+        api_keys=CompactArray([ApiVersionsV3ApiResponse.ApiKey(Int16(api_key), Int16(0), Int16(12), EMPTY_TAG_BUFFER)
+                               for api_key in range(70)]),
+        throttle_time_ms=Int32(0),
+        tag_buffer=EMPTY_TAG_BUFFER
+    ))
+    server = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                size = conn.recv(4, socket.MSG_WAITALL)
+                request = conn.recv(struct.unpack(">i", size)[0], socket.MSG_WAITALL)
+                # Response Header v0 => correlation_id
+                conn.sendall(struct.pack(">i", 4 + len(body)) + request[4:8] + body)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return f"127.0.0.1:{server.getsockname()[1]}"
+
+
+def _wall_time(code: str) -> tuple[float, str]:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return time.perf_counter() - start, result.stdout
+
+
+def _report(name: str, samples: list[float]):
+    print(f"{name:<28}median {statistics.median(samples) * 1000:7.1f} ms\tmin {min(samples) * 1000:7.1f} ms")
+
+
+# Time from process start to the first decoded ApiVersions response, in fresh interpreters
+@command
+@option('--bootstrap-server', help='The Kafka server to connect to, a built-in fake broker by default.')
+@option('--runs', default=20, show_default=True, help='Processes to start.')
+def benchmark_startup(bootstrap_server, runs):
+    if bootstrap_server is None:
+        bootstrap_server = _serve_api_versions()
+    code = _FIRST_REQUEST.format(bootstrap_server=bootstrap_server)
+
+    interpreter, total, imports, first_request = [], [], [], []
+    for _ in range(runs):
+        interpreter.append(_wall_time("pass")[0])
+        (wall, output) = _wall_time(code)
+        total.append(wall)
+        (imported, decoded) = output.split()
+        imports.append(float(imported))
+        first_request.append(float(decoded))
+
+    _report("interpreter startup", interpreter)
+    _report("imports", imports)
+    _report("first request & decode", first_request)
+    _report("process start to response", total)
+
+
+if __name__ == "__main__":
+    benchmark_startup()
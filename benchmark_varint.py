@@ -0,0 +1,69 @@
+import random
+import time
+
+import bitstring
+from click import command, option
+
+from kafka.serialization import read_unsigned_varint
+from kafka.varint import decode_record_run, encode_varint, encode_varlong
+
+
+# Records like a producer batches them: growing offset & timestamp deltas, small keys, values of various sizes
+def _mk_records(count: int, value_size: int) -> bytes:
+    rng = random.Random(0)
+    result = bytearray()
+    for i in range(count):
+        key = f"key-{rng.randrange(1000)}".encode()
+        value = rng.randbytes(rng.randrange(value_size // 2, value_size * 3 // 2 + 1))
+        body = b'\x00' + encode_varlong(i * 3) + encode_varint(i) + encode_varint(len(key)) + key + \
+            encode_varint(len(value)) + value + encode_varint(0)
+        result += encode_varint(len(body)) + body
+    return bytes(result)
+
+
+def _zigzag(stream: bitstring.BitStream) -> int:
+    raw = read_unsigned_varint(stream)
+    return (raw >> 1) ^ -(raw & 1)
+
+
+# The same walk through bitstring, one varint at a time, as the protocol messages are decoded
+def _decode_with_bitstring(buf: bytes, count: int):
+    stream = bitstring.BitStream(buf)
+    for _ in range(count):
+        length = _zigzag(stream)
+        end = stream.bytepos + length
+        stream.bytepos += 1  # attributes
+        for _ in range(2):  # timestamp & offset deltas, varlongs fit in 5 bytes here
+            _zigzag(stream)
+        for _ in range(2):  # key & value
+            size = _zigzag(stream)
+            stream.bytepos += max(size, 0)
+        stream.bytepos = end
+
+
+def _rate(decode, buf: bytes, count: int, seconds: float) -> float:
+    runs = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        decode(buf, count)
+        runs += 1
+    return runs * count / (time.perf_counter() - start)
+
+
+# Records per second delimited by decode_record_run, against the same walk through bitstring
+@command
+@option('--records', default=10_000, show_default=True, help='Records per run.')
+@option('--value-size', default=100, show_default=True, help='Average size of record values, in bytes.')
+@option('--seconds', default=2.0, show_default=True, help='Time to spend on each decoder.')
+def benchmark_varint(records, value_size, seconds):
+    buf = _mk_records(records, value_size)
+    run = decode_record_run(buf, records)
+    assert run.end == len(buf) and run.offset_deltas[-1] == records - 1
+
+    for name, decode in (("decode_record_run", decode_record_run), ("bitstring", _decode_with_bitstring)):
+        rate = _rate(decode, buf, records, seconds)
+        print(f"{name:<20}{rate:12,.0f} records/s\t{rate * len(buf) / records / 1024 / 1024:8.1f} MiB/s")
+
+
+if __name__ == "__main__":
+    benchmark_varint()
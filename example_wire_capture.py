@@ -0,0 +1,38 @@
+from click import UsageError, command, option
+
+from kafka.capture import WireCapture
+
+
+@command
+@option('--requests', 'requests_path', help='Raw client to broker bytes of the captured connection.')
+@option('--responses', 'responses_path', help='Raw broker to client bytes of the captured connection.')
+@option('--pcap', 'pcap_path', help='pcap file holding the captured connection, instead of --requests/--responses.')
+@option('--broker-port', default=9092, help='Port of the broker, to find the connection in the pcap file.')
+def wire_capture(requests_path, responses_path, pcap_path, broker_port):
+    if (requests_path is None) == (pcap_path is None):
+        raise UsageError("Either --requests or --pcap is required")
+    capture = WireCapture.from_pcap(pcap_path, broker_port) if pcap_path is not None \
+        else WireCapture(requests_path, responses_path)
+    with capture:
+        print(f"{len(capture)} requests")
+        print("Api\tCount\tUnanswered\tReq. p50/p95/p99/max\tRes. p50/p95/p99/max\tLatency ms p50/p95/p99/max")
+        for api in capture.summary():
+            req = api.requests
+            res = api.responses
+            lat = api.latencies
+            res_sizes = "-" if res is None else f"{res.p50}/{res.p95}/{res.p99}/{res.max}"
+            latencies = "-" if lat is None else \
+                f"{lat.p50 * 1000:.1f}/{lat.p95 * 1000:.1f}/{lat.p99 * 1000:.1f}/{lat.max * 1000:.1f}"
+            print(f"{api.api_name}\t{req.count}\t{api.unanswered}\t"
+                  f"{req.p50}/{req.p95}/{req.p99}/{req.max}\t{res_sizes}\t{latencies}")
+        if capture.requests_truncated or capture.responses_truncated:
+            print(f"Ignored incomplete trailing frames: {capture.requests_truncated} request bytes, "
+                  f"{capture.responses_truncated} response bytes")
+        if capture.requests_corrupt_at is not None:
+            print(f"Requests capture stopped at an invalid frame size at byte {capture.requests_corrupt_at}")
+        if capture.responses_corrupt_at is not None:
+            print(f"Responses capture stopped at an invalid frame size at byte {capture.responses_corrupt_at}")
+
+
+if __name__ == "__main__":
+    wire_capture()
@@ -0,0 +1,98 @@
+import threading
+from dataclasses import dataclass, replace
+
+
+# A bounded pool of reusable bytearrays, bucketed by power-of-two size classes.
+#
+# Frames are borrowed for the duration of a single encode & send, or a single receive & decode, then given back, so
+# steady traffic keeps cycling through the same handful of buffers instead of allocating fresh ones for every request
+# and response. Each size class keeps at most `max_buffers_per_class` idle buffers; anything beyond that (or larger
+# than `max_size`) is simply dropped on release and left to the garbage collector.
+
+@dataclass
+class BufferPoolStats:
+    hits: int = 0  # acquisitions served from an idle pooled buffer
+    misses: int = 0  # acquisitions that had to allocate
+    releases: int = 0  # buffers returned and kept for re-use
+    discards: int = 0  # buffers returned but dropped (bucket full, or not poolable)
+    in_use_bytes: int = 0  # bytes currently borrowed
+    pooled_bytes: int = 0  # bytes currently idle in the pool
+    peak_bytes: int = 0  # highest in_use_bytes + pooled_bytes seen so far
+
+
+class BufferPool:
+    __min_size: int
+    __max_size: int
+    __max_buffers_per_class: int
+    __buckets: dict[int, list[bytearray]]
+    __stats: BufferPoolStats
+    __lock: threading.Lock
+
+    def __init__(self, min_size: int = 256, max_size: int = 16 * 1024 * 1024, max_buffers_per_class: int = 8):
+        if min_size <= 0 or min_size & (min_size - 1) != 0:
+            raise Exception(f"min_size must be a positive power of two, got {min_size}")
+        if max_size < min_size:
+            raise Exception(f"max_size {max_size} is smaller than min_size {min_size}")
+        self.__min_size = min_size
+        self.__max_size = max_size
+        self.__max_buffers_per_class = max_buffers_per_class
+        self.__buckets = {}
+        self.__stats = BufferPoolStats()
+        self.__lock = threading.Lock()
+
+    # Returns the size of the bucket serving `size` bytes, None when the request is too large to be pooled
+    def size_class(self, size: int) -> None | int:
+        if size > self.__max_size:
+            return None
+        return max(self.__min_size, 1 << (size - 1).bit_length())
+
+    # Borrows a buffer of at least `size` bytes. Its content is whatever the previous borrower left there, and it is
+    # usually longer than asked for, so callers must track the number of meaningful bytes themselves.
+    def acquire(self, size: int) -> bytearray:
+        size_class = self.size_class(size)
+        with self.__lock:
+            bucket = self.__buckets.get(size_class) if size_class is not None else None
+            if bucket:
+                buf = bucket.pop()
+                self.__stats.hits += 1
+                self.__stats.pooled_bytes -= len(buf)
+            else:
+                buf = None
+                self.__stats.misses += 1
+            allocated = size_class if size_class is not None else size
+            self.__stats.in_use_bytes += allocated
+            self.__stats.peak_bytes = max(self.__stats.peak_bytes,
+                                          self.__stats.in_use_bytes + self.__stats.pooled_bytes)
+        # allocate outside the lock, zero-filling a large buffer isn't free
+        return buf if buf is not None else bytearray(allocated)
+
+    # Gives a buffer obtained from `acquire` back to the pool. The caller must not touch it afterwards.
+    def release(self, buf: bytearray):
+        with self.__lock:
+            self.__stats.in_use_bytes -= len(buf)
+            size_class = self.size_class(len(buf))
+            if size_class != len(buf):
+                self.__stats.discards += 1
+                return
+            bucket = self.__buckets.setdefault(size_class, [])
+            if len(bucket) >= self.__max_buffers_per_class:
+                self.__stats.discards += 1
+                return
+            bucket.append(buf)
+            self.__stats.releases += 1
+            self.__stats.pooled_bytes += len(buf)
+
+    # Drops every idle buffer, leaving borrowed ones alone
+    def clear(self):
+        with self.__lock:
+            self.__buckets.clear()
+            self.__stats.pooled_bytes = 0
+
+    # A snapshot of the usage counters
+    def stats(self) -> BufferPoolStats:
+        with self.__lock:
+            return replace(self.__stats)
+
+
+# Shared by clients that aren't given a pool of their own
+DEFAULT_BUFFER_POOL = BufferPool()
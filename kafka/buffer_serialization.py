@@ -0,0 +1,184 @@
+import struct
+from typing import Callable, List, TypeVar
+from uuid import UUID
+
+from kafka.varint import read_unsigned_varint
+
+T = TypeVar("T")
+
+_BOOLEAN = struct.Struct(">?")
+_INT8 = struct.Struct(">b")
+_INT16 = struct.Struct(">h")
+_INT32 = struct.Struct(">i")
+_INT64 = struct.Struct(">q")
+_UUID_SIZE = 16
+
+# The Kafka protocol primitives of kafka.serialization, read from and written to a buffer at an offset instead of a
+# bitstring stream, so that frames are decoded straight out of the buffer they were received into and encoded straight
+# into the buffer they're sent from, without copying them into a stream first.
+#
+# Readers take a buffer (bytes, bytearray, memoryview) and the offset to start from, and return the value along with
+# the offset following it. Writers take the value, a writable buffer large enough for it and the offset to write at,
+# and return the offset following what they wrote.
+
+
+def read_boolean(buf, offset: int) -> tuple[bool, int]: return buf[offset] != 0, offset + 1
+
+
+def write_boolean(val: bool, buf, offset: int) -> int:
+    buf[offset] = 1 if val else 0
+    return offset + 1
+
+
+def read_int_8(buf, offset: int) -> tuple[int, int]: return _INT8.unpack_from(buf, offset)[0], offset + 1
+
+
+def write_int_8(val: int, buf, offset: int) -> int:
+    _INT8.pack_into(buf, offset, val)
+    return offset + 1
+
+
+def read_int_16(buf, offset: int) -> tuple[int, int]: return _INT16.unpack_from(buf, offset)[0], offset + 2
+
+
+def write_int_16(val: int, buf, offset: int) -> int:
+    _INT16.pack_into(buf, offset, val)
+    return offset + 2
+
+
+def read_int_32(buf, offset: int) -> tuple[int, int]: return _INT32.unpack_from(buf, offset)[0], offset + 4
+
+
+def write_int_32(val: int, buf, offset: int) -> int:
+    _INT32.pack_into(buf, offset, val)
+    return offset + 4
+
+
+def read_int_64(buf, offset: int) -> tuple[int, int]: return _INT64.unpack_from(buf, offset)[0], offset + 8
+
+
+def write_int_64(val: int, buf, offset: int) -> int:
+    _INT64.pack_into(buf, offset, val)
+    return offset + 8
+
+
+def write_unsigned_varint(val: int, buf, offset: int) -> int:
+    val &= 0xFFFFFFFF
+    while val > 0x7F:
+        buf[offset] = val & 0x7F | 0x80
+        val >>= 7
+        offset += 1
+    buf[offset] = val
+    return offset + 1
+
+
+def _write_raw(val: bytes, buf, offset: int) -> int:
+    end = offset + len(val)
+    buf[offset:end] = val
+    return end
+
+
+def read_nullable_string(buf, offset: int) -> tuple[None | str, int]:
+    (length, offset) = read_int_16(buf, offset)
+    if length == -1:
+        return None, offset
+    return str(buf[offset:offset + length], "UTF-8"), offset + length
+
+
+def write_nullable_string(val: None | str, buf, offset: int) -> int:
+    if val is None:
+        return write_int_16(-1, buf, offset)
+    string_bytes = bytes(val, "UTF-8")
+    return _write_raw(string_bytes, buf, write_int_16(len(string_bytes), buf, offset))
+
+
+def read_compact_string(buf, offset: int) -> tuple[str, int]:
+    (length, offset) = read_unsigned_varint(buf, offset)
+    end = offset + length - 1
+    return str(buf[offset:end], "UTF-8"), end
+
+
+def write_compact_string(val: str, buf, offset: int) -> int:
+    string_bytes = bytes(val, "UTF-8")
+    return _write_raw(string_bytes, buf, write_unsigned_varint(len(string_bytes) + 1, buf, offset))
+
+
+def read_compact_nullable_string(buf, offset: int) -> tuple[None | str, int]:
+    if buf[offset] == 0:
+        return None, offset + 1
+    return read_compact_string(buf, offset)
+
+
+def write_compact_nullable_string(val: None | str, buf, offset: int) -> int:
+    return write_unsigned_varint(0, buf, offset) if val is None else write_compact_string(val, buf, offset)
+
+
+def read_compact_bytes(buf, offset: int) -> tuple[bytes, int]:
+    (length, offset) = read_unsigned_varint(buf, offset)
+    end = offset + length - 1
+    return bytes(buf[offset:end]), end
+
+
+def write_compact_bytes(val: bytes, buf, offset: int) -> int:
+    return _write_raw(val, buf, write_unsigned_varint(len(val) + 1, buf, offset))
+
+
+# COMPACT_RECORDS are encoded the same way
+def read_compact_nullable_bytes(buf, offset: int) -> tuple[None | bytes, int]:
+    if buf[offset] == 0:
+        return None, offset + 1
+    return read_compact_bytes(buf, offset)
+
+
+def write_compact_nullable_bytes(val: None | bytes, buf, offset: int) -> int:
+    return write_unsigned_varint(0, buf, offset) if val is None else write_compact_bytes(val, buf, offset)
+
+
+def compact_array_reader(
+        item_reader: Callable[[any, int], tuple[T, int]]
+) -> Callable[[any, int], tuple[List[T], int]]:
+    def read_compact_array(buf, offset: int) -> tuple[List[T], int]:
+        (length, offset) = read_unsigned_varint(buf, offset)
+        result = []
+        for _ in range(length - 1):
+            (item, offset) = item_reader(buf, offset)
+            result.append(item)
+        return result, offset
+
+    return read_compact_array
+
+
+def compact_array_writer(
+        item_writer: Callable[[T, any, int], int]
+) -> Callable[[None | List[T], any, int], int]:
+    def write_compact_array(arr: None | List[T], buf, offset: int) -> int:
+        if arr is None:
+            return write_unsigned_varint(0, buf, offset)
+        offset = write_unsigned_varint(len(arr) + 1, buf, offset)
+        for item in arr:
+            offset = item_writer(item, buf, offset)
+        return offset
+
+    return write_compact_array
+
+
+# The raw buffer is returned, see kafka.serialization.read_tag_buffer
+def read_tag_buffer(buf, offset: int) -> tuple[bytes, int]:
+    start = offset
+    (count, offset) = read_unsigned_varint(buf, offset)
+    for _ in range(count):
+        (_, offset) = read_unsigned_varint(buf, offset)  # tag
+        (size, offset) = read_unsigned_varint(buf, offset)
+        offset += size
+    return bytes(buf[start:offset]), offset
+
+
+def write_tag_buffer(val: bytes, buf, offset: int) -> int: return _write_raw(val, buf, offset)
+
+
+def read_uuid(buf, offset: int) -> tuple[UUID, int]:
+    end = offset + _UUID_SIZE
+    return UUID(bytes=bytes(buf[offset:end])), end
+
+
+def write_uuid(val: UUID, buf, offset: int) -> int: return _write_raw(val.bytes, buf, offset)
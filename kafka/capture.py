@@ -0,0 +1,369 @@
+import mmap
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import BinaryIO
+
+import bitstring
+
+import kafka.api_keys
+import kafka.dataclass_binding
+import kafka.messages
+import kafka.pcap
+from kafka.pcap import TcpStream
+
+_SIZE = struct.Struct(">i")
+_REQUEST_HEADER = struct.Struct(">hhih")  # request_api_key request_api_version correlation_id len(client_id)
+_CORRELATION_ID = struct.Struct(">i")
+
+NO_RESPONSE = -1
+
+
+# Offline analysis of captured Kafka traffic.
+#
+# A capture is the raw bytes of one client<->broker TCP connection, one file per direction, as saved by Wireshark's
+# "Follow TCP Stream" with "Show data as: Raw". Both files are memory-mapped and indexed in one pass which reads only
+# the size prefix of every frame and the fixed part of request headers, so indexing runs at roughly disk speed and
+# the index itself is a few flat arrays. Request and response bodies are only decoded when asked for.
+#
+# A capture can also be read out of a pcap file (see kafka.pcap), whose packet timestamps give the time every request
+# was sent and every response received, hence per-API latencies.
+
+@dataclass
+class CapturedRequest:
+    index: int
+    offset: int  # of the frame's size prefix, in the requests capture
+    size: int  # of the frame, excluding the size prefix
+    api_key: int
+    api_version: int
+    correlation_id: int
+    client_id: None | str
+    timestamp: None | float  # of the packet carrying the end of the frame, None without packet timestamps
+
+
+@dataclass
+class CapturedResponse:
+    index: int
+    offset: int  # of the frame's size prefix, in the responses capture
+    size: int  # of the frame, excluding the size prefix
+    correlation_id: int
+    timestamp: None | float  # of the packet carrying the end of the frame, None without packet timestamps
+
+
+@dataclass
+class SizeDistribution:
+    count: int
+    min: int
+    p50: int
+    p95: int
+    p99: int
+    max: int
+    total: int
+
+
+# In seconds, from the end of a request to the end of its response
+@dataclass
+class LatencyDistribution:
+    count: int
+    min: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+@dataclass
+class ApiSummary:
+    api_key: int
+    api_name: str
+    requests: SizeDistribution
+    responses: None | SizeDistribution  # None when none of the requests were answered
+    unanswered: int
+    latencies: None | LatencyDistribution  # None without packet timestamps or when none of the requests were answered
+
+
+class WireCapture:
+    __files: list[BinaryIO]
+    __requests: mmap.mmap | bytes | bytearray
+    __responses: mmap.mmap | bytes | bytearray
+    # requests index, one entry per frame
+    __request_offsets: array
+    __request_sizes: array
+    __api_keys: array
+    __api_versions: array
+    __correlation_ids: array
+    __request_timestamps: None | array
+    __response_indexes: array  # of the matching response, NO_RESPONSE for unanswered requests
+    # responses index, one entry per frame
+    __response_offsets: array
+    __response_sizes: array
+    __response_correlation_ids: array
+    __response_timestamps: None | array
+    __by_api_key: dict[int, array]
+    # request indexes ordered by correlation id, sorted on the first lookup by correlation id rather than kept in a
+    # dict by id while indexing: ids being mostly distinct, that would cost an array per request
+    __by_correlation_id: None | array
+    requests_truncated: int  # trailing bytes of an incomplete request frame at the end of the capture
+    responses_truncated: int  # trailing bytes of an incomplete response frame at the end of the capture
+    # offset of a size prefix too small to hold a frame (e.g. a capture starting mid-frame), where indexing stopped
+    requests_corrupt_at: None | int
+    responses_corrupt_at: None | int
+
+    def __init__(self, requests_path: str, responses_path: None | str = None):
+        self.__files = []
+        self.__requests = self.__map(requests_path)
+        self.__responses = self.__map(responses_path) if responses_path is not None else b''
+        self.__index(None, None)
+
+    # Reads the first connection to the broker port out of a pcap file
+    @classmethod
+    def from_pcap(cls, path: str, broker_port: int = 9092) -> "WireCapture":
+        (requests, responses) = kafka.pcap.read_tcp_connection(path, broker_port)
+        capture = cls.__new__(cls)
+        capture.__files = []
+        capture.__requests = requests.data
+        capture.__responses = responses.data
+        capture.__index(requests, responses)
+        return capture
+
+    def __index(self, requests: None | TcpStream, responses: None | TcpStream):
+        self.__by_correlation_id = None
+        self.__index_requests(requests)
+        self.__index_responses(responses)
+        self.__pair()
+
+    def __map(self, path: str) -> mmap.mmap | bytes:
+        f = open(path, "rb")
+        self.__files.append(f)
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty files can't be mapped
+            return b''
+
+    def __index_requests(self, stream: None | TcpStream):
+        self.__request_offsets = array("q")
+        self.__request_sizes = array("l")
+        self.__api_keys = array("h")
+        self.__api_versions = array("h")
+        self.__correlation_ids = array("l")
+        self.__request_timestamps = None if stream is None else array("d")
+        self.__by_api_key = {}
+
+        buf = self.__requests
+        end = len(buf)
+        offset = 0
+        index = 0
+        self.requests_corrupt_at = None
+        while offset + _SIZE.size + _REQUEST_HEADER.size <= end:
+            (size,) = _SIZE.unpack_from(buf, offset)
+            if size < _REQUEST_HEADER.size:
+                self.requests_corrupt_at = offset
+                break
+            if offset + _SIZE.size + size > end:
+                break
+            api_key, api_version, correlation_id, _ = _REQUEST_HEADER.unpack_from(buf, offset + _SIZE.size)
+            self.__request_offsets.append(offset)
+            self.__request_sizes.append(size)
+            self.__api_keys.append(api_key)
+            self.__api_versions.append(api_version)
+            self.__correlation_ids.append(correlation_id)
+            self.__by_api_key.setdefault(api_key, array("l")).append(index)
+            offset += _SIZE.size + size
+            if stream is not None:
+                self.__request_timestamps.append(stream.timestamp_at(offset - 1))
+            index += 1
+        self.requests_truncated = end - offset
+
+    def __index_responses(self, stream: None | TcpStream):
+        self.__response_offsets = array("q")
+        self.__response_sizes = array("l")
+        self.__response_correlation_ids = array("l")
+        self.__response_timestamps = None if stream is None else array("d")
+
+        buf = self.__responses
+        end = len(buf)
+        offset = 0
+        self.responses_corrupt_at = None
+        while offset + _SIZE.size + _CORRELATION_ID.size <= end:
+            (size,) = _SIZE.unpack_from(buf, offset)
+            if size < _CORRELATION_ID.size:
+                self.responses_corrupt_at = offset
+                break
+            if offset + _SIZE.size + size > end:
+                break
+            (correlation_id,) = _CORRELATION_ID.unpack_from(buf, offset + _SIZE.size)
+            self.__response_offsets.append(offset)
+            self.__response_sizes.append(size)
+            self.__response_correlation_ids.append(correlation_id)
+            offset += _SIZE.size + size
+            if stream is not None:
+                self.__response_timestamps.append(stream.timestamp_at(offset - 1))
+        self.responses_truncated = end - offset
+
+    # A broker answers the requests of a connection in the order they were sent, so walking both directions together
+    # pairs them even when correlation ids are re-used. Requests that are never answered (e.g. Produce with acks=0)
+    # are the ones whose correlation id doesn't match the next response.
+    def __pair(self):
+        self.__response_indexes = array("l", [NO_RESPONSE]) * len(self.__request_offsets)
+        response_count = len(self.__response_offsets)
+        response_index = 0
+        for index, correlation_id in enumerate(self.__correlation_ids):
+            if response_index >= response_count:
+                break
+            if self.__response_correlation_ids[response_index] == correlation_id:
+                self.__response_indexes[index] = response_index
+                response_index += 1
+
+    def __len__(self) -> int: return len(self.__request_offsets)
+
+    def request(self, index: int) -> CapturedRequest:
+        offset = self.__request_offsets[index]
+        header_offset = offset + _SIZE.size
+        api_key, api_version, correlation_id, client_id_length = \
+            _REQUEST_HEADER.unpack_from(self.__requests, header_offset)
+        client_id_offset = header_offset + _REQUEST_HEADER.size
+        client_id = None if client_id_length == -1 \
+            else str(self.__requests[client_id_offset:client_id_offset + client_id_length], "UTF-8")
+        return CapturedRequest(index, offset, self.__request_sizes[index], api_key, api_version, correlation_id,
+                               client_id, _timestamp(self.__request_timestamps, index))
+
+    def response(self, index: int) -> None | CapturedResponse:
+        response_index = self.__response_indexes[index]
+        if response_index == NO_RESPONSE:
+            return None
+        return CapturedResponse(response_index, self.__response_offsets[response_index],
+                                self.__response_sizes[response_index],
+                                self.__response_correlation_ids[response_index],
+                                _timestamp(self.__response_timestamps, response_index))
+
+    # Seconds from the end of a request to the end of its response, None without packet timestamps or when the
+    # request wasn't answered
+    def latency(self, index: int) -> None | float:
+        response_index = self.__response_indexes[index]
+        if self.__request_timestamps is None or response_index == NO_RESPONSE:
+            return None
+        return self.__response_timestamps[response_index] - self.__request_timestamps[index]
+
+    # Indexes of the requests with the given api key, and version if given, in capture order
+    def find_by_api_key(self, api_key: int, api_version: None | int = None) -> list[int]:
+        indexes = self.__by_api_key.get(api_key, ())
+        if api_version is None:
+            return list(indexes)
+        return [index for index in indexes if self.__api_versions[index] == api_version]
+
+    # Indexes of the requests with the given correlation id, in capture order
+    def find_by_correlation_id(self, correlation_id: int) -> list[int]:
+        correlation_ids = self.__correlation_ids
+        if self.__by_correlation_id is None:
+            # sorting is stable, requests with the same id stay in capture order
+            self.__by_correlation_id = array("l", sorted(range(len(correlation_ids)), key=correlation_ids.__getitem__))
+        start = bisect_left(self.__by_correlation_id, correlation_id, key=correlation_ids.__getitem__)
+        end = bisect_right(self.__by_correlation_id, correlation_id, lo=start, key=correlation_ids.__getitem__)
+        return list(self.__by_correlation_id[start:end])
+
+    def __frame(self, buf, offset: int, size: int) -> bitstring.BitStream:
+        start = offset + _SIZE.size
+        return bitstring.BitStream(bytes=buf[start:start + size])
+
+    def __request_type(self, index: int):
+        api_key = self.__api_keys[index]
+        api_version = self.__api_versions[index]
+        request_type = kafka.messages.find_request_type(api_key, api_version)
+        if request_type is None:
+            raise Exception(f"No decoder for {kafka.api_keys.get_name(api_key)} v{api_version}")
+        return request_type
+
+    # Fully decodes the header and the body of a request
+    def decode_request(self, index: int) -> tuple[kafka.messages.RequestHeaderV2, kafka.messages.KafkaApiRequest]:
+        request_type = self.__request_type(index)
+        stream = self.__frame(self.__requests, self.__request_offsets[index], self.__request_sizes[index])
+        header = kafka.dataclass_binding.dataclass_deserializer(kafka.messages.RequestHeaderV2)(stream)
+        return header, kafka.dataclass_binding.dataclass_deserializer(request_type)(stream)
+
+    # Fully decodes the body of the response to a request, None when the request wasn't answered
+    def decode_response(self, index: int):
+        response_index = self.__response_indexes[index]
+        if response_index == NO_RESPONSE:
+            return None
+        request_type = self.__request_type(index)
+        request = request_type.__new__(request_type)
+        stream = self.__frame(self.__responses, self.__response_offsets[response_index],
+                              self.__response_sizes[response_index])
+        header_type = kafka.messages.ResponseHeaderV0 if request.response_header_version() == 0 \
+            else kafka.messages.ResponseHeaderV1
+        kafka.dataclass_binding.dataclass_deserializer(header_type)(stream)
+        return kafka.dataclass_binding.dataclass_deserializer(request.response_type())(stream)
+
+    # Request & response size distributions per api, and latency distributions when timestamps are known, ordered by
+    # api key
+    def summary(self) -> list[ApiSummary]:
+        result = []
+        for api_key in sorted(self.__by_api_key):
+            indexes = self.__by_api_key[api_key]
+            request_sizes = [self.__request_sizes[index] for index in indexes]
+            response_sizes = [self.__response_sizes[self.__response_indexes[index]] for index in indexes
+                              if self.__response_indexes[index] != NO_RESPONSE]
+            latencies = [] if self.__request_timestamps is None else \
+                [self.latency(index) for index in indexes if self.__response_indexes[index] != NO_RESPONSE]
+            result.append(ApiSummary(
+                api_key=api_key,
+                api_name=_api_name(api_key),
+                requests=_distribution(request_sizes),
+                responses=_distribution(response_sizes) if response_sizes else None,
+                unanswered=len(request_sizes) - len(response_sizes),
+                latencies=_latency_distribution(latencies) if latencies else None
+            ))
+        return result
+
+    def close(self):
+        for buf in (self.__requests, self.__responses):
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+        for f in self.__files:
+            f.close()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *_): self.close()
+
+
+def _api_name(api_key: int) -> str:
+    try:
+        return kafka.api_keys.get_name(api_key)
+    except Exception:
+        return f"Unknown({api_key})"
+
+
+def _timestamp(timestamps: None | array, index: int) -> None | float:
+    return None if timestamps is None else timestamps[index]
+
+
+# Nearest-rank percentile of sorted values
+def _percentile(ordered: list, p: int):
+    return ordered[max(0, -(-p * len(ordered) // 100) - 1)]
+
+
+def _distribution(sizes: list[int]) -> SizeDistribution:
+    ordered = sorted(sizes)
+    return SizeDistribution(
+        count=len(ordered),
+        min=ordered[0],
+        p50=_percentile(ordered, 50),
+        p95=_percentile(ordered, 95),
+        p99=_percentile(ordered, 99),
+        max=ordered[-1],
+        total=sum(ordered)
+    )
+
+
+def _latency_distribution(latencies: list[float]) -> LatencyDistribution:
+    ordered = sorted(latencies)
+    return LatencyDistribution(
+        count=len(ordered),
+        min=ordered[0],
+        p50=_percentile(ordered, 50),
+        p95=_percentile(ordered, 95),
+        p99=_percentile(ordered, 99),
+        max=ordered[-1]
+    )
@@ -1,64 +1,254 @@
+import errno
+import os
 import socket
+import struct
+import time
 from typing import TypeVar
 
-import bitstring
-
-import kafka.serialization
 import kafka.messages
 import kafka.dataclass_binding
+from kafka.buffer_pool import BufferPool, DEFAULT_BUFFER_POOL
 
 T = TypeVar("T")
 
+_SIZE = struct.Struct(">i")
+_CORRELATION_ID = struct.Struct(">i")
+
 
 # Implementation for sending/receiving messages to/from a single Kafka broker synchronously.
+#
+# With wait_for_connect=False the connection is only initiated: the socket becomes writable once it's established or
+# has failed, which finish_connect() then tells. That's for callers multiplexing several connections with select(),
+# which can't afford to block on a broker that doesn't answer.
 class SyncKafkaClient:
     __sock: socket
+    __buffer_pool: BufferPool
+    __size_buf: bytearray
+    __frame: None | bytearray  # response frame being received, borrowed from the pool
+    __frame_size: int
+    __received: int  # bytes of the frame size, then of the frame itself, received so far
+    __correlation_id: int
 
-    def __init__(self, bootstrap_server: str):
+    def __init__(self,
+                 bootstrap_server: str,
+                 buffer_pool: BufferPool = DEFAULT_BUFFER_POOL,
+                 connect_timeout: None | float = None,
+                 wait_for_connect: bool = True):
         servers = bootstrap_server.split(",")
         assert len(servers) == 1  # A client can connect to multiple bootstrap-server, we're supporting 1 only
         (host, port) = servers[0].split(":")
         self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.__sock.connect((host, int(port)))
+        if wait_for_connect:
+            self.__sock.settimeout(connect_timeout)
+            self.__sock.connect((host, int(port)))
+        else:
+            self.__sock.setblocking(False)
+            error = self.__sock.connect_ex((host, int(port)))
+            if error not in (0, errno.EINPROGRESS):
+                self.__sock.close()
+                raise OSError(error, os.strerror(error))
+        self.__buffer_pool = buffer_pool
+        self.__size_buf = bytearray(_SIZE.size)
+        self.__frame = None
+        self.__frame_size = 0
+        self.__received = 0
+        self.__correlation_id = 0
 
     # All requests and responses originate from the following grammar which will be incrementally describe through the
     # rest of this document:
     #
     # RequestOrResponse => Size (RequestMessage | ResponseMessage)
     #   Size => int32
-    @staticmethod
-    def __mk_msg(header, request) -> bytes:
-        serialized_header = kafka.dataclass_binding.serialize_data_class(header)
-        serialized_request = kafka.dataclass_binding.serialize_data_class(request)
-        size = len(serialized_header) + len(serialized_request)
+    #
+    # The frame size is computed up front, so the frame is encoded straight into a right-sized buffer borrowed from the
+    # pool, which the caller must release once it's sent. Returns the buffer along with the length of the frame in it.
+    def __mk_msg(self, header, request) -> tuple[bytearray, int]:
+        size = kafka.dataclass_binding.data_class_size(header) + kafka.dataclass_binding.data_class_size(request)
+        frame_size = _SIZE.size + size
+        buf = self.__buffer_pool.acquire(frame_size)
+        try:
+            _SIZE.pack_into(buf, 0, size)
+            offset = kafka.dataclass_binding.write_data_class_into(header, buf, _SIZE.size)
+            offset = kafka.dataclass_binding.write_data_class_into(request, buf, offset)
+            if offset != frame_size:
+                raise Exception(f"Encoded {offset} bytes for a frame of computed size {frame_size}")
+        except BaseException:
+            self.__buffer_pool.release(buf)
+            raise
+        return buf, frame_size
 
-        stream = bitstring.BitStream()
-        kafka.serialization.write_int_32(size, stream)
-        stream.append(serialized_header)
-        stream.append(serialized_request)
-        return stream.tobytes()
+    # Makes one recv() towards the response frame being received, returns the frame once complete, in a buffer borrowed
+    # from the pool which the caller must release, along with the length of the frame in it. The frame is kept across
+    # calls, so a timeout or a non-blocking socket running dry in the middle of a frame loses nothing: reading resumes
+    # where it stopped on the next call.
+    def __recv_frame_part(self) -> None | tuple[bytearray, int]:
+        if self.__frame is None:
+            with memoryview(self.__size_buf) as view:
+                n = self.__sock.recv_into(view[self.__received:])
+            if n == 0:
+                raise ConnectionError(f"Connection closed by broker after {self.__received} of {_SIZE.size} bytes")
+            self.__received += n
+            if self.__received < _SIZE.size:
+                return None
+            (self.__frame_size,) = _SIZE.unpack(self.__size_buf)
+            self.__frame = self.__buffer_pool.acquire(self.__frame_size)
+            self.__received = 0
+        if self.__received < self.__frame_size:
+            with memoryview(self.__frame) as view:
+                n = self.__sock.recv_into(view[self.__received:self.__frame_size])
+            if n == 0:
+                raise ConnectionError(
+                    f"Connection closed by broker after {self.__received} of {self.__frame_size} bytes")
+            self.__received += n
+            if self.__received < self.__frame_size:
+                return None
+        frame = self.__frame
+        self.__frame = None
+        self.__received = 0
+        return frame, self.__frame_size
 
+    # Returns the offset following the header
     @staticmethod
-    def __read_response_header_v0(stream: bitstring.BitStream) -> kafka.messages.ResponseHeaderV0:
-        return kafka.dataclass_binding.dataclass_deserializer(kafka.messages.ResponseHeaderV0)(stream)
+    def __skip_response_header(request: kafka.messages.KafkaApiRequest, buf) -> int:
+        header_type = kafka.messages.ResponseHeaderV0 if request.response_header_version() == 0 \
+            else kafka.messages.ResponseHeaderV1
+        return kafka.dataclass_binding.dataclass_buffer_deserializer(header_type)(buf, 0)[1]
 
-    def send(self, request: kafka.messages.KafkaApiRequest[T]) -> T:
-        msg = self.__mk_msg(
-            kafka.messages.mk_request_header_v2(request, 1, 'python-protocol-impl'),
+    # Sends a request without waiting for its response, returns the correlation id to read the response with
+    def write_request(self, request: kafka.messages.KafkaApiRequest, deadline: None | float = None) -> int:
+        timeout = _remaining(deadline)
+        correlation_id = self.__correlation_id
+        self.__correlation_id = (correlation_id + 1) & 0x7FFFFFFF
+        msg, msg_size = self.__mk_msg(
+            kafka.messages.mk_request_header_v2(request, correlation_id, 'python-protocol-impl'),
             request
         )
+        try:
+            self.__sock.settimeout(timeout)
+            with memoryview(msg) as view:
+                self.__sock.sendall(view[:msg_size])
+        except TimeoutError:
+            # the broker may have received part of the frame
+            self.close()
+            raise TimeoutError("Deadline exceeded while sending a request, connection closed")
+        finally:
+            self.__buffer_pool.release(msg)
+        # the first time a response type is met, its deserializer is compiled while the broker works on the request
+        kafka.dataclass_binding.dataclass_buffer_deserializer(request.response_type())
+        return correlation_id
+
+    # Receives a response frame into a buffer borrowed from the pool, which the caller must release. Returns the buffer
+    # along with the length of the frame in it. Past the deadline (a time.monotonic() value) TimeoutError is raised.
+    def __receive_frame(self, deadline: None | float) -> tuple[bytearray, int]:
+        while True:
+            self.__sock.settimeout(_remaining(deadline))
+            frame = self.__recv_frame_part()
+            if frame is not None:
+                return frame
+
+    # Responses to requests whose caller gave up on them (deadline exceeded, hedged elsewhere) are still on their way;
+    # they are recognized by their correlation id and discarded
+    def __receive_response(self, correlation_id: int, deadline: None | float) -> tuple[bytearray, int]:
+        while True:
+            received, response_size = self.__receive_frame(deadline)
+            if _CORRELATION_ID.unpack_from(received)[0] == correlation_id:
+                return received, response_size
+            self.__buffer_pool.release(received)
+
+    # Decodes straight out of the pooled buffer, which is released afterwards
+    def __decode_response(self, request: kafka.messages.KafkaApiRequest[T], received: bytearray, size: int) -> T:
+        response_deserializer = kafka.dataclass_binding.dataclass_buffer_deserializer(request.response_type())
+        try:
+            with memoryview(received) as view:
+                frame = view[:size]
+                try:
+                    (response, _) = response_deserializer(frame, self.__skip_response_header(request, frame))
+                finally:
+                    frame.release()
+            return response
+        finally:
+            self.__buffer_pool.release(received)
+
+    # Waits for the response to a request sent with write_request
+    def read_response(self,
+                      request: kafka.messages.KafkaApiRequest[T],
+                      correlation_id: int,
+                      deadline: None | float = None) -> T:
+        received, response_size = self.__receive_response(correlation_id, deadline)
+        return self.__decode_response(request, received, response_size)
+
+    # Decodes the responses to `requests` (by correlation id) that already arrived, without waiting for more. Meant to
+    # be called once select() tells the socket is readable, so that waiting on several connections doesn't block on one
+    # that only sent part of a frame: that part is kept for the next call. Late responses to other requests are
+    # discarded.
+    def poll_responses(self, requests: dict[int, kafka.messages.KafkaApiRequest]) -> dict[int, object]:
+        responses = {}
+        self.__sock.settimeout(0.0)
+        while True:
+            try:
+                frame = self.__recv_frame_part()
+            except BlockingIOError:
+                return responses
+            if frame is None:
+                continue
+            received, response_size = frame
+            (correlation_id,) = _CORRELATION_ID.unpack_from(received)
+            request = requests.get(correlation_id)
+            if request is None:
+                self.__buffer_pool.release(received)
+            else:
+                responses[correlation_id] = self.__decode_response(request, received, response_size)
+
+    # Sends a request and waits for its response. With a timeout (in seconds), TimeoutError is raised when the
+    # response doesn't arrive in time.
+    def send(self, request: kafka.messages.KafkaApiRequest[T], timeout: None | float = None) -> T:
+        deadline = _deadline(timeout)
+        correlation_id = self.write_request(request, deadline)
+        return self.read_response(request, correlation_id, deadline)
+
+    # Like send, but returns the raw bytes of the response body instead of decoding them, for callers that parse or
+    # store responses themselves (e.g. kafka.metadata_snapshot)
+    def send_raw(self, request: kafka.messages.KafkaApiRequest, timeout: None | float = None) -> bytes:
+        deadline = _deadline(timeout)
+        correlation_id = self.write_request(request, deadline)
+
+        received, response_size = self.__receive_response(correlation_id, deadline)
+        try:
+            with memoryview(received) as view:
+                frame = view[:response_size]
+                try:
+                    return bytes(frame[self.__skip_response_header(request, frame):])
+                finally:
+                    frame.release()
+        finally:
+            self.__buffer_pool.release(received)
+
+    # Raises OSError when a connection initiated without waiting for it failed
+    def finish_connect(self):
+        error = self.__sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if error != 0:
+            raise OSError(error, os.strerror(error))
+
+    def fileno(self) -> int: return self.__sock.fileno()
+
+    def is_closed(self) -> bool: return self.__sock.fileno() == -1
 
-        self.__sock.sendall(msg)
+    def close(self):
+        self.__sock.close()
+        if self.__frame is not None:
+            self.__buffer_pool.release(self.__frame)
+            self.__frame = None
 
-        response_deserializer = kafka.dataclass_binding.dataclass_deserializer(request.response_type())
 
-        response_size = kafka.serialization.read_int_32(bitstring.BitStream(self.__sock.recv(4)))
-        print(response_size)
-        received = self.__sock.recv(response_size)
-        print(len(received))
-        response = bitstring.BitStream(received)
+def _deadline(timeout: None | float) -> None | float:
+    return None if timeout is None else time.monotonic() + timeout
 
-        self.__read_response_header_v0(response)
-        return response_deserializer(response)
 
-    def close(self): self.__sock.close()
+# Socket timeout left until a deadline, None meaning no timeout
+def _remaining(deadline: None | float) -> None | float:
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Deadline exceeded")
+    return remaining
@@ -1,54 +1,108 @@
-from typing import Callable, Type, TypeVar
-
-import bitstring
+from typing import TYPE_CHECKING, Callable, Type, TypeVar
 
 import kafka.datatypes
-from kafka.serialization import read_boolean, read_int_16, read_int_32, read_nullable_string, read_compact_string, \
-    read_compact_nullable_string, compact_array_reader, read_uuid, read_tag_buffer
+from kafka.serialization import read_boolean, read_int_8, read_int_16, read_int_32, read_int_64, read_nullable_string, \
+    read_compact_string, read_compact_nullable_string, read_compact_bytes, read_compact_nullable_bytes, \
+    compact_array_reader, read_uuid, read_tag_buffer
+import kafka.buffer_serialization
 import util.inspection
 
+if TYPE_CHECKING:
+    import bitstring
+
 T = TypeVar("T")
 
 
 # For serializing and deserializing data classes that use kafka.datatypes module as building blocks
 
+# bitstring is imported on first use only: clients encode and decode with kafka.buffer_serialization, and importing it
+# would take a good part of their startup time
 def serialize_data_class(msg) -> bytes:
+    import bitstring
     stream = bitstring.BitStream()
+    write_data_class(msg, stream)
+    return stream.tobytes()
+
+
+def write_data_class(msg, stream: "bitstring.BitStream"):
     for attr in util.inspection.get_data_class_attributes(msg):
         msg.__getattribute__(attr).serialize(stream)
-    return stream.tobytes()
 
 
-def dataclass_deserializer(_type: Type[T]) -> Callable[[bitstring.BitStream], T]:
-    def deserialize_data_class(stream: bitstring.BitStream) -> T:
+# Exact number of bytes serialize_data_class would produce for `msg`, computed without serializing
+def data_class_size(msg) -> int:
+    return sum(msg.__getattribute__(attr).size() for attr in util.inspection.get_data_class_attributes(msg))
+
+
+# Items of a CompactArray are either kafka.datatypes primitives or data classes built out of them
+def write_item(item, stream: "bitstring.BitStream"):
+    if isinstance(item, kafka.datatypes.KafkaSerializable):
+        item.serialize(stream)
+    else:
+        write_data_class(item, stream)
+
+
+def item_size(item) -> int:
+    return item.size() if isinstance(item, kafka.datatypes.KafkaSerializable) else data_class_size(item)
+
+
+# Deserializers are compiled once per data class: the fields' readers & wrappers are worked out by introspection on
+# first use, so decoding a message only runs the readers. Nested data classes share their compiled deserializer.
+_deserializers: dict[Type, Callable[["bitstring.BitStream"], any]] = {}
+
+
+def dataclass_deserializer(_type: Type[T]) -> Callable[["bitstring.BitStream"], T]:
+    deserializer = _deserializers.get(_type)
+    if deserializer is None:
+        deserializer = __compile_deserializer(_type)
+        _deserializers[_type] = deserializer
+    return deserializer
+
+
+# Compiles the deserializers of the given data classes ahead of their first use, e.g. at startup of a long-lived program
+def precompile(*types: Type):
+    for _type in types:
+        dataclass_deserializer(_type)
+
+
+def __compile_deserializer(_type: Type[T]) -> Callable[["bitstring.BitStream"], T]:
+    fields = [(field_name, __determine_deserializer(field_type), __determine_wrapper(field_type))
+              for field_name, field_type in util.inspection.get_data_class_attributes_types(_type).items()]
+
+    def deserialize_data_class(stream: "bitstring.BitStream") -> T:
         result = _type.__new__(_type)
-        declared_attributes = util.inspection.get_data_class_attributes_types(_type)
-        for field_name, field_type in declared_attributes.items():
-            deserializer = __determine_deserializer(field_type)
-            value = deserializer(stream)
-            result.__setattr__(field_name, __wrap_value(value, field_type))
+        for field_name, deserializer, wrap in fields:
+            result.__setattr__(field_name, wrap(deserializer(stream)))
         return result
 
     return deserialize_data_class
 
 
-def __determine_deserializer(_type: Type) -> Callable[[bitstring.BitStream], any]:
+def __determine_deserializer(_type: Type) -> Callable[["bitstring.BitStream"], any]:
     if util.inspection.is_generic_type(_type):
         return __determine_generic_container_deserializer(_type)
     else:
         match _type:
             case kafka.datatypes.Boolean:
                 return read_boolean
+            case kafka.datatypes.Int8:
+                return read_int_8
             case kafka.datatypes.Int16:
                 return read_int_16
             case kafka.datatypes.Int32:
                 return read_int_32
+            case kafka.datatypes.Int64:
+                return read_int_64
             case kafka.datatypes.NullableString:
                 return read_nullable_string
             case kafka.datatypes.CompactString:
                 return read_compact_string
             case kafka.datatypes.CompactNullableString:
                 return read_compact_nullable_string
+            case kafka.datatypes.CompactBytes:
+                return read_compact_bytes
+            case kafka.datatypes.CompactRecords:
+                return read_compact_nullable_bytes
             case kafka.datatypes.Uuid:
                 return read_uuid
             case kafka.datatypes.TagBuffer:
@@ -67,18 +121,147 @@ def __determine_generic_container_deserializer(_type: Type):
             raise Exception(f"Unknown generic container type {_type}")
 
 
-def __wrap_value(val: any, _type: Type[T]) -> T:
-    if val.__class__ == _type:
-        return val
+# Turns what a reader returned into the declared type of the field. Data classes are returned as they are by their
+# deserializer.
+def __determine_wrapper(_type: Type) -> Callable[[any], any]:
     if util.inspection.is_generic_type(_type):
-        return __wrap_generic_container(val, _type)
-    result = _type.__new__(_type)
-    result.__init__(val)
-    return result
+        container_type = util.inspection.get_generic_class_type(_type)
+        wrap_item = __determine_wrapper(util.inspection.get_generic_type_parameters(_type)[0])
+        return lambda val: container_type([wrap_item(item) for item in val])
+    if isinstance(_type, type) and issubclass(_type, kafka.datatypes.KafkaSerializable):
+        return _type
+    return lambda val: val
 
 
-def __wrap_generic_container(val: any, _type: Type) -> T:
-    container_type = util.inspection.get_generic_class_type(_type)
-    items_type = util.inspection.get_generic_type_parameters(_type)[0]
-    wrapped_items = list(map(lambda item: __wrap_value(item, items_type), val))
-    return __wrap_value(wrapped_items, container_type)
+# Buffer codecs: the same as above, reading from and writing to a buffer at an offset with kafka.buffer_serialization
+# instead of going through a bitstring stream. Compiled once per data class as well.
+_buffer_deserializers: dict[Type, Callable[[any, int], tuple[any, int]]] = {}
+_buffer_serializers: dict[Type, Callable[[any, any, int], int]] = {}
+
+
+# Returns a function decoding an instance of `_type` from a buffer at an offset, returning it along with the offset
+# following it
+def dataclass_buffer_deserializer(_type: Type[T]) -> Callable[[any, int], tuple[T, int]]:
+    deserializer = _buffer_deserializers.get(_type)
+    if deserializer is None:
+        deserializer = __compile_buffer_deserializer(_type)
+        _buffer_deserializers[_type] = deserializer
+    return deserializer
+
+
+# Returns a function encoding an instance of `_type` into a buffer at an offset, returning the offset following it. The
+# buffer must have room for it, see data_class_size.
+def dataclass_buffer_serializer(_type: Type[T]) -> Callable[[T, any, int], int]:
+    serializer = _buffer_serializers.get(_type)
+    if serializer is None:
+        serializer = __compile_buffer_serializer(_type)
+        _buffer_serializers[_type] = serializer
+    return serializer
+
+
+def write_data_class_into(msg, buf, offset: int) -> int:
+    return dataclass_buffer_serializer(msg.__class__)(msg, buf, offset)
+
+
+def __compile_buffer_deserializer(_type: Type[T]) -> Callable[[any, int], tuple[T, int]]:
+    fields = [(field_name, __determine_buffer_reader(field_type), __determine_wrapper(field_type))
+              for field_name, field_type in util.inspection.get_data_class_attributes_types(_type).items()]
+
+    def deserialize_data_class(buf, offset: int) -> tuple[T, int]:
+        result = _type.__new__(_type)
+        for field_name, reader, wrap in fields:
+            (value, offset) = reader(buf, offset)
+            result.__setattr__(field_name, wrap(value))
+        return result, offset
+
+    return deserialize_data_class
+
+
+def __compile_buffer_serializer(_type: Type[T]) -> Callable[[T, any, int], int]:
+    fields = [(field_name, __determine_buffer_writer(field_type))
+              for field_name, field_type in util.inspection.get_data_class_attributes_types(_type).items()]
+
+    def serialize_data_class_into(msg: T, buf, offset: int) -> int:
+        for field_name, writer in fields:
+            offset = writer(msg.__getattribute__(field_name), buf, offset)
+        return offset
+
+    return serialize_data_class_into
+
+
+def __determine_buffer_reader(_type: Type) -> Callable[[any, int], tuple[any, int]]:
+    if util.inspection.is_generic_type(_type):
+        items_reader = __determine_buffer_reader(util.inspection.get_generic_type_parameters(_type)[0])
+        match util.inspection.get_generic_class_type(_type):
+            case kafka.datatypes.CompactArray:
+                return kafka.buffer_serialization.compact_array_reader(items_reader)
+            case _:
+                raise Exception(f"Unknown generic container type {_type}")
+    else:
+        match _type:
+            case kafka.datatypes.Boolean:
+                return kafka.buffer_serialization.read_boolean
+            case kafka.datatypes.Int8:
+                return kafka.buffer_serialization.read_int_8
+            case kafka.datatypes.Int16:
+                return kafka.buffer_serialization.read_int_16
+            case kafka.datatypes.Int32:
+                return kafka.buffer_serialization.read_int_32
+            case kafka.datatypes.Int64:
+                return kafka.buffer_serialization.read_int_64
+            case kafka.datatypes.NullableString:
+                return kafka.buffer_serialization.read_nullable_string
+            case kafka.datatypes.CompactString:
+                return kafka.buffer_serialization.read_compact_string
+            case kafka.datatypes.CompactNullableString:
+                return kafka.buffer_serialization.read_compact_nullable_string
+            case kafka.datatypes.CompactBytes:
+                return kafka.buffer_serialization.read_compact_bytes
+            case kafka.datatypes.CompactRecords:
+                return kafka.buffer_serialization.read_compact_nullable_bytes
+            case kafka.datatypes.Uuid:
+                return kafka.buffer_serialization.read_uuid
+            case kafka.datatypes.TagBuffer:
+                return kafka.buffer_serialization.read_tag_buffer
+            case _:
+                return dataclass_buffer_deserializer(_type)
+
+
+# Writers are given the kafka.datatypes objects of the fields, and write their `val`
+def __determine_buffer_writer(_type: Type) -> Callable[[any, any, int], int]:
+    if util.inspection.is_generic_type(_type):
+        items_writer = __determine_buffer_writer(util.inspection.get_generic_type_parameters(_type)[0])
+        match util.inspection.get_generic_class_type(_type):
+            case kafka.datatypes.CompactArray:
+                write = kafka.buffer_serialization.compact_array_writer(items_writer)
+            case _:
+                raise Exception(f"Unknown generic container type {_type}")
+    else:
+        match _type:
+            case kafka.datatypes.Boolean:
+                write = kafka.buffer_serialization.write_boolean
+            case kafka.datatypes.Int8:
+                write = kafka.buffer_serialization.write_int_8
+            case kafka.datatypes.Int16:
+                write = kafka.buffer_serialization.write_int_16
+            case kafka.datatypes.Int32:
+                write = kafka.buffer_serialization.write_int_32
+            case kafka.datatypes.Int64:
+                write = kafka.buffer_serialization.write_int_64
+            case kafka.datatypes.NullableString:
+                write = kafka.buffer_serialization.write_nullable_string
+            case kafka.datatypes.CompactString:
+                write = kafka.buffer_serialization.write_compact_string
+            case kafka.datatypes.CompactNullableString:
+                write = kafka.buffer_serialization.write_compact_nullable_string
+            case kafka.datatypes.CompactBytes:
+                write = kafka.buffer_serialization.write_compact_bytes
+            case kafka.datatypes.CompactRecords:
+                write = kafka.buffer_serialization.write_compact_nullable_bytes
+            case kafka.datatypes.Uuid:
+                write = kafka.buffer_serialization.write_uuid
+            case kafka.datatypes.TagBuffer:
+                write = kafka.buffer_serialization.write_tag_buffer
+            case _:
+                return dataclass_buffer_serializer(_type)
+    return lambda obj, buf, offset: write(obj.val, buf, offset)
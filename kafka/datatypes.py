@@ -1,19 +1,31 @@
 import abc
-from typing import Generic, List, TypeVar
+from typing import TYPE_CHECKING, Generic, List, TypeVar
 from dataclasses import dataclass
 from uuid import UUID
 
-from bitstring import BitStream
-
+import kafka.dataclass_binding
 from kafka.serialization import \
     write_boolean, \
+    write_int_8, \
     write_int_16, \
     write_int_32, \
+    write_int_64, \
     write_nullable_string, \
     write_compact_array, \
     write_compact_string, \
     write_compact_nullable_string, \
-    write_uuid
+    write_compact_bytes, \
+    write_compact_nullable_bytes, \
+    write_uuid, \
+    nullable_string_size, \
+    compact_array_size, \
+    compact_string_size, \
+    compact_nullable_string_size, \
+    compact_bytes_size, \
+    compact_nullable_bytes_size
+
+if TYPE_CHECKING:
+    from bitstring import BitStream
 
 T = TypeVar("T")
 
@@ -26,10 +38,17 @@ class KafkaSerializable(metaclass=abc.ABCMeta):
     @classmethod
     def __subclasshook__(cls, subclass):
         return (hasattr(subclass, 'serialize') and
-                callable(subclass.serialize))
+                callable(subclass.serialize) and
+                hasattr(subclass, 'size') and
+                callable(subclass.size))
 
     @abc.abstractmethod
-    def serialize(self, stream: BitStream):
+    def serialize(self, stream: "BitStream"):
+        raise NotImplementedError
+
+    # Exact number of bytes `serialize` writes, computed without serializing
+    @abc.abstractmethod
+    def size(self) -> int:
         raise NotImplementedError
 
 
@@ -37,64 +56,118 @@ class KafkaSerializable(metaclass=abc.ABCMeta):
 class Boolean(KafkaSerializable):
     val: bool
 
-    def serialize(self, stream: BitStream): write_boolean(self.val, stream)
+    def serialize(self, stream: "BitStream"): write_boolean(self.val, stream)
+
+    def size(self) -> int: return 1
+
+
+@dataclass
+class Int8(KafkaSerializable):
+    val: int
+
+    def serialize(self, stream: "BitStream"): write_int_8(self.val, stream)
+
+    def size(self) -> int: return 1
 
 
 @dataclass
 class Int16(KafkaSerializable):
     val: int
 
-    def serialize(self, stream: BitStream): write_int_16(self.val, stream)
+    def serialize(self, stream: "BitStream"): write_int_16(self.val, stream)
+
+    def size(self) -> int: return 2
 
 
 @dataclass
 class Int32(KafkaSerializable):
     val: int
 
-    def serialize(self, stream: BitStream): write_int_32(self.val, stream)
+    def serialize(self, stream: "BitStream"): write_int_32(self.val, stream)
+
+    def size(self) -> int: return 4
+
+
+@dataclass
+class Int64(KafkaSerializable):
+    val: int
+
+    def serialize(self, stream: "BitStream"): write_int_64(self.val, stream)
+
+    def size(self) -> int: return 8
 
 
 @dataclass
 class NullableString(KafkaSerializable):
     val: None | str
 
-    def serialize(self, stream: BitStream): write_nullable_string(self.val, stream)
+    def serialize(self, stream: "BitStream"): write_nullable_string(self.val, stream)
+
+    def size(self) -> int: return nullable_string_size(self.val)
 
 
 @dataclass
 class CompactString(KafkaSerializable):
     val: str
 
-    def serialize(self, stream: BitStream): write_compact_string(self.val, stream)
+    def serialize(self, stream: "BitStream"): write_compact_string(self.val, stream)
+
+    def size(self) -> int: return compact_string_size(self.val)
 
 
 @dataclass
 class CompactNullableString(KafkaSerializable):
     val: None | str
 
-    def serialize(self, stream: BitStream): write_compact_nullable_string(self.val, stream)
+    def serialize(self, stream: "BitStream"): write_compact_nullable_string(self.val, stream)
+
+    def size(self) -> int: return compact_nullable_string_size(self.val)
+
+
+@dataclass
+class CompactBytes(KafkaSerializable):
+    val: bytes
+
+    def serialize(self, stream: "BitStream"): write_compact_bytes(self.val, stream)
+
+    def size(self) -> int: return compact_bytes_size(self.val)
+
+
+@dataclass
+class CompactRecords(KafkaSerializable):
+    val: None | bytes
+
+    def serialize(self, stream: "BitStream"): write_compact_nullable_bytes(self.val, stream)
+
+    def size(self) -> int: return compact_nullable_bytes_size(self.val)
 
 
 @dataclass
 class CompactArray(Generic[T], KafkaSerializable):
     val: None | List[T]
 
-    def serialize(self, stream: BitStream):
-        write_compact_array(self.val, stream, lambda item, _stream: item.serialize(_stream))
+    def serialize(self, stream: "BitStream"):
+        write_compact_array(self.val, stream, kafka.dataclass_binding.write_item)
+
+    def size(self) -> int: return compact_array_size(self.val, kafka.dataclass_binding.item_size)
 
 
 @dataclass
 class Uuid(KafkaSerializable):
     val: UUID
 
-    def serialize(self, stream: BitStream): write_uuid(self.val, stream)
+    def serialize(self, stream: "BitStream"): write_uuid(self.val, stream)
+
+    def size(self) -> int: return 16
 
 
 @dataclass
 class TagBuffer(KafkaSerializable):
     val: bytes
 
-    def serialize(self, stream: BitStream): stream.append(self.val)
+    def serialize(self, stream: "BitStream"): stream.append(self.val)
+
+    def size(self) -> int: return len(self.val)
 
 
 EMPTY_TAG_BUFFER = TagBuffer(b'\x00')
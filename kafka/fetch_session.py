@@ -0,0 +1,208 @@
+from dataclasses import dataclass
+
+from kafka.client import SyncKafkaClient
+from kafka.datatypes import CompactArray, CompactString, Int8, Int32, Int64, EMPTY_TAG_BUFFER
+from kafka.messages import FetchV12ApiRequest, FetchV12ApiResponse
+from kafka.topic_partition import TopicPartition
+
+INVALID_SESSION_ID = 0
+INITIAL_EPOCH = 0
+FINAL_EPOCH = -1
+
+FETCH_SESSION_ID_NOT_FOUND = 70
+INVALID_FETCH_SESSION_EPOCH = 71
+
+
+# Incremental fetch sessions (KIP-227)
+#
+# The first request of a session is a full one, listing every partition. If the broker creates a session it answers
+# with a session id, and the following requests carry that id with an incrementing epoch and only list partitions
+# that were added or whose fetch position changed since the previous request, plus partitions to forget. The broker
+# only answers with partitions that have something new (records, a moved high watermark, an error, ...), and this
+# class merges these answers into a table holding the last known state of every partition in the session.
+#
+# Any session error sends the next request back to being a full one, starting a new session.
+
+# What the client asks for a partition
+@dataclass(frozen=True)
+class FetchPosition:
+    fetch_offset: int
+    current_leader_epoch: int = -1
+    last_fetched_epoch: int = -1
+    log_start_offset: int = -1
+    partition_max_bytes: int = 1024 * 1024
+
+
+# What the broker last said about a partition
+@dataclass
+class FetchedPartitionState:
+    error_code: int
+    high_watermark: int
+    last_stable_offset: int
+    log_start_offset: int
+    preferred_read_replica: int
+
+
+# A partition as returned in a single response
+@dataclass
+class FetchedPartition:
+    state: FetchedPartitionState
+    aborted_transactions: list[tuple[int, int]]  # (producer_id, first_offset)
+    records: None | bytes
+
+
+class FetchSession:
+    session_id: int
+    epoch: int
+    partition_states: dict[TopicPartition, FetchedPartitionState]
+    __max_wait_ms: int
+    __min_bytes: int
+    __max_bytes: int
+    __isolation_level: int
+    __rack_id: str
+    __wanted: dict[TopicPartition, FetchPosition]
+    __session_partitions: dict[TopicPartition, FetchPosition]  # as the broker's session knows them
+    __in_flight: None | dict[TopicPartition, FetchPosition]  # __wanted as of the last request built
+
+    def __init__(self,
+                 max_wait_ms: int = 500,
+                 min_bytes: int = 1,
+                 max_bytes: int = 50 * 1024 * 1024,
+                 isolation_level: int = 0,
+                 rack_id: str = ""):
+        self.__max_wait_ms = max_wait_ms
+        self.__min_bytes = min_bytes
+        self.__max_bytes = max_bytes
+        self.__isolation_level = isolation_level
+        self.__rack_id = rack_id
+        self.__wanted = {}
+        self.partition_states = {}
+        self.__reset()
+
+    def __reset(self):
+        self.session_id = INVALID_SESSION_ID
+        self.epoch = INITIAL_EPOCH
+        self.__session_partitions = {}
+        self.__in_flight = None
+
+    # Adds a partition to the session, or updates where to fetch it from
+    def set_position(self, topic_partition: TopicPartition, position: FetchPosition):
+        self.__wanted[topic_partition] = position
+
+    def remove_partition(self, topic_partition: TopicPartition):
+        self.__wanted.pop(topic_partition, None)
+        self.partition_states.pop(topic_partition, None)
+
+    def positions(self) -> dict[TopicPartition, FetchPosition]: return dict(self.__wanted)
+
+    def build_request(self) -> FetchV12ApiRequest:
+        if self.epoch == INITIAL_EPOCH:
+            to_send = self.__wanted
+            to_forget = []
+        else:
+            to_send = {tp: position for tp, position in self.__wanted.items()
+                       if self.__session_partitions.get(tp) != position}
+            to_forget = [tp for tp in self.__session_partitions if tp not in self.__wanted]
+        self.__in_flight = dict(self.__wanted)
+        return self.__mk_request(self.session_id, self.epoch, to_send, to_forget)
+
+    # Tells the broker to drop the session, the next request built will start a new one
+    def build_close_request(self) -> FetchV12ApiRequest:
+        request = self.__mk_request(self.session_id, FINAL_EPOCH, {}, [])
+        self.__reset()
+        return request
+
+    def __mk_request(self,
+                     session_id: int,
+                     epoch: int,
+                     to_send: dict[TopicPartition, FetchPosition],
+                     to_forget: list[TopicPartition]) -> FetchV12ApiRequest:
+        topics = {}
+        for tp, position in to_send.items():
+            topics.setdefault(tp.topic, []).append(FetchV12ApiRequest.Topic.Partition(
+                partition=Int32(tp.partition),
+                current_leader_epoch=Int32(position.current_leader_epoch),
+                fetch_offset=Int64(position.fetch_offset),
+                last_fetched_epoch=Int32(position.last_fetched_epoch),
+                log_start_offset=Int64(position.log_start_offset),
+                partition_max_bytes=Int32(position.partition_max_bytes),
+                tag_buffer=EMPTY_TAG_BUFFER
+            ))
+        forgotten = {}
+        for tp in to_forget:
+            forgotten.setdefault(tp.topic, []).append(Int32(tp.partition))
+
+        return FetchV12ApiRequest(
+            replica_id=Int32(-1),
+            max_wait_ms=Int32(self.__max_wait_ms),
+            min_bytes=Int32(self.__min_bytes),
+            max_bytes=Int32(self.__max_bytes),
+            isolation_level=Int8(self.__isolation_level),
+            session_id=Int32(session_id),
+            session_epoch=Int32(epoch),
+            topics=CompactArray([
+                FetchV12ApiRequest.Topic(CompactString(topic), CompactArray(partitions), EMPTY_TAG_BUFFER)
+                for topic, partitions in topics.items()
+            ]),
+            forgotten_topics_data=CompactArray([
+                FetchV12ApiRequest.ForgottenTopic(CompactString(topic), CompactArray(partitions), EMPTY_TAG_BUFFER)
+                for topic, partitions in forgotten.items()
+            ]),
+            rack_id=CompactString(self.__rack_id),
+            tag_buffer=EMPTY_TAG_BUFFER
+        )
+
+    # Merges a response to the last request built into the partition states, and returns the partitions it holds.
+    # Session errors reset the session and return nothing, other errors reset it and raise.
+    def handle_response(self, response: FetchV12ApiResponse) -> dict[TopicPartition, FetchedPartition]:
+        error_code = response.error_code.val
+        if error_code in (FETCH_SESSION_ID_NOT_FOUND, INVALID_FETCH_SESSION_EPOCH):
+            self.__reset()
+            return {}
+        if error_code != 0:
+            self.__reset()
+            raise Exception(f"Fetch failed with error code {error_code}")
+
+        session_id = response.session_id.val
+        if self.epoch == INITIAL_EPOCH:
+            self.session_id = session_id
+        elif session_id != self.session_id:
+            self.__reset()
+            raise Exception(f"Fetch response for session {session_id} while in session {self.session_id}")
+        if self.session_id == INVALID_SESSION_ID:
+            # the broker didn't create a session, every request stays a full one
+            self.__session_partitions = {}
+        else:
+            self.__session_partitions = self.__in_flight
+            self.epoch = _next_epoch(self.epoch)
+        self.__in_flight = None
+
+        result = {}
+        for topic in response.responses.val:
+            for partition in topic.partitions.val:
+                tp = TopicPartition(topic.topic.val, partition.partition_index.val)
+                state = FetchedPartitionState(
+                    error_code=partition.error_code.val,
+                    high_watermark=partition.high_watermark.val,
+                    last_stable_offset=partition.last_stable_offset.val,
+                    log_start_offset=partition.log_start_offset.val,
+                    preferred_read_replica=partition.preferred_read_replica.val
+                )
+                if tp in self.__wanted:
+                    self.partition_states[tp] = state
+                result[tp] = FetchedPartition(
+                    state=state,
+                    aborted_transactions=[(aborted.producer_id.val, aborted.first_offset.val)
+                                          for aborted in partition.aborted_transactions.val or []],
+                    records=partition.records.val
+                )
+        return result
+
+    def fetch(self, client: SyncKafkaClient) -> dict[TopicPartition, FetchedPartition]:
+        return self.handle_response(client.send(self.build_request()))
+
+
+def _next_epoch(epoch: int) -> int:
+    if epoch < 0:
+        return FINAL_EPOCH
+    return 1 if epoch == 0x7FFFFFFF else epoch + 1
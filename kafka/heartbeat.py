@@ -0,0 +1,335 @@
+import math
+import select
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from kafka.client import SyncKafkaClient
+from kafka.datatypes import CompactNullableString, CompactString, Int32, EMPTY_TAG_BUFFER
+from kafka.hedged_client import LatencyTracker
+from kafka.messages import HeartbeatV4ApiRequest
+
+ILLEGAL_GENERATION = 22
+UNKNOWN_MEMBER_ID = 25
+FENCED_INSTANCE_ID = 82
+
+# The member is out of the group, heartbeating for it again is pointless until it re-joins
+_FATAL_ERRORS = (ILLEGAL_GENERATION, UNKNOWN_MEMBER_ID, FENCED_INSTANCE_ID)
+
+# Reported to the error callback when no response could be obtained at all
+CONNECTION_ERROR = -1
+
+
+# Keeps consumer group members alive by sending Heartbeat requests at a fixed cadence, on a thread and connections of
+# its own, so that a caller busy with a slow fetch or a large decode doesn't make its members miss their heartbeats.
+#
+# Due heartbeats are found with a hashed timing wheel: scheduling and firing cost the same no matter how many groups are
+# tracked. Heartbeats are scheduled at fixed times (previous due time + interval) rather than relative to when the
+# previous one was sent, so lateness doesn't accumulate, and the lateness of every heartbeat is recorded as jitter.
+#
+# Connections are established and responses collected between ticks, by select()ing over the connections being
+# established and those with heartbeats in flight, so a slow, dead or unreachable coordinator delays no other group's
+# heartbeats: its heartbeats stay in flight across ticks until answered or timed out. Heartbeats due while their
+# coordinator is being connected to wait for the connection. After a connection failed, the coordinator isn't connected
+# to again before a backoff, doubling up to a maximum with every failure in a row, and heartbeats due meanwhile fail
+# right away. The backoff is reset once the coordinator answers again.
+
+
+# Hashed timing wheel: items are put in the slot of the tick they're due at, and a slot only holds the items of the
+# ticks mapping to it, each remembering its absolute tick
+class TimingWheel:
+    __tick: float
+    __start: float
+    __current: int  # last tick processed
+    __slots: list[list[tuple[int, object]]]
+
+    def __init__(self, tick: float, size: int, start: float):
+        self.__tick = tick
+        self.__start = start
+        self.__current = 0
+        self.__slots = [[] for _ in range(size)]
+
+    # Items are fired on the first tick at or after their deadline
+    def schedule(self, deadline: float, item: object):
+        target = max(self.__current + 1, math.ceil((deadline - self.__start) / self.__tick))
+        self.__slots[target % len(self.__slots)].append((target, item))
+
+    # Processes all the ticks up to `now`, returns the items that became due
+    def advance(self, now: float) -> list[object]:
+        due = []
+        while self.next_tick_time() <= now:
+            self.__current += 1
+            index = self.__current % len(self.__slots)
+            slot = self.__slots[index]
+            if slot:
+                self.__slots[index] = [entry for entry in slot if entry[0] > self.__current]
+                due.extend(item for target, item in slot if target <= self.__current)
+        return due
+
+    def next_tick_time(self) -> float: return self.__start + (self.__current + 1) * self.__tick
+
+
+@dataclass
+class GroupMembership:
+    group_id: str
+    member_id: str
+    generation_id: int
+    coordinator: str  # host:port of the group coordinator
+    interval: float  # seconds between heartbeats, usually a third of the session timeout
+    group_instance_id: None | str = None
+
+
+@dataclass
+class HeartbeatStats:
+    sent: int
+    failed: int  # heartbeats answered with an error, or not answered
+    jitter_mean: float  # seconds between when heartbeats were due and when they were sent
+    jitter_p50: float
+    jitter_p99: float
+    jitter_max: float
+
+
+class HeartbeatScheduler:
+    __members: dict[str, GroupMembership]
+    __clients: dict[str, SyncKafkaClient]  # by coordinator, connected or being connected to
+    # by coordinator being connected to: when connecting started, and the heartbeats waiting for the connection
+    __connecting: dict[str, tuple[float, list[tuple[GroupMembership, float]]]]
+    __backoffs: dict[str, tuple[float, float]]  # by coordinator that failed: when to reconnect, and the backoff applied
+    # by coordinator, then correlation id
+    __in_flight: dict[str, dict[int, tuple[GroupMembership, HeartbeatV4ApiRequest, float]]]
+    __wheel: TimingWheel
+    __lock: threading.Lock
+    __stopped: threading.Event
+    __thread: None | threading.Thread
+    __on_error: None | Callable[[GroupMembership, int], None]
+    __request_timeout: float
+    __reconnect_backoff: float
+    __reconnect_backoff_max: float
+    __jitter: LatencyTracker
+    __sent: int
+    __failed: int
+    __jitter_sum: float
+    __jitter_max: float
+
+    def __init__(self,
+                 tick: float = 0.01,
+                 wheel_size: int = 1024,
+                 request_timeout: float = 5.0,
+                 on_error: None | Callable[[GroupMembership, int], None] = None,
+                 jitter_window: int = 1024,
+                 reconnect_backoff: float = 0.05,
+                 reconnect_backoff_max: float = 1.0):
+        self.__members = {}
+        self.__clients = {}
+        self.__connecting = {}
+        self.__backoffs = {}
+        self.__in_flight = {}
+        self.__wheel = TimingWheel(tick, wheel_size, time.monotonic())
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__thread = None
+        self.__on_error = on_error
+        self.__request_timeout = request_timeout
+        self.__reconnect_backoff = reconnect_backoff
+        self.__reconnect_backoff_max = reconnect_backoff_max
+        self.__jitter = LatencyTracker(jitter_window)
+        self.__sent = 0
+        self.__failed = 0
+        self.__jitter_sum = 0.0
+        self.__jitter_max = 0.0
+
+    # Starts heartbeating for a member, replacing any previous membership of the same group. The first heartbeat is
+    # sent one interval from now.
+    def register(self, membership: GroupMembership):
+        with self.__lock:
+            self.__members[membership.group_id] = membership
+            due = time.monotonic() + membership.interval
+            self.__wheel.schedule(due, (membership, due))
+
+    def unregister(self, group_id: str):
+        with self.__lock:
+            self.__members.pop(group_id, None)
+
+    # After a re-join, the next heartbeats carry the new generation & member id
+    def update_generation(self, group_id: str, generation_id: int, member_id: str):
+        with self.__lock:
+            membership = self.__members[group_id]
+            membership.generation_id = generation_id
+            membership.member_id = member_id
+
+    def start(self):
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name="kafka-heartbeat", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        for client in self.__clients.values():
+            client.close()
+        self.__clients = {}
+        self.__connecting = {}
+        self.__backoffs = {}
+        self.__in_flight = {}
+
+    def stats(self) -> HeartbeatStats:
+        with self.__lock:
+            count = len(self.__jitter)
+            return HeartbeatStats(
+                sent=self.__sent,
+                failed=self.__failed,
+                jitter_mean=self.__jitter_sum / self.__sent if self.__sent else 0.0,
+                jitter_p50=self.__jitter.percentile(50) if count else 0.0,
+                jitter_p99=self.__jitter.percentile(99) if count else 0.0,
+                jitter_max=self.__jitter_max
+            )
+
+    def __run(self):
+        while not self.__stopped.is_set():
+            (connected, readable) = self.__wait(self.__wheel.next_tick_time())
+            for coordinator in connected:
+                self.__connected(coordinator)
+            for coordinator in readable:
+                self.__collect(coordinator)
+            self.__expire()
+            with self.__lock:
+                due = [(membership, due_at) for membership, due_at in self.__wheel.advance(time.monotonic())
+                       # unregistered or replaced since scheduled
+                       if self.__members.get(membership.group_id) is membership]
+            for membership, due_at in due:
+                self.__beat(membership, due_at)
+                self.__reschedule(membership, due_at)
+
+    # Waits until `until`, returns the coordinators connected to and those whose responses arrive in the meantime
+    def __wait(self, until: float) -> tuple[list[str], list[str]]:
+        wait = max(until - time.monotonic(), 0.0)
+        connecting = {self.__clients[coordinator].fileno(): coordinator for coordinator in self.__connecting}
+        waiting = {self.__clients[coordinator].fileno(): coordinator
+                   for coordinator, in_flight in self.__in_flight.items() if in_flight}
+        if not connecting and not waiting:
+            self.__stopped.wait(wait)
+            return [], []
+        (readable, writable, _) = select.select(list(waiting), list(connecting), [], wait)
+        return [connecting[fd] for fd in writable], [waiting[fd] for fd in readable]
+
+    def __beat(self, membership: GroupMembership, due_at: float):
+        coordinator = membership.coordinator
+        if coordinator in self.__connecting:
+            self.__connecting[coordinator][1].append((membership, due_at))
+            return
+        client = self.__clients.get(coordinator)
+        if client is None:
+            if time.monotonic() < self.__backoffs.get(coordinator, (0.0, 0.0))[0] or not self.__connect(coordinator):
+                self.__failure(membership, CONNECTION_ERROR)
+            else:
+                self.__connecting[coordinator][1].append((membership, due_at))
+            return
+
+        request = HeartbeatV4ApiRequest(
+            group_id=CompactString(membership.group_id),
+            generation_id=Int32(membership.generation_id),
+            member_id=CompactString(membership.member_id),
+            group_instance_id=CompactNullableString(membership.group_instance_id),
+            tag_buffer=EMPTY_TAG_BUFFER
+        )
+        sent_at = time.monotonic()
+        try:
+            correlation_id = client.write_request(request, sent_at + self.__request_timeout)
+            self.__in_flight.setdefault(coordinator, {})[correlation_id] = (membership, request, sent_at)
+        except OSError:
+            self.__drop_client(coordinator)
+            self.__failure(membership, CONNECTION_ERROR)
+        self.__record(sent_at - due_at)
+
+    # Initiates a connection without waiting for it, returns whether that could be done
+    def __connect(self, coordinator: str) -> bool:
+        try:
+            self.__clients[coordinator] = SyncKafkaClient(coordinator, wait_for_connect=False)
+        except OSError:
+            self.__back_off(coordinator)
+            return False
+        self.__connecting[coordinator] = (time.monotonic(), [])
+        return True
+
+    def __connected(self, coordinator: str):
+        try:
+            self.__clients[coordinator].finish_connect()
+        except OSError:
+            self.__drop_client(coordinator)
+            return
+        (_, waiting) = self.__connecting.pop(coordinator)
+        for membership, due_at in waiting:
+            self.__beat(membership, due_at)
+
+    def __collect(self, coordinator: str):
+        in_flight = self.__in_flight[coordinator]
+        try:
+            responses = self.__clients[coordinator].poll_responses(
+                {correlation_id: request for correlation_id, (_, request, _) in in_flight.items()}
+            )
+        except OSError:
+            self.__drop_client(coordinator)
+            return
+        if responses:
+            self.__backoffs.pop(coordinator, None)  # the coordinator works again
+        for correlation_id, response in responses.items():
+            (membership, _, _) = in_flight.pop(correlation_id)
+            if response.error_code.val != 0:
+                self.__failure(membership, response.error_code.val)
+
+    # A coordinator that doesn't answer, or can't be connected to, within the request timeout is disconnected from, as
+    # Kafka clients do
+    def __expire(self):
+        expired_before = time.monotonic() - self.__request_timeout
+        expired = [coordinator for coordinator, (started_at, _) in self.__connecting.items()
+                   if started_at < expired_before]
+        expired.extend(coordinator for coordinator, in_flight in self.__in_flight.items()
+                       if any(sent_at < expired_before for (_, _, sent_at) in in_flight.values()))
+        for coordinator in expired:
+            self.__drop_client(coordinator)
+
+    # The heartbeats waiting for the connection or in flight on it won't be answered anymore
+    def __drop_client(self, coordinator: str):
+        client = self.__clients.pop(coordinator, None)
+        if client is not None:
+            client.close()
+        (_, waiting) = self.__connecting.pop(coordinator, (0.0, []))
+        in_flight = self.__in_flight.pop(coordinator, {})
+        self.__back_off(coordinator)
+        for membership, _ in waiting:
+            self.__failure(membership, CONNECTION_ERROR)
+        for membership, _, _ in in_flight.values():
+            self.__failure(membership, CONNECTION_ERROR)
+
+    def __back_off(self, coordinator: str):
+        (_, backoff) = self.__backoffs.get(coordinator, (0.0, self.__reconnect_backoff / 2))
+        backoff = min(backoff * 2, self.__reconnect_backoff_max)
+        self.__backoffs[coordinator] = (time.monotonic() + backoff, backoff)
+
+    def __record(self, jitter: float):
+        with self.__lock:
+            self.__sent += 1
+            self.__jitter.record(jitter)
+            self.__jitter_sum += jitter
+            self.__jitter_max = max(self.__jitter_max, jitter)
+
+    # Keeps the cadence, skipping the heartbeats that are already too late to be worth sending
+    def __reschedule(self, membership: GroupMembership, due_at: float):
+        now = time.monotonic()
+        next_due = due_at + membership.interval
+        if next_due <= now:
+            next_due += math.ceil((now - next_due) / membership.interval) * membership.interval
+        with self.__lock:
+            if self.__members.get(membership.group_id) is membership:
+                self.__wheel.schedule(next_due, (membership, next_due))
+
+    def __failure(self, membership: GroupMembership, error_code: int):
+        with self.__lock:
+            self.__failed += 1
+            if error_code in _FATAL_ERRORS and self.__members.get(membership.group_id) is membership:
+                del self.__members[membership.group_id]
+        if self.__on_error is not None:
+            self.__on_error(membership, error_code)
@@ -0,0 +1,176 @@
+import math
+import select
+import time
+from collections import deque
+from typing import TypeVar
+
+import kafka.messages
+from kafka.buffer_pool import BufferPool, DEFAULT_BUFFER_POOL
+from kafka.client import SyncKafkaClient
+
+T = TypeVar("T")
+
+
+# Keeps the latencies of the last `window` responses to derive a hedging delay from
+class LatencyTracker:
+    __samples: deque
+
+    def __init__(self, window: int = 256):
+        self.__samples = deque(maxlen=window)
+
+    def record(self, latency: float): self.__samples.append(latency)
+
+    def __len__(self) -> int: return len(self.__samples)
+
+    # Nearest-rank percentile, None without samples
+    def percentile(self, p: float) -> None | float:
+        if not self.__samples:
+            return None
+        ordered = sorted(self.__samples)
+        return ordered[max(0, math.ceil(p * len(ordered) / 100) - 1)]
+
+
+# Sends requests to one of several brokers with a deadline, and optionally hedges read-only requests: when a broker
+# doesn't answer within a delay derived from recent latencies, the same request is sent to the next broker and
+# whichever answers first wins. The other response is discarded by its correlation id when it eventually arrives.
+# Latencies are tracked per API, of read-only requests only: a slow produce or a fetch waiting for data doesn't delay
+# the hedging of metadata requests.
+#
+# A connection that fails other than by timing out (broker gone, part of a request written) is closed, and replaced with
+# a new connection to the same broker the next time that broker's turn comes, waiting no longer than the request's
+# deadline to connect.
+class HedgedKafkaClient:
+    __servers: list[str]
+    __buffer_pool: BufferPool
+    __clients: list[SyncKafkaClient]
+    __next: int
+    __window: int
+    __latencies: dict[int, LatencyTracker]  # by request_api_key
+    __hedge_percentile: float
+    __default_hedge_delay: float
+    __min_hedge_delay: float
+    __min_samples: int
+    hedges: int  # hedged requests sent
+    hedge_wins: int  # hedged requests answered before the original one
+
+    def __init__(self,
+                 bootstrap_servers: str,
+                 hedge_percentile: float = 95,
+                 default_hedge_delay: float = 0.05,
+                 min_hedge_delay: float = 0.001,
+                 min_samples: int = 20,
+                 window: int = 256,
+                 buffer_pool: BufferPool = DEFAULT_BUFFER_POOL):
+        self.__servers = bootstrap_servers.split(",")
+        self.__buffer_pool = buffer_pool
+        self.__clients = [SyncKafkaClient(server, buffer_pool) for server in self.__servers]
+        self.__next = 0
+        self.__window = window
+        self.__latencies = {}
+        self.__hedge_percentile = hedge_percentile
+        self.__default_hedge_delay = default_hedge_delay
+        self.__min_hedge_delay = min_hedge_delay
+        self.__min_samples = min_samples
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    # Delay before hedging requests of an API. Until enough of its responses were seen, the default delay is used.
+    def hedge_delay(self, api_key: int) -> float:
+        latencies = self.__latencies.get(api_key)
+        if latencies is None or len(latencies) < self.__min_samples:
+            return self.__default_hedge_delay
+        return max(self.__min_hedge_delay, latencies.percentile(self.__hedge_percentile))
+
+    def __record(self, request: kafka.messages.KafkaApiRequest, latency: float):
+        if request.is_read_only():
+            api_key = request.request_api_key()
+            if api_key not in self.__latencies:
+                self.__latencies[api_key] = LatencyTracker(self.__window)
+            self.__latencies[api_key].record(latency)
+
+    def __pick(self, deadline: None | float) -> SyncKafkaClient:
+        index = self.__next
+        self.__next = (index + 1) % len(self.__clients)
+        if self.__clients[index].is_closed():
+            connect_timeout = None
+            if deadline is not None:
+                connect_timeout = deadline - time.monotonic()
+                if connect_timeout <= 0:
+                    raise TimeoutError("Deadline exceeded")
+            self.__clients[index] = SyncKafkaClient(self.__servers[index], self.__buffer_pool, connect_timeout)
+        return self.__clients[index]
+
+    # A timeout leaves the connection usable, a partly received response being kept by the client
+    @staticmethod
+    def __failed(client: SyncKafkaClient, error: OSError):
+        if not isinstance(error, TimeoutError):
+            client.close()
+
+    # Sends a request to the next broker in turn. With a timeout (in seconds), TimeoutError is raised when no response
+    # arrives in time. With hedge, read-only requests are also sent to another broker when the first one is slow.
+    def send(self, request: kafka.messages.KafkaApiRequest[T], timeout: None | float = None, hedge: bool = False) -> T:
+        if hedge and not request.is_read_only():
+            raise Exception(f"Only read-only requests can be hedged, got {request.__class__.__name__}")
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        if not hedge or len(self.__clients) < 2:
+            client = self.__pick(deadline)
+            try:
+                response = client.read_response(request, client.write_request(request, deadline), deadline)
+            except OSError as e:
+                self.__failed(client, e)
+                raise
+            self.__record(request, time.monotonic() - start)
+            return response
+
+        in_flight = {}
+        primary = self.__write(in_flight, request, deadline)
+        hedge_at = start + self.hedge_delay(request.request_api_key())
+        while True:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                raise TimeoutError("Deadline exceeded")
+            if hedge_at is not None and now >= hedge_at:
+                self.__write(in_flight, request, deadline)
+                self.hedges += 1
+                hedge_at = None
+            wait_until = min((t for t in (hedge_at, deadline) if t is not None), default=None)
+            ready, _, _ = select.select(list(in_flight), [], [],
+                                        None if wait_until is None else max(0.0, wait_until - now))
+            for client in ready:
+                (correlation_id, sent_at) = in_flight[client]
+                try:
+                    responses = client.poll_responses({correlation_id: request})
+                except OSError as e:
+                    self.__failed(client, e)
+                    del in_flight[client]
+                    if not in_flight:
+                        if hedge_at is None:
+                            raise
+                        hedge_at = time.monotonic()  # the request being read-only, it's sent to the other broker
+                    continue
+                if correlation_id in responses:
+                    self.__record(request, time.monotonic() - sent_at)
+                    if client is not primary:
+                        self.hedge_wins += 1
+                    return responses[correlation_id]
+
+    # Sends the request to the next broker in turn. Failing to is only an error when no other broker has it in flight.
+    def __write(self,
+                in_flight: dict[SyncKafkaClient, tuple[int, float]],
+                request: kafka.messages.KafkaApiRequest,
+                deadline: None | float) -> None | SyncKafkaClient:
+        client = None
+        try:
+            client = self.__pick(deadline)
+            in_flight[client] = (client.write_request(request, deadline), time.monotonic())
+        except OSError as e:
+            if client is not None:
+                self.__failed(client, e)
+            if not in_flight:
+                raise
+        return client
+
+    def close(self):
+        for client in self.__clients:
+            client.close()
@@ -0,0 +1,133 @@
+import abc
+import importlib
+from typing import Generic, Type, TypeVar
+from dataclasses import dataclass
+
+from kafka.datatypes import Int16, Int32, NullableString, TagBuffer, EMPTY_TAG_BUFFER
+import util.inspection
+
+RES_TYPE = TypeVar("RES_TYPE")
+
+
+class KafkaApiRequest(Generic[RES_TYPE], metaclass=abc.ABCMeta):
+
+    @abc.abstractmethod
+    def request_api_key(self) -> int:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def request_api_version(self) -> int:
+        raise NotImplementedError
+
+    def response_type(self) -> Type[RES_TYPE]:
+        return util.inspection.get_generic_type_parameters(self.__orig_bases__[0])[0]
+
+    # Flexible versions of requests are answered with Response Header v1, except ApiVersions which always uses v0 so
+    # that clients can parse its response before knowing which versions the broker supports
+    def response_header_version(self) -> int:
+        return 1
+
+    # Requests that don't change anything on the broker can be safely sent more than once, e.g. hedged
+    def is_read_only(self) -> bool:
+        return False
+
+
+# Looks up the request class implementing the given api key & version, None if this project doesn't have it
+def find_request_type(api_key: int, api_version: int) -> None | Type[KafkaApiRequest]:
+    name = _REQUESTS.get((api_key, api_version))
+    return None if name is None else __getattr__(name)
+
+
+# Request Header v2 => request_api_key request_api_version correlation_id client_id TAG_BUFFER
+#   request_api_key => INT16
+#   request_api_version => INT16
+#   correlation_id => INT32
+#   client_id => NULLABLE_STRING
+@dataclass
+class RequestHeaderV2:
+    request_api_key: Int16
+    request_api_version: Int16
+    correlation_id: Int32
+    client_id: NullableString
+    tag_buffer: TagBuffer
+
+
+def mk_request_header_v2(request: KafkaApiRequest,
+                         correlation_id: int,
+                         client_id: None | str) -> RequestHeaderV2:
+    return RequestHeaderV2(
+        request_api_key=Int16(request.request_api_key()),
+        request_api_version=Int16(request.request_api_version()),
+        correlation_id=Int32(correlation_id),
+        client_id=NullableString(client_id),
+        tag_buffer=EMPTY_TAG_BUFFER
+    )
+
+
+# Response Header v0 => correlation_id
+#   correlation_id => INT32
+@dataclass
+class ResponseHeaderV0:
+    correlation_id: Int32
+
+
+# Response Header v1 => correlation_id TAG_BUFFER
+#   correlation_id => INT32
+@dataclass
+class ResponseHeaderV1:
+    correlation_id: Int32
+    tag_buffer: TagBuffer
+
+
+# Messages of every API live in a module of their own, imported on first access (e.g. kafka.messages.FetchV12ApiRequest)
+# rather than with this package: defining all the data classes takes longer than anything else a short-lived program
+# like example_api_versions.py does before its first request.
+_MODULES = {
+    "ApiVersionsV3ApiRequest": "api_versions",
+    "ApiVersionsV3ApiResponse": "api_versions",
+    "MetadataV12ApiRequest": "metadata",
+    "MetadataV12ApiResponse": "metadata",
+    "FetchV12ApiRequest": "fetch",
+    "FetchV12ApiResponse": "fetch",
+    "ListOffsetsV7ApiRequest": "list_offsets",
+    "ListOffsetsV7ApiResponse": "list_offsets",
+    "OffsetCommitV8ApiRequest": "offset_commit",
+    "OffsetCommitV8ApiResponse": "offset_commit",
+    "OffsetFetchV7ApiRequest": "offset_fetch",
+    "OffsetFetchV7ApiResponse": "offset_fetch",
+    "FindCoordinatorV3ApiRequest": "find_coordinator",
+    "FindCoordinatorV3ApiResponse": "find_coordinator",
+    "JoinGroupV6ApiRequest": "join_group",
+    "JoinGroupV6ApiResponse": "join_group",
+    "HeartbeatV4ApiRequest": "heartbeat",
+    "HeartbeatV4ApiResponse": "heartbeat",
+    "SyncGroupV4ApiRequest": "sync_group",
+    "SyncGroupV4ApiResponse": "sync_group",
+}
+
+# (api key, api version) => name of the request class
+_REQUESTS = {
+    (18, 3): "ApiVersionsV3ApiRequest",
+    (3, 12): "MetadataV12ApiRequest",
+    (1, 12): "FetchV12ApiRequest",
+    (2, 7): "ListOffsetsV7ApiRequest",
+    (8, 8): "OffsetCommitV8ApiRequest",
+    (9, 7): "OffsetFetchV7ApiRequest",
+    (10, 3): "FindCoordinatorV3ApiRequest",
+    (11, 6): "JoinGroupV6ApiRequest",
+    (12, 4): "HeartbeatV4ApiRequest",
+    (14, 4): "SyncGroupV4ApiRequest",
+}
+
+
+def __getattr__(name: str):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value  # later accesses don't come back here
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_MODULES))
@@ -0,0 +1,44 @@
+from dataclasses import dataclass
+
+from kafka.datatypes import CompactArray, CompactString, Int16, Int32, TagBuffer
+from kafka.messages import KafkaApiRequest
+
+
+# ApiVersions Response (Version: 3) => error_code [api_keys] throttle_time_ms TAG_BUFFER
+#   error_code => INT16
+#   api_keys => api_key min_version max_version TAG_BUFFER
+#     api_key => INT16
+#     min_version => INT16
+#     max_version => INT16
+#   throttle_time_ms => INT32
+@dataclass
+class ApiVersionsV3ApiResponse:
+    @dataclass
+    class ApiKey:
+        api_key: Int16
+        min_version: Int16
+        max_version: Int16
+        tag_buffer: TagBuffer
+
+    error_code: Int16
+    api_keys: CompactArray[ApiKey]
+    throttle_time_ms: Int32
+    tag_buffer: TagBuffer
+
+
+# ApiVersions Request (Version: 3) => client_software_name client_software_version TAG_BUFFER
+#   client_software_name => COMPACT_STRING
+#   client_software_version => COMPACT_STRING
+@dataclass
+class ApiVersionsV3ApiRequest(KafkaApiRequest[ApiVersionsV3ApiResponse]):
+    client_software_name: CompactString
+    client_software_version: CompactString
+    tag_buffer: TagBuffer
+
+    def request_api_key(self) -> int: return 18
+
+    def request_api_version(self) -> int: return 3
+
+    def response_header_version(self) -> int: return 0
+
+    def is_read_only(self) -> bool: return True
@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+
+from kafka.datatypes import CompactArray, CompactString, CompactRecords, Int8, Int16, Int32, Int64, TagBuffer
+from kafka.messages import KafkaApiRequest
+
+
+# Fetch Response (Version: 12) => throttle_time_ms error_code session_id [responses] TAG_BUFFER
+#   throttle_time_ms => INT32
+#   error_code => INT16
+#   session_id => INT32
+#   responses => topic [partitions] TAG_BUFFER
+#     topic => COMPACT_STRING
+#     partitions => partition_index error_code high_watermark last_stable_offset log_start_offset [aborted_transactions] preferred_read_replica records TAG_BUFFER
+#       partition_index => INT32
+#       error_code => INT16
+#       high_watermark => INT64
+#       last_stable_offset => INT64
+#       log_start_offset => INT64
+#       aborted_transactions => producer_id first_offset TAG_BUFFER
+#         producer_id => INT64
+#         first_offset => INT64
+#       preferred_read_replica => INT32
+#       records => COMPACT_RECORDS
+@dataclass
+class FetchV12ApiResponse:
+    @dataclass
+    class Topic:
+        @dataclass
+        class Partition:
+            @dataclass
+            class AbortedTransaction:
+                producer_id: Int64
+                first_offset: Int64
+                tag_buffer: TagBuffer
+
+            partition_index: Int32
+            error_code: Int16
+            high_watermark: Int64
+            last_stable_offset: Int64
+            log_start_offset: Int64
+            aborted_transactions: CompactArray[AbortedTransaction]
+            preferred_read_replica: Int32
+            records: CompactRecords
+            tag_buffer: TagBuffer
+
+        topic: CompactString
+        partitions: CompactArray[Partition]
+        tag_buffer: TagBuffer
+
+    throttle_time_ms: Int32
+    error_code: Int16
+    session_id: Int32
+    responses: CompactArray[Topic]
+    tag_buffer: TagBuffer
+
+
+# Fetch Request (Version: 12) => replica_id max_wait_ms min_bytes max_bytes isolation_level session_id session_epoch [topics] [forgotten_topics_data] rack_id TAG_BUFFER
+#   replica_id => INT32
+#   max_wait_ms => INT32
+#   min_bytes => INT32
+#   max_bytes => INT32
+#   isolation_level => INT8
+#   session_id => INT32
+#   session_epoch => INT32
+#   topics => topic [partitions] TAG_BUFFER
+#     topic => COMPACT_STRING
+#     partitions => partition current_leader_epoch fetch_offset last_fetched_epoch log_start_offset partition_max_bytes TAG_BUFFER
+#       partition => INT32
+#       current_leader_epoch => INT32
+#       fetch_offset => INT64
+#       last_fetched_epoch => INT32
+#       log_start_offset => INT64
+#       partition_max_bytes => INT32
+#   forgotten_topics_data => topic [partitions] TAG_BUFFER
+#     topic => COMPACT_STRING
+#     partitions => INT32
+#   rack_id => COMPACT_STRING
+@dataclass
+class FetchV12ApiRequest(KafkaApiRequest[FetchV12ApiResponse]):
+    @dataclass
+    class Topic:
+        @dataclass
+        class Partition:
+            partition: Int32
+            current_leader_epoch: Int32
+            fetch_offset: Int64
+            last_fetched_epoch: Int32
+            log_start_offset: Int64
+            partition_max_bytes: Int32
+            tag_buffer: TagBuffer
+
+        topic: CompactString
+        partitions: CompactArray[Partition]
+        tag_buffer: TagBuffer
+
+    @dataclass
+    class ForgottenTopic:
+        topic: CompactString
+        partitions: CompactArray[Int32]
+        tag_buffer: TagBuffer
+
+    replica_id: Int32
+    max_wait_ms: Int32
+    min_bytes: Int32
+    max_bytes: Int32
+    isolation_level: Int8
+    session_id: Int32
+    session_epoch: Int32
+    topics: CompactArray[Topic]
+    forgotten_topics_data: CompactArray[ForgottenTopic]
+    rack_id: CompactString
+    tag_buffer: TagBuffer
+
+    def request_api_key(self) -> int: return 1
+
+    def request_api_version(self) -> int: return 12
@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+
+from kafka.datatypes import CompactString, CompactNullableString, Int8, Int16, Int32, TagBuffer
+from kafka.messages import KafkaApiRequest
+
+
+# FindCoordinator Response (Version: 3) => throttle_time_ms error_code error_message node_id host port TAG_BUFFER
+#   throttle_time_ms => INT32
+#   error_code => INT16
+#   error_message => COMPACT_NULLABLE_STRING
+#   node_id => INT32
+#   host => COMPACT_STRING
+#   port => INT32
+@dataclass
+class FindCoordinatorV3ApiResponse:
+    throttle_time_ms: Int32
+    error_code: Int16
+    error_message: CompactNullableString
+    node_id: Int32
+    host: CompactString
+    port: Int32
+    tag_buffer: TagBuffer
+
+
+# FindCoordinator Request (Version: 3) => key key_type TAG_BUFFER
+#   key => COMPACT_STRING
+#   key_type => INT8
+@dataclass
+class FindCoordinatorV3ApiRequest(KafkaApiRequest[FindCoordinatorV3ApiResponse]):
+    key: CompactString
+    key_type: Int8
+    tag_buffer: TagBuffer
+
+    def request_api_key(self) -> int: return 10
+
+    def request_api_version(self) -> int: return 3
+
+    def is_read_only(self) -> bool: return True
@@ -0,0 +1,32 @@
+from dataclasses import dataclass
+
+from kafka.datatypes import CompactString, CompactNullableString, Int16, Int32, TagBuffer
+from kafka.messages import KafkaApiRequest
+
+
+# Heartbeat Response (Version: 4) => throttle_time_ms error_code TAG_BUFFER
+#   throttle_time_ms => INT32
+#   error_code => INT16
+@dataclass
+class HeartbeatV4ApiResponse:
+    throttle_time_ms: Int32
+    error_code: Int16
+    tag_buffer: TagBuffer
+
+
+# Heartbeat Request (Version: 4) => group_id generation_id member_id group_instance_id TAG_BUFFER
+#   group_id => COMPACT_STRING
+#   generation_id => INT32
+#   member_id => COMPACT_STRING
+#   group_instance_id => COMPACT_NULLABLE_STRING
+@dataclass
+class HeartbeatV4ApiRequest(KafkaApiRequest[HeartbeatV4ApiResponse]):
+    group_id: CompactString
+    generation_id: Int32
+    member_id: CompactString
+    group_instance_id: CompactNullableString
+    tag_buffer: TagBuffer
+
+    def request_api_key(self) -> int: return 12
+
+    def request_api_version(self) -> int: return 4
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+
+from kafka.datatypes import CompactArray, CompactBytes, CompactString, CompactNullableString, Int16, Int32, TagBuffer
+from kafka.messages import KafkaApiRequest
+
+
+# JoinGroup Response (Version: 6) => throttle_time_ms error_code generation_id protocol_name leader member_id [members] TAG_BUFFER
+#   throttle_time_ms => INT32
+#   error_code => INT16
+#   generation_id => INT32
+#   protocol_name => COMPACT_STRING
+#   leader => COMPACT_STRING
+#   member_id => COMPACT_STRING
+#   members => member_id group_instance_id metadata TAG_BUFFER
+#     member_id => COMPACT_STRING
+#     group_instance_id => COMPACT_NULLABLE_STRING
+#     metadata => COMPACT_BYTES
+@dataclass
+class JoinGroupV6ApiResponse:
+    @dataclass
+    class Member:
+        member_id: CompactString
+        group_instance_id: CompactNullableString
+        metadata: CompactBytes
+        tag_buffer: TagBuffer
+
+    throttle_time_ms: Int32
+    error_code: Int16
+    generation_id: Int32
+    protocol_name: CompactString
+    leader: CompactString
+    member_id: CompactString
+    members: CompactArray[Member]
+    tag_buffer: TagBuffer
+
+
+# JoinGroup Request (Version: 6) => group_id session_timeout_ms rebalance_timeout_ms member_id group_instance_id protocol_type [protocols] TAG_BUFFER
+#   group_id => COMPACT_STRING
+#   session_timeout_ms => INT32
+#   rebalance_timeout_ms => INT32
+#   member_id => COMPACT_STRING
+#   group_instance_id => COMPACT_NULLABLE_STRING
+#   protocol_type => COMPACT_STRING
+#   protocols => name metadata TAG_BUFFER
+#     name => COMPACT_STRING
+#     metadata => COMPACT_BYTES
+@dataclass
+class JoinGroupV6ApiRequest(KafkaApiRequest[JoinGroupV6ApiResponse]):
+    @dataclass
+    class Protocol:
+        name: CompactString
+        metadata: CompactBytes
+        tag_buffer: TagBuffer
+
+    group_id: CompactString
+    session_timeout_ms: Int32
+    rebalance_timeout_ms: Int32
+    member_id: CompactString
+    group_instance_id: CompactNullableString
+    protocol_type: CompactString
+    protocols: CompactArray[Protocol]
+    tag_buffer: TagBuffer
+
+    def request_api_key(self) -> int: return 11
+
+    def request_api_version(self) -> int: return 6
@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+
+from kafka.datatypes import CompactArray, CompactString, Int8, Int16, Int32, Int64, TagBuffer
+from kafka.messages import KafkaApiRequest
+
+
+# ListOffsets Response (Version: 7) => throttle_time_ms [topics] TAG_BUFFER
+#   throttle_time_ms => INT32
+#   topics => name [partitions] TAG_BUFFER
+#     name => COMPACT_STRING
+#     partitions => partition_index error_code timestamp offset leader_epoch TAG_BUFFER
+#       partition_index => INT32
+#       error_code => INT16
+#       timestamp => INT64
+#       offset => INT64
+#       leader_epoch => INT32
+@dataclass
+class ListOffsetsV7ApiResponse:
+    @dataclass
+    class Topic:
+        @dataclass
+        class Partition:
+            partition_index: Int32
+            error_code: Int16
+            timestamp: Int64
+            offset: Int64
+            leader_epoch: Int32
+            tag_buffer: TagBuffer
+
+        name: CompactString
+        partitions: CompactArray[Partition]
+        tag_buffer: TagBuffer
+
+    throttle_time_ms: Int32
+    topics: CompactArray[Topic]
+    tag_buffer: TagBuffer
+
+
+# ListOffsets Request (Version: 7) => replica_id isolation_level [topics] TAG_BUFFER
+#   replica_id => INT32
+#   isolation_level => INT8
+#   topics => name [partitions] TAG_BUFFER
+#     name => COMPACT_STRING
+#     partitions => partition_index current_leader_epoch timestamp TAG_BUFFER
+#       partition_index => INT32
+#       current_leader_epoch => INT32
+#       timestamp => INT64
+@dataclass
+class ListOffsetsV7ApiRequest(KafkaApiRequest[ListOffsetsV7ApiResponse]):
+    @dataclass
+    class Topic:
+        @dataclass
+        class Partition:
+            partition_index: Int32
+            current_leader_epoch: Int32
+            timestamp: Int64
+            tag_buffer: TagBuffer
+
+        name: CompactString
+        partitions: CompactArray[Partition]
+        tag_buffer: TagBuffer
+
+    replica_id: Int32
+    isolation_level: Int8
+    topics: CompactArray[Topic]
+    tag_buffer: TagBuffer
+
+    def request_api_key(self) -> int: return 2
+
+    def request_api_version(self) -> int: return 7
+
+    def is_read_only(self) -> bool: return True
@@ -0,0 +1,93 @@
+from dataclasses import dataclass
+
+from kafka.datatypes import Boolean, CompactArray, CompactString, CompactNullableString, Int16, Int32, TagBuffer, Uuid
+from kafka.messages import KafkaApiRequest
+
+
+# Metadata Response (Version: 12) => throttle_time_ms [brokers] cluster_id controller_id [topics] TAG_BUFFER
+#   throttle_time_ms => INT32
+#   brokers => node_id host port rack TAG_BUFFER
+#     node_id => INT32
+#     host => COMPACT_STRING
+#     port => INT32
+#     rack => COMPACT_NULLABLE_STRING
+#   cluster_id => COMPACT_NULLABLE_STRING
+#   controller_id => INT32
+#   topics => error_code name topic_id is_internal [partitions] topic_authorized_operations TAG_BUFFER
+#     error_code => INT16
+#     name => COMPACT_NULLABLE_STRING
+#     topic_id => UUID
+#     is_internal => BOOLEAN
+#     partitions => error_code partition_index leader_id leader_epoch [replica_nodes] [isr_nodes] [offline_replicas] TAG_BUFFER
+#       error_code => INT16
+#       partition_index => INT32
+#       leader_id => INT32
+#       leader_epoch => INT32
+#       replica_nodes => INT32
+#       isr_nodes => INT32
+#       offline_replicas => INT32
+#     topic_authorized_operations => INT32
+@dataclass
+class MetadataV12ApiResponse:
+    @dataclass
+    class Broker:
+        node_id: Int32
+        host: CompactString
+        port: Int32
+        rack: CompactNullableString
+        tag_buffer: TagBuffer
+
+    @dataclass
+    class Topic:
+        @dataclass
+        class Partition:
+            error_code: Int16
+            partition_index: Int32
+            leader_id: Int32
+            leader_epoch: Int32
+            replica_nodes: CompactArray[Int32]
+            isr_nodes: CompactArray[Int32]
+            offline_replicas: CompactArray[Int32]
+            tag_buffer: TagBuffer
+
+        error_code: Int16
+        name: CompactNullableString
+        topic_id: Uuid
+        is_internal: Boolean
+        partitions: CompactArray[Partition]
+        topic_authorized_operations: Int32
+        tag_buffer: TagBuffer
+
+    throttle_time_ms: Int32
+    brokers: CompactArray[Broker]
+    cluster_id: CompactNullableString
+    controller_id: Int32
+    topics: CompactArray[Topic]
+    tag_buffer: TagBuffer
+
+
+# Metadata Request (Version: 12) => [topics] allow_auto_topic_creation include_topic_authorized_operations TAG_BUFFER
+#   topics => topic_id name TAG_BUFFER
+#     topic_id => UUID
+#     name => COMPACT_NULLABLE_STRING
+#   allow_auto_topic_creation => BOOLEAN
+#   include_topic_authorized_operations => BOOLEAN
+@dataclass
+class MetadataV12ApiRequest(KafkaApiRequest[MetadataV12ApiResponse]):
+    @dataclass
+    class Topic:
+        topic_id: Uuid
+        name: CompactNullableString
+        tag_buffer: TagBuffer
+
+    topics: CompactArray[Topic]
+    allow_auto_topic_creation: Boolean
+    include_topic_authorized_operations: Boolean
+    tag_buffer: TagBuffer
+
+    def request_api_key(self) -> int: return 3
+
+    def request_api_version(self) -> int: return 12
+
+    # unless it creates the topics it asks for
+    def is_read_only(self) -> bool: return not self.allow_auto_topic_creation.val
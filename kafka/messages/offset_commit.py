@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+
+from kafka.datatypes import CompactArray, CompactString, CompactNullableString, Int16, Int32, Int64, TagBuffer
+from kafka.messages import KafkaApiRequest
+
+
+# OffsetCommit Response (Version: 8) => throttle_time_ms [topics] TAG_BUFFER
+#   throttle_time_ms => INT32
+#   topics => name [partitions] TAG_BUFFER
+#     name => COMPACT_STRING
+#     partitions => partition_index error_code TAG_BUFFER
+#       partition_index => INT32
+#       error_code => INT16
+@dataclass
+class OffsetCommitV8ApiResponse:
+    @dataclass
+    class Topic:
+        @dataclass
+        class Partition:
+            partition_index: Int32
+            error_code: Int16
+            tag_buffer: TagBuffer
+
+        name: CompactString
+        partitions: CompactArray[Partition]
+        tag_buffer: TagBuffer
+
+    throttle_time_ms: Int32
+    topics: CompactArray[Topic]
+    tag_buffer: TagBuffer
+
+
+# OffsetCommit Request (Version: 8) => group_id generation_id member_id group_instance_id [topics] TAG_BUFFER
+#   group_id => COMPACT_STRING
+#   generation_id => INT32
+#   member_id => COMPACT_STRING
+#   group_instance_id => COMPACT_NULLABLE_STRING
+#   topics => name [partitions] TAG_BUFFER
+#     name => COMPACT_STRING
+#     partitions => partition_index committed_offset committed_leader_epoch committed_metadata TAG_BUFFER
+#       partition_index => INT32
+#       committed_offset => INT64
+#       committed_leader_epoch => INT32
+#       committed_metadata => COMPACT_NULLABLE_STRING
+@dataclass
+class OffsetCommitV8ApiRequest(KafkaApiRequest[OffsetCommitV8ApiResponse]):
+    @dataclass
+    class Topic:
+        @dataclass
+        class Partition:
+            partition_index: Int32
+            committed_offset: Int64
+            committed_leader_epoch: Int32
+            committed_metadata: CompactNullableString
+            tag_buffer: TagBuffer
+
+        name: CompactString
+        partitions: CompactArray[Partition]
+        tag_buffer: TagBuffer
+
+    group_id: CompactString
+    generation_id: Int32
+    member_id: CompactString
+    group_instance_id: CompactNullableString
+    topics: CompactArray[Topic]
+    tag_buffer: TagBuffer
+
+    def request_api_key(self) -> int: return 8
+
+    def request_api_version(self) -> int: return 8
@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+
+from kafka.datatypes import Boolean, CompactArray, CompactString, CompactNullableString, Int16, Int32, Int64, TagBuffer
+from kafka.messages import KafkaApiRequest
+
+
+# OffsetFetch Response (Version: 7) => throttle_time_ms [topics] error_code TAG_BUFFER
+#   throttle_time_ms => INT32
+#   topics => name [partitions] TAG_BUFFER
+#     name => COMPACT_STRING
+#     partitions => partition_index committed_offset committed_leader_epoch metadata error_code TAG_BUFFER
+#       partition_index => INT32
+#       committed_offset => INT64
+#       committed_leader_epoch => INT32
+#       metadata => COMPACT_NULLABLE_STRING
+#       error_code => INT16
+#   error_code => INT16
+@dataclass
+class OffsetFetchV7ApiResponse:
+    @dataclass
+    class Topic:
+        @dataclass
+        class Partition:
+            partition_index: Int32
+            committed_offset: Int64
+            committed_leader_epoch: Int32
+            metadata: CompactNullableString
+            error_code: Int16
+            tag_buffer: TagBuffer
+
+        name: CompactString
+        partitions: CompactArray[Partition]
+        tag_buffer: TagBuffer
+
+    throttle_time_ms: Int32
+    topics: CompactArray[Topic]
+    error_code: Int16
+    tag_buffer: TagBuffer
+
+
+# OffsetFetch Request (Version: 7) => group_id [topics] require_stable TAG_BUFFER
+#   group_id => COMPACT_STRING
+#   topics => name [partition_indexes] TAG_BUFFER
+#     name => COMPACT_STRING
+#     partition_indexes => INT32
+#   require_stable => BOOLEAN
+@dataclass
+class OffsetFetchV7ApiRequest(KafkaApiRequest[OffsetFetchV7ApiResponse]):
+    @dataclass
+    class Topic:
+        name: CompactString
+        partition_indexes: CompactArray[Int32]
+        tag_buffer: TagBuffer
+
+    group_id: CompactString
+    topics: CompactArray[Topic]
+    require_stable: Boolean
+    tag_buffer: TagBuffer
+
+    def request_api_key(self) -> int: return 9
+
+    def request_api_version(self) -> int: return 7
+
+    def is_read_only(self) -> bool: return True
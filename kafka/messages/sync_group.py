@@ -0,0 +1,44 @@
+from dataclasses import dataclass
+
+from kafka.datatypes import CompactArray, CompactBytes, CompactString, CompactNullableString, Int16, Int32, TagBuffer
+from kafka.messages import KafkaApiRequest
+
+
+# SyncGroup Response (Version: 4) => throttle_time_ms error_code assignment TAG_BUFFER
+#   throttle_time_ms => INT32
+#   error_code => INT16
+#   assignment => COMPACT_BYTES
+@dataclass
+class SyncGroupV4ApiResponse:
+    throttle_time_ms: Int32
+    error_code: Int16
+    assignment: CompactBytes
+    tag_buffer: TagBuffer
+
+
+# SyncGroup Request (Version: 4) => group_id generation_id member_id group_instance_id [assignments] TAG_BUFFER
+#   group_id => COMPACT_STRING
+#   generation_id => INT32
+#   member_id => COMPACT_STRING
+#   group_instance_id => COMPACT_NULLABLE_STRING
+#   assignments => member_id assignment TAG_BUFFER
+#     member_id => COMPACT_STRING
+#     assignment => COMPACT_BYTES
+@dataclass
+class SyncGroupV4ApiRequest(KafkaApiRequest[SyncGroupV4ApiResponse]):
+    @dataclass
+    class Assignment:
+        member_id: CompactString
+        assignment: CompactBytes
+        tag_buffer: TagBuffer
+
+    group_id: CompactString
+    generation_id: Int32
+    member_id: CompactString
+    group_instance_id: CompactNullableString
+    assignments: CompactArray[Assignment]
+    tag_buffer: TagBuffer
+
+    def request_api_key(self) -> int: return 14
+
+    def request_api_version(self) -> int: return 4
@@ -0,0 +1,285 @@
+import hashlib
+import struct
+from dataclasses import dataclass, field
+from uuid import UUID
+
+import kafka.dataclass_binding
+import kafka.messages
+from kafka.topic_partition import TopicPartition
+from kafka.varint import read_unsigned_varint
+
+_INT16 = struct.Struct(">h")
+_INT32 = struct.Struct(">i")
+_PARTITION_FIXED = struct.Struct(">hiii")  # error_code partition_index leader_id leader_epoch
+_UUID_SIZE = 16
+
+
+# Cheap change detection between successive Metadata v12 responses.
+#
+# A snapshot walks the raw response body once, decoding brokers but only delimiting topics: each topic keeps the
+# offsets of its bytes in the body and a fingerprint of them. Diffing two snapshots compares fingerprints, so an
+# unchanged topic costs one comparison no matter how many partitions it has, and partitions are only decoded for the
+# topics whose bytes changed.
+
+@dataclass(frozen=True)
+class BrokerInfo:
+    node_id: int
+    host: str
+    port: int
+    rack: None | str
+
+
+@dataclass(frozen=True)
+class PartitionState:
+    partition_index: int
+    error_code: int
+    leader_id: int
+    leader_epoch: int
+    replica_nodes: tuple[int, ...]
+    isr_nodes: tuple[int, ...]
+    offline_replicas: tuple[int, ...]
+
+
+class TopicSnapshot:
+    name: None | str
+    topic_id: UUID
+    error_code: int
+    is_internal: bool
+    topic_authorized_operations: int
+    fingerprint: bytes
+    __body: bytes
+    __partitions_offset: int
+    __partitions: None | dict[int, PartitionState]
+
+    def __init__(self,
+                 name: None | str,
+                 topic_id: UUID,
+                 error_code: int,
+                 is_internal: bool,
+                 topic_authorized_operations: int,
+                 fingerprint: bytes,
+                 body: bytes,
+                 partitions_offset: int):
+        self.name = name
+        self.topic_id = topic_id
+        self.error_code = error_code
+        self.is_internal = is_internal
+        self.topic_authorized_operations = topic_authorized_operations
+        self.fingerprint = fingerprint
+        self.__body = body
+        self.__partitions_offset = partitions_offset
+        self.__partitions = None
+
+    # Decoded on first access
+    def partitions(self) -> dict[int, PartitionState]:
+        if self.__partitions is None:
+            self.__partitions = _read_partitions(memoryview(self.__body), self.__partitions_offset)
+        return self.__partitions
+
+
+# error_code, is_internal or topic_authorized_operations changed
+@dataclass
+class TopicChange:
+    topic: str
+    old: TopicSnapshot
+    new: TopicSnapshot
+
+
+@dataclass
+class PartitionChange:
+    topic_partition: TopicPartition
+    old: PartitionState
+    new: PartitionState
+
+
+@dataclass
+class MetadataDelta:
+    brokers_joined: list[BrokerInfo] = field(default_factory=list)
+    brokers_left: list[BrokerInfo] = field(default_factory=list)
+    brokers_updated: list[BrokerInfo] = field(default_factory=list)  # same node id, new address or rack
+    controller_changed: None | tuple[int, int] = None  # (old, new) controller id
+    topics_created: list[str] = field(default_factory=list)
+    topics_deleted: list[str] = field(default_factory=list)  # a topic re-created with a new id is deleted & created
+    topic_changes: list[TopicChange] = field(default_factory=list)
+    partitions_added: list[TopicPartition] = field(default_factory=list)
+    partitions_removed: list[TopicPartition] = field(default_factory=list)
+    leader_changes: list[PartitionChange] = field(default_factory=list)
+    epoch_changes: list[PartitionChange] = field(default_factory=list)  # epoch bumped, same leader
+    isr_changes: list[PartitionChange] = field(default_factory=list)
+    replica_changes: list[PartitionChange] = field(default_factory=list)
+    error_changes: list[PartitionChange] = field(default_factory=list)
+    topics_compared: int = 0  # topics whose fingerprint differed, and whose partitions were decoded
+
+    def is_empty(self) -> bool:
+        return not (self.brokers_joined or self.brokers_left or self.brokers_updated or self.controller_changed or
+                    self.topics_created or self.topics_deleted or self.topic_changes or self.partitions_added or
+                    self.partitions_removed or self.leader_changes or self.epoch_changes or self.isr_changes or
+                    self.replica_changes or self.error_changes)
+
+
+@dataclass
+class MetadataSnapshot:
+    throttle_time_ms: int
+    brokers: dict[int, BrokerInfo]
+    cluster_id: None | str
+    controller_id: int
+    topics: dict[str, TopicSnapshot]  # by name, or by id for topics returned without one
+
+    # Builds a snapshot out of the body of a Metadata v12 response, i.e. what follows Response Header v1
+    @staticmethod
+    def from_bytes(body: bytes) -> 'MetadataSnapshot':
+        view = memoryview(body)
+        (throttle_time_ms,) = _INT32.unpack_from(view, 0)
+        offset = _INT32.size
+
+        brokers = {}
+        (count, offset) = _read_array_length(view, offset)
+        for _ in range(count):
+            (node_id,) = _INT32.unpack_from(view, offset)
+            (host, offset) = _read_compact_nullable_string(view, offset + _INT32.size)
+            (port,) = _INT32.unpack_from(view, offset)
+            (rack, offset) = _read_compact_nullable_string(view, offset + _INT32.size)
+            offset = _skip_tag_buffer(view, offset)
+            brokers[node_id] = BrokerInfo(node_id, host, port, rack)
+
+        (cluster_id, offset) = _read_compact_nullable_string(view, offset)
+        (controller_id,) = _INT32.unpack_from(view, offset)
+        offset += _INT32.size
+
+        topics = {}
+        (count, offset) = _read_array_length(view, offset)
+        for _ in range(count):
+            start = offset
+            (error_code,) = _INT16.unpack_from(view, offset)
+            (name, offset) = _read_compact_nullable_string(view, offset + _INT16.size)
+            topic_id = UUID(bytes=bytes(view[offset:offset + _UUID_SIZE]))
+            is_internal = view[offset + _UUID_SIZE] != 0
+            partitions_offset = offset + _UUID_SIZE + 1
+            offset = _skip_partitions(view, partitions_offset)
+            (topic_authorized_operations,) = _INT32.unpack_from(view, offset)
+            offset = _skip_tag_buffer(view, offset + _INT32.size)
+            fingerprint = hashlib.blake2b(view[start:offset], digest_size=16).digest()
+            topics[name if name is not None else str(topic_id)] = TopicSnapshot(
+                name, topic_id, error_code, is_internal, topic_authorized_operations, fingerprint, body,
+                partitions_offset
+            )
+
+        return MetadataSnapshot(throttle_time_ms, brokers, cluster_id, controller_id, topics)
+
+    # Convenience for responses that were already decoded, re-encodes them first
+    @staticmethod
+    def from_response(response: kafka.messages.MetadataV12ApiResponse) -> 'MetadataSnapshot':
+        return MetadataSnapshot.from_bytes(kafka.dataclass_binding.serialize_data_class(response))
+
+    # What changed from this snapshot to a newer one
+    def diff(self, newer: 'MetadataSnapshot') -> MetadataDelta:
+        delta = MetadataDelta()
+
+        for node_id, broker in newer.brokers.items():
+            old = self.brokers.get(node_id)
+            if old is None:
+                delta.brokers_joined.append(broker)
+            elif old != broker:
+                delta.brokers_updated.append(broker)
+        delta.brokers_left = [broker for node_id, broker in self.brokers.items() if node_id not in newer.brokers]
+        if self.controller_id != newer.controller_id:
+            delta.controller_changed = (self.controller_id, newer.controller_id)
+
+        for name, topic in newer.topics.items():
+            old = self.topics.get(name)
+            if old is None or old.topic_id != topic.topic_id:
+                delta.topics_created.append(name)
+                if old is not None:
+                    delta.topics_deleted.append(name)
+            elif old.fingerprint != topic.fingerprint:
+                delta.topics_compared += 1
+                if (old.error_code, old.is_internal, old.topic_authorized_operations) != \
+                        (topic.error_code, topic.is_internal, topic.topic_authorized_operations):
+                    delta.topic_changes.append(TopicChange(name, old, topic))
+                _diff_partitions(name, old.partitions(), topic.partitions(), delta)
+        delta.topics_deleted.extend(name for name in self.topics if name not in newer.topics)
+
+        return delta
+
+
+def _diff_partitions(topic: str,
+                     old_partitions: dict[int, PartitionState],
+                     new_partitions: dict[int, PartitionState],
+                     delta: MetadataDelta):
+    for index, new in new_partitions.items():
+        old = old_partitions.get(index)
+        if old is None:
+            delta.partitions_added.append(TopicPartition(topic, index))
+            continue
+        if old == new:
+            continue
+        change = PartitionChange(TopicPartition(topic, index), old, new)
+        if old.leader_id != new.leader_id:
+            delta.leader_changes.append(change)
+        elif old.leader_epoch != new.leader_epoch:
+            delta.epoch_changes.append(change)
+        if old.isr_nodes != new.isr_nodes:
+            delta.isr_changes.append(change)
+        if old.replica_nodes != new.replica_nodes or old.offline_replicas != new.offline_replicas:
+            delta.replica_changes.append(change)
+        if old.error_code != new.error_code:
+            delta.error_changes.append(change)
+    delta.partitions_removed.extend(TopicPartition(topic, index) for index in old_partitions
+                                    if index not in new_partitions)
+
+
+# The following walk the raw bytes of a response. Each takes the offset to start from and returns the offset following
+# what it read.
+
+# Null arrays are read as empty ones
+def _read_array_length(view: memoryview, offset: int) -> tuple[int, int]:
+    (length, offset) = read_unsigned_varint(view, offset)
+    return max(length - 1, 0), offset
+
+
+def _read_compact_nullable_string(view: memoryview, offset: int) -> tuple[None | str, int]:
+    (length, offset) = read_unsigned_varint(view, offset)
+    if length == 0:
+        return None, offset
+    end = offset + length - 1
+    return str(view[offset:end], "UTF-8"), end
+
+
+def _read_int_32_array(view: memoryview, offset: int) -> tuple[tuple[int, ...], int]:
+    (count, offset) = _read_array_length(view, offset)
+    end = offset + count * _INT32.size
+    return struct.unpack_from(f">{count}i", view, offset), end
+
+
+def _skip_tag_buffer(view: memoryview, offset: int) -> int:
+    (count, offset) = read_unsigned_varint(view, offset)
+    for _ in range(count):
+        (_, offset) = read_unsigned_varint(view, offset)  # tag
+        (size, offset) = read_unsigned_varint(view, offset)
+        offset += size
+    return offset
+
+
+def _skip_partitions(view: memoryview, offset: int) -> int:
+    (count, offset) = _read_array_length(view, offset)
+    for _ in range(count):
+        offset += _PARTITION_FIXED.size
+        for _ in range(3):  # replica_nodes, isr_nodes, offline_replicas
+            (length, offset) = _read_array_length(view, offset)
+            offset += length * _INT32.size
+        offset = _skip_tag_buffer(view, offset)
+    return offset
+
+
+def _read_partitions(view: memoryview, offset: int) -> dict[int, PartitionState]:
+    result = {}
+    (count, offset) = _read_array_length(view, offset)
+    for _ in range(count):
+        (error_code, partition_index, leader_id, leader_epoch) = _PARTITION_FIXED.unpack_from(view, offset)
+        (replica_nodes, offset) = _read_int_32_array(view, offset + _PARTITION_FIXED.size)
+        (isr_nodes, offset) = _read_int_32_array(view, offset)
+        (offline_replicas, offset) = _read_int_32_array(view, offset)
+        offset = _skip_tag_buffer(view, offset)
+        result[partition_index] = PartitionState(partition_index, error_code, leader_id, leader_epoch,
+                                                 replica_nodes, isr_nodes, offline_replicas)
+    return result
@@ -0,0 +1,290 @@
+import time
+from dataclasses import dataclass, field
+from typing import Iterable
+from uuid import UUID
+
+import kafka.messages
+from kafka.client import SyncKafkaClient
+from kafka.datatypes import Boolean, CompactArray, CompactNullableString, CompactString, Int8, Int32, Int64, Uuid, \
+    EMPTY_TAG_BUFFER
+from kafka.messages import FindCoordinatorV3ApiRequest, ListOffsetsV7ApiRequest, MetadataV12ApiRequest, \
+    OffsetCommitV8ApiRequest, OffsetFetchV7ApiRequest
+from kafka.metadata_snapshot import MetadataSnapshot
+from kafka.topic_partition import TopicPartition
+
+LATEST_TIMESTAMP = -1
+EARLIEST_TIMESTAMP = -2
+
+NO_COMMITTED_OFFSET = -1
+
+COORDINATOR_KEY_TYPE_GROUP = 0
+
+UNKNOWN_TOPIC_OR_PARTITION = 3
+LEADER_NOT_AVAILABLE = 5
+NOT_LEADER_OR_FOLLOWER = 6
+
+# The leader known from metadata is gone or moved, refreshing metadata finds the new one
+_LEADER_ERRORS = (LEADER_NOT_AVAILABLE, NOT_LEADER_OR_FOLLOWER)
+
+
+# Offsets of many partitions across a cluster, in as few round trips as possible.
+#
+# Partitions are grouped by the broker that can answer for them (the leader for ListOffsets, the group coordinator
+# for OffsetFetch & OffsetCommit), then one batched request is written to every broker involved before any response
+# is read, so that all of them are in flight at the same time and a call takes about as long as the slowest broker.
+
+@dataclass
+class OffsetTable:
+    offsets: dict[TopicPartition, int] = field(default_factory=dict)
+    errors: dict[TopicPartition, int] = field(default_factory=dict)  # error code of every partition that failed
+
+
+@dataclass
+class PartitionLag:
+    committed_offset: int  # NO_COMMITTED_OFFSET when the group never committed one
+    end_offset: int
+    lag: None | int  # None without a committed offset
+
+
+# A connection that failed is closed and forgotten, the next request to the same broker connects again, so that a broker
+# restart or a timeout doesn't break the client for good.
+class OffsetsClient:
+    __bootstrap_server: str
+    __bootstrap: SyncKafkaClient
+    __clients: dict[int, SyncKafkaClient]
+    __addresses: dict[int, str]  # of brokers by node id, as learnt from Metadata and FindCoordinator
+    __timeout: None | float
+    metadata: None | MetadataSnapshot
+    __leaders: dict[TopicPartition, int]
+
+    def __init__(self, bootstrap_server: str, timeout: None | float = None):
+        self.__bootstrap_server = bootstrap_server
+        self.__bootstrap = SyncKafkaClient(bootstrap_server, connect_timeout=timeout)
+        self.__clients = {}
+        self.__addresses = {}
+        self.__timeout = timeout
+        self.metadata = None
+        self.__leaders = {}
+
+    # Fetches brokers and partition leaders, of the given topics or of all of them
+    def refresh_metadata(self, topics: None | Iterable[str] = None):
+        request = MetadataV12ApiRequest(
+            topics=CompactArray(None if topics is None else [
+                MetadataV12ApiRequest.Topic(Uuid(UUID(int=0)), CompactNullableString(topic), EMPTY_TAG_BUFFER)
+                for topic in topics
+            ]),
+            allow_auto_topic_creation=Boolean(False),
+            include_topic_authorized_operations=Boolean(False),
+            tag_buffer=EMPTY_TAG_BUFFER
+        )
+        bootstrap = self.__bootstrap_client()
+        try:
+            body = bootstrap.send_raw(request, self.__timeout)
+        except OSError:
+            bootstrap.close()
+            raise
+        self.metadata = MetadataSnapshot.from_bytes(body)
+        for broker in self.metadata.brokers.values():
+            self.__addresses[broker.node_id] = f"{broker.host}:{broker.port}"
+        self.__leaders = {
+            TopicPartition(name, index): partition.leader_id
+            for name, topic in self.metadata.topics.items()
+            for index, partition in topic.partitions().items()
+        }
+
+    def __bootstrap_client(self) -> SyncKafkaClient:
+        if self.__bootstrap.is_closed():
+            self.__bootstrap = SyncKafkaClient(self.__bootstrap_server, connect_timeout=self.__timeout)
+        return self.__bootstrap
+
+    def __client(self, node_id: int) -> SyncKafkaClient:
+        client = self.__clients.get(node_id)
+        if client is None or client.is_closed():
+            client = SyncKafkaClient(self.__addresses[node_id], connect_timeout=self.__timeout)
+            self.__clients[node_id] = client
+        return client
+
+    def __evict(self, node_id: int):
+        client = self.__clients.pop(node_id, None)
+        if client is not None:
+            client.close()
+
+    # Sends each request to its broker at once, then collects the responses
+    def __fan_out(self, requests: dict[int, kafka.messages.KafkaApiRequest]) -> dict[int, object]:
+        deadline = None if self.__timeout is None else time.monotonic() + self.__timeout
+        in_flight = {}
+        responses = {}
+        node_id = None
+        try:
+            for node_id, request in requests.items():
+                in_flight[node_id] = self.__client(node_id).write_request(request, deadline)
+            for node_id, correlation_id in in_flight.items():
+                responses[node_id] = self.__client(node_id).read_response(requests[node_id], correlation_id, deadline)
+        except OSError:
+            self.__evict(node_id)
+            raise
+        return responses
+
+    # Offsets of the given partitions at a timestamp, LATEST_TIMESTAMP for end offsets or EARLIEST_TIMESTAMP for the
+    # first available ones. Partitions whose leader isn't known (metadata is refreshed once to find them) are reported
+    # with UNKNOWN_TOPIC_OR_PARTITION. Partitions whose leader moved or isn't among the known brokers are retried once
+    # after refreshing metadata.
+    def list_offsets(self, partitions: Iterable[TopicPartition], timestamp: int = LATEST_TIMESTAMP) -> OffsetTable:
+        partitions = list(partitions)
+        if self.metadata is None or any(tp not in self.__leaders for tp in partitions):
+            self.refresh_metadata({tp.topic for tp in partitions})
+
+        result = self.__list_offsets(partitions, timestamp)
+        stale = [tp for tp, error_code in result.errors.items() if error_code in _LEADER_ERRORS]
+        if stale:
+            self.refresh_metadata({tp.topic for tp in partitions})
+            for tp in stale:
+                del result.errors[tp]
+            retried = self.__list_offsets(stale, timestamp)
+            result.offsets.update(retried.offsets)
+            result.errors.update(retried.errors)
+        return result
+
+    def __list_offsets(self, partitions: list[TopicPartition], timestamp: int) -> OffsetTable:
+        result = OffsetTable()
+        by_leader = {}
+        for tp in partitions:
+            leader = self.__leaders.get(tp)
+            if leader is None:
+                result.errors[tp] = UNKNOWN_TOPIC_OR_PARTITION
+            elif leader not in self.__addresses:
+                # -1 while a new leader is elected, or a node missing from the brokers of the metadata
+                result.errors[tp] = LEADER_NOT_AVAILABLE
+            else:
+                by_leader.setdefault(leader, {}).setdefault(tp.topic, []).append(tp.partition)
+
+        requests = {leader: ListOffsetsV7ApiRequest(
+            replica_id=Int32(-1),
+            isolation_level=Int8(0),
+            topics=CompactArray([
+                ListOffsetsV7ApiRequest.Topic(
+                    name=CompactString(topic),
+                    partitions=CompactArray([
+                        ListOffsetsV7ApiRequest.Topic.Partition(Int32(index), Int32(-1), Int64(timestamp),
+                                                                EMPTY_TAG_BUFFER)
+                        for index in indexes
+                    ]),
+                    tag_buffer=EMPTY_TAG_BUFFER
+                )
+                for topic, indexes in topics.items()
+            ]),
+            tag_buffer=EMPTY_TAG_BUFFER
+        ) for leader, topics in by_leader.items()}
+
+        for response in self.__fan_out(requests).values():
+            for topic in response.topics.val:
+                for partition in topic.partitions.val:
+                    tp = TopicPartition(topic.name.val, partition.partition_index.val)
+                    if partition.error_code.val != 0:
+                        result.errors[tp] = partition.error_code.val
+                    else:
+                        result.offsets[tp] = partition.offset.val
+        return result
+
+    def find_coordinator(self, group_id: str) -> int:
+        bootstrap = self.__bootstrap_client()
+        try:
+            response = bootstrap.send(FindCoordinatorV3ApiRequest(
+                key=CompactString(group_id),
+                key_type=Int8(COORDINATOR_KEY_TYPE_GROUP),
+                tag_buffer=EMPTY_TAG_BUFFER
+            ), self.__timeout)
+        except OSError:
+            bootstrap.close()
+            raise
+        if response.error_code.val != 0:
+            raise Exception(f"Finding the coordinator of {group_id} failed with error code {response.error_code.val}:"
+                            f" {response.error_message.val}")
+        self.__addresses[response.node_id.val] = f"{response.host.val}:{response.port.val}"
+        return response.node_id.val
+
+    # Offsets committed by a group, of the given partitions or of all the partitions it committed for
+    def committed_offsets(self, group_id: str, partitions: None | Iterable[TopicPartition] = None) -> OffsetTable:
+        topics = None
+        if partitions is not None:
+            topics = {}
+            for tp in partitions:
+                topics.setdefault(tp.topic, []).append(Int32(tp.partition))
+        coordinator = self.find_coordinator(group_id)
+
+        request = OffsetFetchV7ApiRequest(
+            group_id=CompactString(group_id),
+            topics=CompactArray(None if topics is None else [
+                OffsetFetchV7ApiRequest.Topic(CompactString(topic), CompactArray(indexes), EMPTY_TAG_BUFFER)
+                for topic, indexes in topics.items()
+            ]),
+            require_stable=Boolean(False),
+            tag_buffer=EMPTY_TAG_BUFFER
+        )
+        response = self.__fan_out({coordinator: request})[coordinator]
+        if response.error_code.val != 0:
+            raise Exception(f"Fetching offsets of {group_id} failed with error code {response.error_code.val}")
+
+        result = OffsetTable()
+        for topic in response.topics.val:
+            for partition in topic.partitions.val:
+                tp = TopicPartition(topic.name.val, partition.partition_index.val)
+                if partition.error_code.val != 0:
+                    result.errors[tp] = partition.error_code.val
+                else:
+                    result.offsets[tp] = partition.committed_offset.val
+        return result
+
+    # Commits offsets for a group. Outside a consumer group generation (e.g. admin tools) leave generation_id and
+    # member_id as they are. Returns the error code of every partition that failed.
+    def commit_offsets(self,
+                       group_id: str,
+                       offsets: dict[TopicPartition, int],
+                       generation_id: int = -1,
+                       member_id: str = "",
+                       group_instance_id: None | str = None) -> dict[TopicPartition, int]:
+        coordinator = self.find_coordinator(group_id)
+
+        topics = {}
+        for tp, offset in offsets.items():
+            topics.setdefault(tp.topic, []).append(OffsetCommitV8ApiRequest.Topic.Partition(
+                Int32(tp.partition), Int64(offset), Int32(-1), CompactNullableString(None), EMPTY_TAG_BUFFER
+            ))
+        request = OffsetCommitV8ApiRequest(
+            group_id=CompactString(group_id),
+            generation_id=Int32(generation_id),
+            member_id=CompactString(member_id),
+            group_instance_id=CompactNullableString(group_instance_id),
+            topics=CompactArray([
+                OffsetCommitV8ApiRequest.Topic(CompactString(topic), CompactArray(partitions), EMPTY_TAG_BUFFER)
+                for topic, partitions in topics.items()
+            ]),
+            tag_buffer=EMPTY_TAG_BUFFER
+        )
+        response = self.__fan_out({coordinator: request})[coordinator]
+        return {TopicPartition(topic.name.val, partition.partition_index.val): partition.error_code.val
+                for topic in response.topics.val for partition in topic.partitions.val
+                if partition.error_code.val != 0}
+
+    # Lag of a group on the given partitions, or on all the partitions it committed for
+    def consumer_lag(self, group_id: str, partitions: None | Iterable[TopicPartition] = None) \
+            -> dict[TopicPartition, PartitionLag]:
+        partitions = None if partitions is None else list(partitions)
+        committed = self.committed_offsets(group_id, partitions)
+        wanted = list(committed.offsets) if partitions is None else list(partitions)
+        end_offsets = self.list_offsets(wanted, LATEST_TIMESTAMP)
+
+        result = {}
+        for tp in wanted:
+            end_offset = end_offsets.offsets.get(tp)
+            if end_offset is None:
+                continue
+            committed_offset = committed.offsets.get(tp, NO_COMMITTED_OFFSET)
+            lag = None if committed_offset == NO_COMMITTED_OFFSET else max(end_offset - committed_offset, 0)
+            result[tp] = PartitionLag(committed_offset, end_offset, lag)
+        return result
+
+    def close(self):
+        self.__bootstrap.close()
+        for client in self.__clients.values():
+            client.close()
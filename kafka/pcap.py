@@ -0,0 +1,174 @@
+import mmap
+import struct
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+
+_MAGIC = struct.Struct("<I")
+_PCAP_HEADER_SIZE = 24
+# byte order and timestamp resolution (in seconds) by magic number, as read in little endian
+_PCAP_FORMATS = {0xa1b2c3d4: ("<", 1e-6), 0xa1b23c4d: ("<", 1e-9), 0xd4c3b2a1: (">", 1e-6), 0x4d3cb2a1: (">", 1e-9)}
+_PCAPNG_MAGIC = 0x0a0d0d0a
+_ETHER_TYPE = struct.Struct(">H")
+_IPV4_HEADER = struct.Struct(">BxHxxHxB")  # version_ihl total_length flags_fragment_offset protocol
+_IPV6_HEADER = struct.Struct(">4xHB")  # payload_length next_header
+_TCP_HEADER = struct.Struct(">HHI4xBB")  # source_port destination_port sequence_number data_offset flags
+
+# link types of https://www.tcpdump.org/linktypes.html
+_LINKTYPE_NULL = 0
+_LINKTYPE_ETHERNET = 1
+_LINKTYPE_RAW = 101
+_LINKTYPE_LINUX_SLL = 113
+_LINKTYPE_LINUX_SLL2 = 276
+# header sizes of the other link types, whose IP version is read from the packet itself
+_LINK_HEADER_SIZES = {_LINKTYPE_NULL: 4, _LINKTYPE_RAW: 0, _LINKTYPE_LINUX_SLL: 16, _LINKTYPE_LINUX_SLL2: 20}
+
+_ETHERTYPE_IPV4 = 0x0800
+_ETHERTYPE_IPV6 = 0x86dd
+_ETHERTYPE_VLAN = 0x8100
+_IPPROTO_TCP = 6
+_TCP_SYN = 0x02
+
+
+# Reassembled bytes of one direction of a TCP connection, along with the capture time of every chunk of them
+@dataclass
+class TcpStream:
+    data: bytearray
+    chunk_offsets: array  # of the first byte of every chunk, in data
+    chunk_timestamps: array  # seconds since the epoch, when every chunk was received (see _Reassembler)
+
+    # Capture time of the packet that completed the stream up to the byte at the given offset
+    def timestamp_at(self, offset: int) -> float:
+        return self.chunk_timestamps[bisect_right(self.chunk_offsets, offset) - 1]
+
+
+# Puts TCP segments back in sequence order: retransmitted bytes are skipped, and segments arriving ahead of a missing
+# one are held back until it arrives, then timestamped with it. A segment that was never captured ends the stream
+# there.
+class _Reassembler:
+    __stream: TcpStream
+    __next_seq: None | int  # sequence number of the next byte, unwrapped past 2**32
+    __pending: dict[int, bytes]
+
+    def __init__(self):
+        self.__stream = TcpStream(bytearray(), array("q"), array("d"))
+        self.__next_seq = None
+        self.__pending = {}
+
+    def add(self, seq: int, syn: bool, payload: bytes, timestamp: float):
+        if syn:
+            self.__next_seq = seq + 1
+            return
+        if not payload:
+            return
+        if self.__next_seq is None:  # the capture started after the handshake
+            self.__next_seq = seq
+        seq = self.__next_seq + (seq - self.__next_seq + 2 ** 31) % 2 ** 32 - 2 ** 31
+        if seq > self.__next_seq:
+            if len(payload) > len(self.__pending.get(seq, b'')):
+                self.__pending[seq] = payload
+            return
+        self.__append(seq, payload, timestamp)
+        while self.__pending:
+            seq = min(self.__pending)
+            if seq > self.__next_seq:
+                break
+            self.__append(seq, self.__pending.pop(seq), timestamp)
+
+    def __append(self, seq: int, payload: bytes, timestamp: float):
+        skip = self.__next_seq - seq
+        if skip >= len(payload):
+            return
+        self.__stream.chunk_offsets.append(len(self.__stream.data))
+        self.__stream.chunk_timestamps.append(timestamp)
+        self.__stream.data += payload[skip:]
+        self.__next_seq += len(payload) - skip
+
+    def stream(self) -> TcpStream: return self.__stream
+
+
+# Reads both directions of the first TCP connection to the given port out of a pcap file, as saved by tcpdump or
+# Wireshark ("Wireshark/tcpdump - pcap" format, pcapng files can be converted with `editcap -F pcap`), with packets
+# captured whole (no snapshot length cutting them). Returns the client to broker stream, then the broker to client
+# one. Packets of other connections are ignored.
+def read_tcp_connection(path: str, broker_port: int = 9092) -> tuple[TcpStream, TcpStream]:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        if len(buf) < _PCAP_HEADER_SIZE:
+            raise Exception(f"{path} is too small to be a pcap file")
+        (magic,) = _MAGIC.unpack_from(buf, 0)
+        if magic == _PCAPNG_MAGIC:
+            raise Exception(f"{path} is a pcapng file, convert it with `editcap -F pcap`")
+        if magic not in _PCAP_FORMATS:
+            raise Exception(f"{path} isn't a pcap file (magic number {magic:#x})")
+        (byte_order, resolution) = _PCAP_FORMATS[magic]
+        (link_type,) = struct.unpack_from(byte_order + "I", buf, 20)
+        link_type &= 0xffff  # the upper bits hold the FCS length
+        record_header = struct.Struct(byte_order + "IIII")  # ts_sec ts_fraction captured_length original_length
+
+        requests = _Reassembler()
+        responses = _Reassembler()
+        connection = None  # (client address, broker address)
+        offset = _PCAP_HEADER_SIZE
+        while offset + record_header.size <= len(buf):
+            ts_sec, ts_fraction, captured_length, _ = record_header.unpack_from(buf, offset)
+            offset += record_header.size
+            packet = buf[offset:offset + captured_length]
+            offset += captured_length
+
+            segment = _tcp_segment(packet, link_type)
+            if segment is None:
+                continue
+            (source, destination, seq, flags, payload) = segment
+            if connection is None:
+                if destination[1] == broker_port:
+                    connection = (source, destination)
+                elif source[1] == broker_port:
+                    connection = (destination, source)
+                else:
+                    continue
+            timestamp = ts_sec + ts_fraction * resolution
+            if (source, destination) == connection:
+                requests.add(seq, bool(flags & _TCP_SYN), payload, timestamp)
+            elif (destination, source) == connection:
+                responses.add(seq, bool(flags & _TCP_SYN), payload, timestamp)
+    if connection is None:
+        raise Exception(f"No TCP connection to port {broker_port} in {path}")
+    return requests.stream(), responses.stream()
+
+
+# (source address, destination address, sequence number, flags, payload) of a TCP packet, None for other packets
+def _tcp_segment(packet: bytes, link_type: int) -> None | tuple[tuple[bytes, int], tuple[bytes, int], int, int, bytes]:
+    if link_type == _LINKTYPE_ETHERNET:
+        (ip_offset, ether_type) = (14, _ETHER_TYPE.unpack_from(packet, 12)[0])
+        if ether_type == _ETHERTYPE_VLAN:
+            (ip_offset, ether_type) = (18, _ETHER_TYPE.unpack_from(packet, 16)[0])
+        if ether_type not in (_ETHERTYPE_IPV4, _ETHERTYPE_IPV6):
+            return None
+    elif link_type in _LINK_HEADER_SIZES:
+        ip_offset = _LINK_HEADER_SIZES[link_type]
+    else:
+        raise Exception(f"Unsupported link type {link_type}")
+    if len(packet) <= ip_offset:
+        return None
+
+    match packet[ip_offset] >> 4:
+        case 4:
+            version_ihl, total_length, fragment, protocol = _IPV4_HEADER.unpack_from(packet, ip_offset)
+            if protocol != _IPPROTO_TCP or fragment & 0x3fff:  # fragments aren't reassembled
+                return None
+            (source, destination) = (packet[ip_offset + 12:ip_offset + 16], packet[ip_offset + 16:ip_offset + 20])
+            tcp_offset = ip_offset + (version_ihl & 0x0f) * 4
+            ip_end = ip_offset + total_length
+        case 6:
+            payload_length, next_header = _IPV6_HEADER.unpack_from(packet, ip_offset)
+            if next_header != _IPPROTO_TCP:  # extension headers aren't followed
+                return None
+            (source, destination) = (packet[ip_offset + 8:ip_offset + 24], packet[ip_offset + 24:ip_offset + 40])
+            tcp_offset = ip_offset + 40
+            ip_end = tcp_offset + payload_length
+        case _:
+            return None
+
+    source_port, destination_port, seq, data_offset, flags = _TCP_HEADER.unpack_from(packet, tcp_offset)
+    payload = packet[tcp_offset + (data_offset >> 4) * 4:ip_end]
+    return (source, source_port), (destination, destination_port), seq, flags, payload
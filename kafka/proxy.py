@@ -0,0 +1,351 @@
+import asyncio
+import struct
+from dataclasses import dataclass
+from typing import Callable
+
+import kafka.dataclass_binding
+import kafka.messages
+from kafka.buffer_serialization import compact_array_reader, compact_array_writer, read_int_32, read_tag_buffer, \
+    write_int_32
+from kafka.datatypes import CompactArray
+from kafka.varint import read_unsigned_varint
+
+_SIZE = struct.Struct(">i")
+_REQUEST_HEADER = struct.Struct(">hhi")  # request_api_key request_api_version correlation_id
+_CORRELATION_ID = struct.Struct(">i")
+_INT16 = struct.Struct(">h")
+_INT32 = struct.Struct(">i")
+
+_PRODUCE = 0
+_METADATA = 3
+_FIND_COORDINATOR = 10
+
+# Rewrites the address of a broker as advertised in Metadata & FindCoordinator responses to the address clients should
+# use instead
+AddressRewriter = Callable[[str, int], tuple[str, int]]
+
+
+# A pass-through proxy multiplexing many downstream client connections onto a few upstream broker connections.
+#
+# Only the size prefix and the fixed part of request headers are parsed. Correlation ids are rewritten so that
+# requests of different clients sharing an upstream connection can't collide, and bodies are forwarded as memoryview
+# slices of the received frame without being decoded. When an address rewriter is given, the responses advertising
+# broker addresses are decoded and re-encoded with the addresses rewritten, so clients keep talking to the proxy instead
+# of the brokers: the [brokers] of Metadata v12, and the coordinator of FindCoordinator v3. Other versions of these
+# are forwarded as they are, so clients must use those versions to be kept behind the proxy.
+#
+# All requests of a downstream connection go through the same upstream connection. A broker answers the requests of a
+# connection in order, so each client still gets its responses in the order it sent the requests. When an upstream
+# connection is lost, the clients pinned to it are disconnected, since their requests won't be answered, and the
+# connection is re-established in the background. New clients are pinned to the upstream connections that are up.
+#
+# Responses are handed off to a writer task per downstream connection rather than written by the task reading the
+# upstream connection, so a client slow to read its responses delays no other client sharing that upstream connection.
+
+@dataclass
+class ProxyStats:
+    downstream_connections: int = 0
+    requests: int = 0
+    responses: int = 0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    rewritten_responses: int = 0
+    dropped_responses: int = 0  # answers to clients that disconnected before receiving them
+    upstream_reconnects: int = 0
+
+
+# The responses queued for a client are answers to requests it sent, so the queue is bounded by how many requests the
+# client keeps in flight
+class _Downstream:
+    writer: asyncio.StreamWriter
+    responses: asyncio.Queue  # buffers of each response frame, then None once closing
+    closing: bool
+    task: asyncio.Task
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.responses = asyncio.Queue()
+        self.closing = False
+        self.task = asyncio.create_task(self.__write_responses())
+
+    def send(self, buffers: tuple): self.responses.put_nowait(buffers)
+
+    # The responses already queued are still written
+    def close(self):
+        if not self.closing:
+            self.closing = True
+            self.responses.put_nowait(None)
+
+    async def __write_responses(self):
+        try:
+            while (buffers := await self.responses.get()) is not None:
+                self.writer.writelines(buffers)
+                await self.writer.drain()
+        except ConnectionError:
+            self.closing = True
+        finally:
+            self.writer.close()
+
+
+@dataclass
+class _Pending:
+    downstream: _Downstream
+    correlation_id: int
+    api_key: int
+    api_version: int
+
+
+class _Upstream:
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    connected: bool
+    pending: dict[int, _Pending]
+    downstreams: set[_Downstream]  # pinned to this connection
+    next_correlation_id: int
+    task: None | asyncio.Task
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.connected = True
+        self.pending = {}
+        self.downstreams = set()
+        self.next_correlation_id = 0
+        self.task = None
+
+    # The clients pinned to the connection are disconnected, as their requests won't be answered anymore
+    def disconnect(self):
+        self.connected = False
+        self.writer.close()
+        for downstream in self.downstreams:
+            downstream.close()
+        self.pending.clear()
+
+    def correlation_id(self) -> int:
+        correlation_id = self.next_correlation_id
+        self.next_correlation_id = (correlation_id + 1) & 0x7FFFFFFF
+        return correlation_id
+
+
+class KafkaProxy:
+    __upstream_address: tuple[str, int]
+    __upstream_connections: int
+    __address_rewriter: None | AddressRewriter
+    __reconnect_backoff: float
+    __reconnect_backoff_max: float
+    __upstreams: list[_Upstream]
+    __next_upstream: int
+    __downstreams: dict[asyncio.Task, asyncio.StreamWriter]  # by the task forwarding their requests
+    __server: None | asyncio.Server
+    stats: ProxyStats
+
+    def __init__(self,
+                 upstream: str,
+                 upstream_connections: int = 1,
+                 address_rewriter: None | AddressRewriter = None,
+                 reconnect_backoff: float = 0.05,
+                 reconnect_backoff_max: float = 1.0):
+        (host, port) = upstream.split(":")
+        self.__upstream_address = (host, int(port))
+        self.__upstream_connections = upstream_connections
+        self.__address_rewriter = address_rewriter
+        self.__reconnect_backoff = reconnect_backoff
+        self.__reconnect_backoff_max = reconnect_backoff_max
+        self.__upstreams = []
+        self.__next_upstream = 0
+        self.__downstreams = {}
+        self.__server = None
+        self.stats = ProxyStats()
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        for _ in range(self.__upstream_connections):
+            reader, writer = await asyncio.open_connection(*self.__upstream_address)
+            upstream = _Upstream(reader, writer)
+            upstream.task = asyncio.create_task(self.__forward_responses(upstream))
+            self.__upstreams.append(upstream)
+        self.__server = await asyncio.start_server(self.__forward_requests, host, port)
+        return self.__server
+
+    async def close(self):
+        if self.__server is not None:
+            self.__server.close()
+            await self.__server.wait_closed()
+            self.__server = None
+        for upstream in self.__upstreams:
+            upstream.task.cancel()
+            upstream.writer.close()
+        await asyncio.gather(*(upstream.task for upstream in self.__upstreams), return_exceptions=True)
+        self.__upstreams = []
+        for writer in self.__downstreams.values():
+            writer.close()
+        await asyncio.gather(*self.__downstreams, return_exceptions=True)
+
+    # Round-robin over the upstream connections that are up
+    def __pick_upstream(self) -> None | _Upstream:
+        for _ in range(len(self.__upstreams)):
+            upstream = self.__upstreams[self.__next_upstream]
+            self.__next_upstream = (self.__next_upstream + 1) % len(self.__upstreams)
+            if upstream.connected:
+                return upstream
+        return None
+
+    async def __forward_requests(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats.downstream_connections += 1
+        upstream = self.__pick_upstream()
+        if upstream is None:
+            writer.close()
+            return
+        task = asyncio.current_task()
+        self.__downstreams[task] = writer
+        downstream = _Downstream(writer)
+        upstream.downstreams.add(downstream)
+        try:
+            while True:
+                size_prefix = await reader.readexactly(_SIZE.size)
+                (size,) = _SIZE.unpack(size_prefix)
+                frame = await reader.readexactly(size)
+                if downstream.closing:
+                    break
+                api_key, api_version, correlation_id = _REQUEST_HEADER.unpack_from(frame)
+
+                upstream_correlation_id = upstream.correlation_id()
+                if _expects_response(api_key, api_version, frame):
+                    upstream.pending[upstream_correlation_id] = \
+                        _Pending(downstream, correlation_id, api_key, api_version)
+                view = memoryview(frame)
+                upstream.writer.writelines((
+                    size_prefix,
+                    view[:4],
+                    _CORRELATION_ID.pack(upstream_correlation_id),
+                    view[_REQUEST_HEADER.size:]
+                ))
+                self.stats.requests += 1
+                self.stats.request_bytes += _SIZE.size + size
+                await upstream.writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            upstream.downstreams.discard(downstream)
+            downstream.close()
+            await downstream.task
+            del self.__downstreams[task]
+
+    # When the connection is lost, it's re-established after a backoff doubling with every failed attempt
+    async def __forward_responses(self, upstream: _Upstream):
+        while True:
+            await self.__read_responses(upstream)
+            upstream.disconnect()
+            backoff = self.__reconnect_backoff
+            while not upstream.connected:
+                await asyncio.sleep(backoff)
+                try:
+                    (upstream.reader, upstream.writer) = await asyncio.open_connection(*self.__upstream_address)
+                    upstream.connected = True
+                except OSError:
+                    backoff = min(backoff * 2, self.__reconnect_backoff_max)
+            self.stats.upstream_reconnects += 1
+
+    async def __read_responses(self, upstream: _Upstream):
+        try:
+            while True:
+                size_prefix = await upstream.reader.readexactly(_SIZE.size)
+                (size,) = _SIZE.unpack(size_prefix)
+                frame = await upstream.reader.readexactly(size)
+                (upstream_correlation_id,) = _CORRELATION_ID.unpack_from(frame)
+                self.stats.responses += 1
+                self.stats.response_bytes += _SIZE.size + size
+
+                pending = upstream.pending.pop(upstream_correlation_id, None)
+                if pending is None or pending.downstream.closing:
+                    self.stats.dropped_responses += 1
+                    continue
+
+                correlation_id = _CORRELATION_ID.pack(pending.correlation_id)
+                if self.__address_rewriter is not None and pending.api_key == _METADATA \
+                        and pending.api_version == 12:
+                    pending.downstream.send(self.__rewrite_metadata_v12(frame, correlation_id))
+                    self.stats.rewritten_responses += 1
+                elif self.__address_rewriter is not None and pending.api_key == _FIND_COORDINATOR \
+                        and pending.api_version == 3:
+                    pending.downstream.send(self.__rewrite_find_coordinator_v3(frame, correlation_id))
+                    self.stats.rewritten_responses += 1
+                else:
+                    pending.downstream.send((size_prefix, correlation_id, memoryview(frame)[4:]))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    # Metadata Response (Version: 12) => throttle_time_ms [brokers] ...
+    # Response Header v1 => correlation_id TAG_BUFFER
+    #
+    # Only throttle_time_ms and [brokers] are decoded and re-encoded, everything after them is forwarded as is.
+    def __rewrite_metadata_v12(self, frame: bytes, correlation_id: bytes) -> tuple:
+        (_, body_offset) = read_tag_buffer(frame, _CORRELATION_ID.size)
+        (throttle_time_ms, offset) = read_int_32(frame, body_offset)
+        broker_type = kafka.messages.MetadataV12ApiResponse.Broker
+        (brokers, rest_offset) = compact_array_reader(
+            kafka.dataclass_binding.dataclass_buffer_deserializer(broker_type)
+        )(frame, offset)
+
+        for broker in brokers:
+            (broker.host.val, broker.port.val) = self.__address_rewriter(broker.host.val, broker.port.val)
+        prefix = bytearray(_INT32.size + CompactArray(brokers).size())
+        compact_array_writer(kafka.dataclass_binding.dataclass_buffer_serializer(broker_type))(
+            brokers, prefix, write_int_32(throttle_time_ms, prefix, 0)
+        )
+
+        size = body_offset + len(prefix) + len(frame) - rest_offset
+        return (
+            _SIZE.pack(size),
+            correlation_id,
+            memoryview(frame)[_CORRELATION_ID.size:body_offset],
+            prefix,
+            memoryview(frame)[rest_offset:]
+        )
+
+    # FindCoordinator Response (Version: 3) => throttle_time_ms error_code error_message node_id host port TAG_BUFFER
+    # Response Header v1 => correlation_id TAG_BUFFER
+    #
+    # The body is small, it's decoded and re-encoded as a whole
+    def __rewrite_find_coordinator_v3(self, frame: bytes, correlation_id: bytes) -> tuple:
+        (_, body_offset) = read_tag_buffer(frame, _CORRELATION_ID.size)
+        (response, _) = kafka.dataclass_binding.dataclass_buffer_deserializer(
+            kafka.messages.FindCoordinatorV3ApiResponse
+        )(frame, body_offset)
+        if response.error_code.val == 0:
+            (response.host.val, response.port.val) = self.__address_rewriter(response.host.val, response.port.val)
+        body = bytearray(kafka.dataclass_binding.data_class_size(response))
+        kafka.dataclass_binding.write_data_class_into(response, body, 0)
+
+        return (
+            _SIZE.pack(body_offset + len(body)),
+            correlation_id,
+            memoryview(frame)[_CORRELATION_ID.size:body_offset],
+            body
+        )
+
+
+# Produce requests with acks=0 are never answered, every other request is.
+#
+# Produce Request (Version: 0-2) => acks ...
+# Produce Request (Version: 3-8) => transactional_id acks ...
+#   transactional_id => NULLABLE_STRING
+# Produce Request (Version: 9+) => transactional_id acks ...
+#   transactional_id => COMPACT_NULLABLE_STRING
+# preceded by Request Header v1 (v2 from Produce v9) => request_api_key request_api_version correlation_id client_id
+def _expects_response(api_key: int, api_version: int, frame: bytes) -> bool:
+    if api_key != _PRODUCE:
+        return True
+    offset = _REQUEST_HEADER.size
+    (client_id_length,) = _INT16.unpack_from(frame, offset)
+    offset += _INT16.size + max(client_id_length, 0)
+    if api_version >= 9:
+        (tagged_fields, offset) = read_unsigned_varint(frame, offset)
+        if tagged_fields != 0:
+            return True  # tagged header fields aren't supported, assume the request is answered
+        (transactional_id_length, offset) = read_unsigned_varint(frame, offset)
+        offset += max(transactional_id_length - 1, 0)
+    elif api_version >= 3:
+        (transactional_id_length,) = _INT16.unpack_from(frame, offset)
+        offset += _INT16.size + max(transactional_id_length, 0)
+    (acks,) = _INT16.unpack_from(frame, offset)
+    return acks != 0
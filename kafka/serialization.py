@@ -1,11 +1,13 @@
-from typing import Callable, List, TypeVar
+from typing import TYPE_CHECKING, Callable, List, TypeVar
 from uuid import UUID
 
-from bitstring import BitStream
-
 import util.inspection
 import util.numbers
 
+# Streams are only ever passed in, bitstring is imported by whoever creates them (see kafka.dataclass_binding)
+if TYPE_CHECKING:
+    from bitstring import BitStream
+
 T = TypeVar("T")
 
 
@@ -13,59 +15,79 @@ T = TypeVar("T")
 # https://kafka.apache.org/protocol.html#protocol_types
 
 
-def write_uint_8(val: int, stream: BitStream): stream.append(f"uint:8={val}")
+def write_uint_8(val: int, stream: "BitStream"): stream.append(f"uint:8={val}")
 
 
-def read_uint_8(stream: BitStream) -> int: return stream.read("uint:8")
+def read_uint_8(stream: "BitStream") -> int: return stream.read("uint:8")
 
 
 # Represents a boolean value in a byte. Values 0 and 1 are used to represent false and true respectively. When
 # reading a boolean value, any non-zero value is considered true.
-def write_boolean(val: bool, stream: BitStream):
+def write_boolean(val: bool, stream: "BitStream"):
     if val:
         write_uint_8(1, stream)
     else:
         write_uint_8(0, stream)
 
 
-def read_boolean(stream: BitStream) -> bool:
+def read_boolean(stream: "BitStream") -> bool:
     return read_uint_8(stream) != 0
 
 
+# Represents an integer between -2^7 and 2^7-1 inclusive.
+def write_int_8(val: int, stream: "BitStream"): stream.append(f"int:8={val}")
+
+
+def read_int_8(stream: "BitStream") -> int: return stream.read("int:8")
+
+
 # Represents an integer between -2^15 and 2^15-1 inclusive. The values are encoded using two bytes in network byte
 # order (big-endian).
-def write_int_16(val: int, stream: BitStream): stream.append(f"int:16={val}")
+def write_int_16(val: int, stream: "BitStream"): stream.append(f"int:16={val}")
 
 
-def read_int_16(stream: BitStream) -> int: return stream.read("int:16")
+def read_int_16(stream: "BitStream") -> int: return stream.read("int:16")
 
 
 # Represents an integer between -2^(31) and 2^(31-1) inclusive. The values are encoded using four bytes in network byte
 # order (big-endian).
-def write_int_32(val: int, stream: BitStream): stream.append(f"int:32={val}")
+def write_int_32(val: int, stream: "BitStream"): stream.append(f"int:32={val}")
+
+
+def read_int_32(stream: "BitStream") -> int: return stream.read("int:32")
+
+
+# Represents an integer between -2^63 and 2^63-1 inclusive. The values are encoded using eight bytes in network byte
+# order (big-endian).
+def write_int_64(val: int, stream: "BitStream"): stream.append(f"int:64={val}")
 
 
-def read_int_32(stream: BitStream) -> int: return stream.read("int:32")
+def read_int_64(stream: "BitStream") -> int: return stream.read("int:64")
 
 
 # Represents an integer between 0 and 232-1 inclusive. The values are encoded using four bytes in network byte order
 # (big-endian).
-def write_uint_32(val: int, stream: BitStream): stream.append(f"uint:32={val}")
+def write_uint_32(val: int, stream: "BitStream"): stream.append(f"uint:32={val}")
 
 
-def read_uint_32(stream: BitStream) -> int: return stream.read("uint:32")
+def read_uint_32(stream: "BitStream") -> int: return stream.read("uint:32")
 
 
 def __write_string_utf8_bytes(val: str): return bytes(val, "UTF-8")
 
 
-def __read_string_utf8_bytes(length: int, stream: BitStream) -> str: return str(stream.read(f"bytes:{length}"), "UTF-8")
+def __read_string_utf8_bytes(length: int, stream: "BitStream") -> str:
+    return str(stream.read(f"bytes:{length}"), "UTF-8")
+
+
+# Length of the UTF-8 encoding of a string, without encoding it when it's plain ASCII
+def string_utf8_size(val: str) -> int: return len(val) if val.isascii() else len(__write_string_utf8_bytes(val))
 
 
 # Represents a sequence of characters or null. For non-null strings, first the length N is given as an INT16. Then N
 # bytes follow which are the UTF-8 encoding of the character sequence. A null value is encoded with length of -1 and
 # there are no following bytes.
-def write_nullable_string(val: None | str, stream: BitStream):
+def write_nullable_string(val: None | str, stream: "BitStream"):
     if val is None:
         write_int_16(-1, stream)
     else:
@@ -74,40 +96,85 @@ def write_nullable_string(val: None | str, stream: BitStream):
         stream.append(string_bytes)
 
 
-def read_nullable_string(stream: BitStream) -> None | str:
+def read_nullable_string(stream: "BitStream") -> None | str:
     length = read_int_16(stream)
     return None if length == -1 else __read_string_utf8_bytes(length, stream)
 
 
+def nullable_string_size(val: None | str) -> int: return 2 if val is None else 2 + string_utf8_size(val)
+
+
 # Represents a sequence of characters. First the length N + 1 is given as an UNSIGNED_VARINT . Then N bytes follow
 # which are the UTF-8 encoding of the character sequence.
-def write_compact_string(val: str, stream: BitStream):
+def write_compact_string(val: str, stream: "BitStream"):
     string_bytes = __write_string_utf8_bytes(val)
     write_unsigned_varint(len(string_bytes) + 1, stream)
     stream.append(string_bytes)
 
 
-def read_compact_string(stream: BitStream) -> str:
+def read_compact_string(stream: "BitStream") -> str:
     return __read_string_utf8_bytes(
         read_unsigned_varint(stream) - 1,
         stream
     )
 
 
-def write_compact_nullable_string(val: None | str, stream: BitStream):
+def compact_string_size(val: str) -> int:
+    length = string_utf8_size(val)
+    return unsigned_varint_size(length + 1) + length
+
+
+# Like COMPACT_STRING, a null value being encoded with a length of 0
+def write_compact_nullable_string(val: None | str, stream: "BitStream"):
     if val is None:
-        write_unsigned_varint(1, stream)
+        write_unsigned_varint(0, stream)
     else:
         write_compact_string(val, stream)
 
 
-def read_compact_nullable_string(stream: BitStream) -> None | str:
+def read_compact_nullable_string(stream: "BitStream") -> None | str:
+    length = read_unsigned_varint(stream) - 1
+    return None if length == -1 else __read_string_utf8_bytes(length, stream)
+
+
+def compact_nullable_string_size(val: None | str) -> int: return 1 if val is None else compact_string_size(val)
+
+
+# Represents a raw sequence of bytes. First the length N+1 is given as an UNSIGNED_VARINT. Then N bytes follow.
+def write_compact_bytes(val: bytes, stream: "BitStream"):
+    write_unsigned_varint(len(val) + 1, stream)
+    stream.append(val)
+
+
+def read_compact_bytes(stream: "BitStream") -> bytes:
+    return stream.read(f"bytes:{read_unsigned_varint(stream) - 1}")
+
+
+def compact_bytes_size(val: bytes) -> int: return unsigned_varint_size(len(val) + 1) + len(val)
+
+
+# Represents a raw sequence of bytes or null. For non-null values, first the length N + 1 is given as an
+# UNSIGNED_VARINT. Then N bytes follow. A null value is encoded with a length of 0 and there are no following bytes.
+# COMPACT_RECORDS are encoded the same way.
+def write_compact_nullable_bytes(val: None | bytes, stream: "BitStream"):
+    if val is None:
+        write_unsigned_varint(0, stream)
+    else:
+        write_unsigned_varint(len(val) + 1, stream)
+        stream.append(val)
+
+
+def read_compact_nullable_bytes(stream: "BitStream") -> None | bytes:
     length = read_unsigned_varint(stream) - 1
-    return None if length == 0 else __read_string_utf8_bytes(length, stream)
+    return None if length == -1 else stream.read(f"bytes:{length}")
+
+
+def compact_nullable_bytes_size(val: None | bytes) -> int:
+    return 1 if val is None else unsigned_varint_size(len(val) + 1) + len(val)
 
 
 # https://github.com/apache/kafka/blob/fe6a827e20d30af5328d7376a831f9666e0c8110/clients/src/main/java/org/apache/kafka/common/utils/ByteUtils.java#L344
-def write_unsigned_varint(val: int, stream: BitStream):
+def write_unsigned_varint(val: int, stream: "BitStream"):
     if val & (0xFFFFFFFF << 7) == 0:
         stream.append(f"uint:8={val}")
     else:
@@ -127,40 +194,46 @@ def write_unsigned_varint(val: int, stream: BitStream):
                     stream.append(f"uint:8={util.numbers.unsigned_right_shift(val, 28)}")
 
 
-def read_unsigned_varint(stream: BitStream) -> int:
-    tmp = stream.read("uint:8")
+# ByteUtils.readUnsignedVarint in Kafka's source, where bytes are signed: a negative one has its continuation bit set
+def read_unsigned_varint(stream: "BitStream") -> int:
+    tmp = stream.read("int:8")
     if tmp >= 0:
         return tmp
     else:
         result = tmp & 127
-        tmp = stream.read("uint:8")
+        tmp = stream.read("int:8")
         if tmp >= 0:
             result |= tmp << 7
         else:
             result |= (tmp & 127) << 7
-            tmp = stream.read("uint:8")
+            tmp = stream.read("int:8")
             if tmp >= 0:
                 result |= tmp << 14
             else:
                 result |= (tmp & 127) << 14
-                tmp = stream.read("uint:8")
+                tmp = stream.read("int:8")
                 if tmp >= 0:
                     result |= tmp << 21
                 else:
                     result |= (tmp & 127) << 21
-                    tmp = stream.read("uint:8")
+                    tmp = stream.read("int:8")
                     result |= tmp << 28
                     if tmp < 0:
                         raise Exception(f"Unsigned Varint did not terminate after 5 bytes {result}")
         return result
 
 
+# Number of bytes write_unsigned_varint uses for `val`: 7 bits per byte, and at least 1 byte. Same as
+# ByteUtils.sizeOfUnsignedVarint in Kafka's source.
+def unsigned_varint_size(val: int) -> int: return max(1, ((val & 0xFFFFFFFF).bit_length() + 6) // 7)
+
+
 # Represents a sequence of objects of a given type T. Type T can be either a primitive type (e.g. STRING) or a
 # structure. First, the length N + 1 is given as an UNSIGNED_VARINT. Then N instances of type T follow. A null array
 # is represented with a length of 0. In protocol documentation an array of T instances is referred to as [T].
 def write_compact_array(arr: List[T],
-                        stream: BitStream,
-                        item_serializer: Callable[[T, BitStream], None]):
+                        stream: "BitStream",
+                        item_serializer: Callable[[T, "BitStream"], None]):
     if arr is None:
         write_unsigned_varint(0, stream)
     else:
@@ -170,9 +243,9 @@ def write_compact_array(arr: List[T],
 
 
 def compact_array_reader(
-        item_deserializer: Callable[[BitStream], T]
-) -> Callable[[BitStream], List[T]]:
-    def read_compact_array(stream: BitStream) -> List[T]:
+        item_deserializer: Callable[["BitStream"], T]
+) -> Callable[["BitStream"], List[T]]:
+    def read_compact_array(stream: "BitStream") -> List[T]:
         length = read_unsigned_varint(stream) - 1
         result = []
         if length < 1:
@@ -184,15 +257,29 @@ def compact_array_reader(
     return read_compact_array
 
 
-def read_tag_buffer(stream: BitStream) -> bytes:
-    stream.read("uint:8")
-    return b'\x00'
+def compact_array_size(arr: None | List[T], item_size: Callable[[T], int]) -> int:
+    if arr is None:
+        return unsigned_varint_size(0)
+    return unsigned_varint_size(len(arr) + 1) + sum(item_size(item) for item in arr)
+
+
+# Tagged fields: the number of fields as an UNSIGNED_VARINT, then for each field its tag and its size as
+# UNSIGNED_VARINTs followed by that many bytes. None of the tagged fields are interpreted, the raw buffer is returned
+# so that it's written back unchanged.
+def read_tag_buffer(stream: "BitStream") -> bytes:
+    start = stream.pos
+    count = read_unsigned_varint(stream)
+    for _ in range(count):
+        read_unsigned_varint(stream)
+        size = read_unsigned_varint(stream)
+        stream.bytepos += size
+    return stream[start:stream.pos].tobytes()
 
 
 # Represents a type 4 immutable universally unique identifier (Uuid). The values are encoded using sixteen bytes in
 # network byte order (big-endian).
-def write_uuid(val: UUID, stream: BitStream):
+def write_uuid(val: UUID, stream: "BitStream"):
     stream.append(val.bytes)
 
 
-def read_uuid(stream: BitStream) -> UUID: return UUID(int=read_uint_32(stream))
+def read_uuid(stream: "BitStream") -> UUID: return UUID(bytes=stream.read("bytes:16"))
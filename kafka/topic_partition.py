@@ -0,0 +1,8 @@
+from dataclasses import dataclass
+
+
+# Identifies a partition of a topic, usable as a dict key
+@dataclass(frozen=True, order=True)
+class TopicPartition:
+    topic: str
+    partition: int
@@ -0,0 +1,228 @@
+from array import array
+from dataclasses import dataclass, field
+
+# Variable length integers as Kafka encodes them, decoded straight out of a buffer (bytes, bytearray, memoryview)
+# rather than through a bitstring stream. Semantics are those of ByteUtils in Kafka's source:
+#   - an unsigned varint holds 7 bits per byte, least significant group first, a set high bit meaning another byte
+#     follows. It is 32 bits at most, so 5 bytes at most.
+#   - a varint is a 32-bit signed integer zigzag encoded into an unsigned varint: 0, -1, 1, -2, ... => 0, 1, 2, 3, ...
+#   - a varlong is the same for a 64-bit signed integer, 10 bytes at most.
+#
+# Readers take the offset to start from and return the value along with the offset following it.
+
+_UINT32_MASK = 0xFFFFFFFF
+_UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def read_unsigned_varint(buf, offset: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        b = buf[offset]
+        offset += 1
+        if b & 0x80 == 0:
+            return (value | b << shift) & _UINT32_MASK, offset
+        value |= (b & 0x7F) << shift
+        shift += 7
+        if shift > 28:
+            raise Exception(f"Varint is too long, the most significant bit in the 5th byte is set, read {value}")
+
+
+def read_varint(buf, offset: int) -> tuple[int, int]:
+    (raw, offset) = read_unsigned_varint(buf, offset)
+    return (raw >> 1) ^ -(raw & 1), offset
+
+
+def read_varlong(buf, offset: int) -> tuple[int, int]:
+    (raw, offset) = _read_unsigned_varlong(buf, offset)
+    return (raw >> 1) ^ -(raw & 1), offset
+
+
+def _read_unsigned_varlong(buf, offset: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        b = buf[offset]
+        offset += 1
+        if b & 0x80 == 0:
+            return (value | b << shift) & _UINT64_MASK, offset
+        value |= (b & 0x7F) << shift
+        shift += 7
+        if shift > 63:
+            raise Exception(f"Varlong is too long, most significant bit in the 10th byte is set, read {value}")
+
+
+def encode_unsigned_varint(val: int) -> bytes: return _encode(val & _UINT32_MASK)
+
+
+def encode_varint(val: int) -> bytes: return _encode(((val << 1) ^ (val >> 31)) & _UINT32_MASK)
+
+
+def encode_varlong(val: int) -> bytes: return _encode(((val << 1) ^ (val >> 63)) & _UINT64_MASK)
+
+
+def _encode(raw: int) -> bytes:
+    result = bytearray()
+    while raw > 0x7F:
+        result.append(raw & 0x7F | 0x80)
+        raw >>= 7
+    result.append(raw)
+    return bytes(result)
+
+
+# Records of a record batch (magic v2), as delimited by decode_record_run:
+#
+# Record =>
+#   length: varint
+#   attributes: int8
+#   timestampDelta: varlong
+#   offsetDelta: varint
+#   keyLength: varint
+#   key: byte[]
+#   valueLen: varint
+#   value: byte[]
+#   Headers => [Header]
+#
+# Keys & values aren't copied, they're referred to by their offset in the buffer.
+@dataclass
+class RecordRun:
+    buffer: memoryview
+    record_offsets: array = field(default_factory=lambda: array("q"))  # where each record starts, at its length
+    lengths: array = field(default_factory=lambda: array("l"))  # of the records, not counting the length itself
+    attributes: array = field(default_factory=lambda: array("b"))
+    timestamp_deltas: array = field(default_factory=lambda: array("q"))
+    offset_deltas: array = field(default_factory=lambda: array("l"))
+    key_offsets: array = field(default_factory=lambda: array("q"))
+    key_lengths: array = field(default_factory=lambda: array("l"))  # -1 for null keys
+    value_offsets: array = field(default_factory=lambda: array("q"))
+    value_lengths: array = field(default_factory=lambda: array("l"))  # -1 for null values
+    header_counts: array = field(default_factory=lambda: array("l"))
+    headers_offsets: array = field(default_factory=lambda: array("q"))
+    end: int = 0  # offset following the last record
+
+    def __len__(self) -> int: return len(self.record_offsets)
+
+    def key(self, index: int) -> None | bytes:
+        return _slice(self.buffer, self.key_offsets[index], self.key_lengths[index])
+
+    def value(self, index: int) -> None | bytes:
+        return _slice(self.buffer, self.value_offsets[index], self.value_lengths[index])
+
+    # Header =>
+    #   headerKeyLength: varint
+    #   headerKey: String
+    #   headerValueLength: varint
+    #   Value: byte[]
+    def headers(self, index: int) -> list[tuple[str, None | bytes]]:
+        result = []
+        offset = self.headers_offsets[index]
+        for _ in range(self.header_counts[index]):
+            (key_length, offset) = read_varint(self.buffer, offset)
+            if key_length < 0:
+                raise Exception(f"Invalid negative header key size {key_length}")
+            key = str(self.buffer[offset:offset + key_length], "UTF-8")
+            (value_length, offset) = read_varint(self.buffer, offset + key_length)
+            result.append((key, _slice(self.buffer, offset, value_length)))
+            offset += max(value_length, 0)
+        return result
+
+
+def _slice(view: memoryview, offset: int, length: int) -> None | bytes:
+    return None if length < 0 else bytes(view[offset:offset + length])
+
+
+# Delimits `count` consecutive records starting at `offset`, e.g. the records following a record batch header, in a
+# single pass over the buffer. Headers are skipped using the record length, and decoded on demand by
+# RecordRun.headers.
+#
+# Nearly all varints of a record fit in one byte (small deltas & lengths), so the loop decodes those inline and only
+# calls the general readers for longer ones.
+def decode_record_run(buf, count: int, offset: int = 0) -> RecordRun:
+    view = memoryview(buf).cast("B")
+    run = RecordRun(view)
+    record_offsets = run.record_offsets.append
+    lengths = run.lengths.append
+    attributes = run.attributes.append
+    timestamp_deltas = run.timestamp_deltas.append
+    offset_deltas = run.offset_deltas.append
+    key_offsets = run.key_offsets.append
+    key_lengths = run.key_lengths.append
+    value_offsets = run.value_offsets.append
+    value_lengths = run.value_lengths.append
+    header_counts = run.header_counts.append
+    headers_offsets = run.headers_offsets.append
+
+    for _ in range(count):
+        record_offsets(offset)
+
+        b = view[offset]
+        if b < 0x80:
+            length = (b >> 1) ^ -(b & 1)
+            offset += 1
+        else:
+            (length, offset) = read_varint(view, offset)
+        lengths(length)
+        record_end = offset + length
+        if length < 0 or record_end > len(view):
+            raise Exception(f"Invalid record size {length} at {run.record_offsets[-1]}, "
+                            f"{len(view) - offset} bytes left")
+
+        b = view[offset]
+        attributes(b - 0x100 if b > 0x7F else b)
+
+        b = view[offset + 1]
+        if b < 0x80:
+            timestamp_deltas((b >> 1) ^ -(b & 1))
+            offset += 2
+        else:
+            (timestamp_delta, offset) = read_varlong(view, offset + 1)
+            timestamp_deltas(timestamp_delta)
+
+        b = view[offset]
+        if b < 0x80:
+            offset_deltas((b >> 1) ^ -(b & 1))
+            offset += 1
+        else:
+            (offset_delta, offset) = read_varint(view, offset)
+            offset_deltas(offset_delta)
+
+        b = view[offset]
+        if b < 0x80:
+            key_length = (b >> 1) ^ -(b & 1)
+            offset += 1
+        else:
+            (key_length, offset) = read_varint(view, offset)
+        key_offsets(offset)
+        key_lengths(key_length)
+        if key_length > 0:
+            offset += key_length
+
+        b = view[offset]
+        if b < 0x80:
+            value_length = (b >> 1) ^ -(b & 1)
+            offset += 1
+        else:
+            (value_length, offset) = read_varint(view, offset)
+        value_offsets(offset)
+        value_lengths(value_length)
+        if value_length > 0:
+            offset += value_length
+
+        b = view[offset]
+        if b < 0x80:
+            header_count = (b >> 1) ^ -(b & 1)
+            offset += 1
+        else:
+            (header_count, offset) = read_varint(view, offset)
+        if header_count < 0:
+            raise Exception(f"Found invalid number of record headers {header_count}")
+        header_counts(header_count)
+        headers_offsets(offset)
+
+        if offset > record_end or (header_count == 0 and offset != record_end):
+            raise Exception(f"Invalid record size: expected to read {length} bytes in record payload, but the record "
+                            f"at {run.record_offsets[-1]} doesn't end there")
+        offset = record_end
+
+    run.end = offset
+    return run
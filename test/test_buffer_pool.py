@@ -0,0 +1,59 @@
+import pytest
+
+from kafka.buffer_pool import BufferPool
+
+
+def test_acquire_rounds_up_to_size_class():
+    pool = BufferPool(min_size=16, max_size=1024)
+
+    assert len(pool.acquire(1)) == 16
+    assert len(pool.acquire(16)) == 16
+    assert len(pool.acquire(17)) == 32
+    assert len(pool.acquire(1000)) == 1024
+
+
+def test_released_buffer_is_reused():
+    pool = BufferPool(min_size=16, max_size=1024)
+
+    buf = pool.acquire(100)
+    pool.release(buf)
+    again = pool.acquire(120)
+
+    assert again is buf
+    stats = pool.stats()
+    assert stats.hits == 1
+    assert stats.misses == 1
+    assert stats.in_use_bytes == 128
+    assert stats.pooled_bytes == 0
+
+
+def test_oversized_buffers_are_not_pooled():
+    pool = BufferPool(min_size=16, max_size=64)
+
+    buf = pool.acquire(100)
+    assert len(buf) == 100
+    pool.release(buf)
+
+    stats = pool.stats()
+    assert stats.discards == 1
+    assert stats.pooled_bytes == 0
+    assert stats.in_use_bytes == 0
+
+
+def test_bucket_is_bounded():
+    pool = BufferPool(min_size=16, max_size=64, max_buffers_per_class=2)
+
+    buffers = [pool.acquire(16) for _ in range(3)]
+    for buf in buffers:
+        pool.release(buf)
+
+    stats = pool.stats()
+    assert stats.releases == 2
+    assert stats.discards == 1
+    assert stats.pooled_bytes == 32
+    assert stats.peak_bytes == 48
+
+
+def test_min_size_must_be_power_of_two():
+    with pytest.raises(Exception):
+        BufferPool(min_size=100)
@@ -0,0 +1,163 @@
+import pytest
+import struct
+
+import kafka.datatypes
+import kafka.messages
+import kafka.dataclass_binding
+from kafka.capture import WireCapture
+
+CLIENT = bytes([10, 0, 0, 1])
+BROKER = bytes([10, 0, 0, 2])
+
+
+def frame(*messages) -> bytes:
+    body = b''.join(kafka.dataclass_binding.serialize_data_class(msg) for msg in messages)
+    return struct.pack(">i", len(body)) + body
+
+
+def api_versions_request(correlation_id: int) -> bytes:
+    req = kafka.messages.ApiVersionsV3ApiRequest(
+        client_software_name=kafka.datatypes.CompactString("unit-tests"),
+        client_software_version=kafka.datatypes.CompactString("1.0.0"),
+        tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+    )
+    return frame(kafka.messages.mk_request_header_v2(req, correlation_id, "cid"), req)
+
+
+def api_versions_response(correlation_id: int) -> bytes:
+    res = kafka.messages.ApiVersionsV3ApiResponse(
+        error_code=kafka.datatypes.Int16(0),
+        api_keys=kafka.datatypes.CompactArray([kafka.messages.ApiVersionsV3ApiResponse.ApiKey(
+            api_key=kafka.datatypes.Int16(18),
+            min_version=kafka.datatypes.Int16(0),
+            max_version=kafka.datatypes.Int16(3),
+            tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+        )]),
+        throttle_time_ms=kafka.datatypes.Int32(0),
+        tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+    )
+    return frame(kafka.messages.ResponseHeaderV0(correlation_id=kafka.datatypes.Int32(correlation_id)), res)
+
+
+# A pcap file of Ethernet/IPv4 packets (timestamp, from client, sequence number, payload, SYN flag), of connections from
+# port 50000 to the broker port 9092 unless another client port is given
+def pcap(packets: list[tuple], client_port: int = 50000) -> bytes:
+    result = struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1)
+    for packet in packets:
+        (timestamp, from_client, seq, payload, syn) = packet + (False,) * (5 - len(packet))
+        (source, destination, source_port, destination_port) = (CLIENT, BROKER, client_port, 9092) if from_client \
+            else (BROKER, CLIENT, 9092, client_port)
+        tcp = struct.pack(">HHIIBBHHH", source_port, destination_port, seq, 0, 5 << 4, 0x02 if syn else 0x18, 65535,
+                          0, 0)
+        ip = struct.pack(">BBHHHBBH4s4s", 0x45, 0, 20 + len(tcp) + len(payload), 0, 0x4000, 64, 6, 0, source,
+                         destination)
+        frame = b'\x00' * 12 + b'\x08\x00' + ip + tcp + payload
+        result += struct.pack("<IIII", int(timestamp), round(timestamp % 1 * 1e6), len(frame), len(frame)) + frame
+    return result
+
+
+@pytest.fixture
+def capture(tmp_path):
+    requests = tmp_path / "requests.bin"
+    responses = tmp_path / "responses.bin"
+    # request 2 is never answered, and the capture ends in the middle of a 4th request
+    requests.write_bytes(api_versions_request(1) + api_versions_request(2) + api_versions_request(3) +
+                         api_versions_request(4)[:10])
+    responses.write_bytes(api_versions_response(1) + api_versions_response(3))
+    with WireCapture(str(requests), str(responses)) as result:
+        yield result
+
+
+def test_index(capture):
+    assert len(capture) == 3
+    assert capture.requests_truncated == 10
+    assert capture.responses_truncated == 0
+    assert capture.requests_corrupt_at is None and capture.responses_corrupt_at is None
+    assert capture.find_by_api_key(18) == [0, 1, 2]
+    assert capture.find_by_api_key(18, 2) == []
+    assert capture.find_by_correlation_id(3) == [2]
+
+    request = capture.request(2)
+    assert (request.api_key, request.api_version, request.correlation_id, request.client_id) == (18, 3, 3, "cid")
+
+
+def test_pairing(capture):
+    assert capture.response(0).correlation_id == 1
+    assert capture.response(1) is None
+    assert capture.response(2).correlation_id == 3
+
+
+def test_lazy_decoding(capture):
+    header, request = capture.decode_request(0)
+    assert header.correlation_id == kafka.datatypes.Int32(1)
+    assert request.client_software_name == kafka.datatypes.CompactString("unit-tests")
+
+    response = capture.decode_response(2)
+    assert response.api_keys.val[0].max_version == kafka.datatypes.Int16(3)
+    assert capture.decode_response(1) is None
+
+
+def test_summary(capture):
+    [api] = capture.summary()
+
+    assert api.api_name == "ApiVersions"
+    assert api.requests.count == 3
+    assert api.requests.max == len(api_versions_request(1)) - 4
+    assert api.responses.count == 2
+    assert api.unanswered == 1
+
+
+@pytest.mark.parametrize("size", [-4, -100, 0, 9])
+def test_corrupt_size_prefix(tmp_path, size):
+    requests = tmp_path / "requests.bin"
+    responses = tmp_path / "responses.bin"
+    first = api_versions_request(1)
+    requests.write_bytes(first + struct.pack(">i", size) + b'\x00' * 20 + api_versions_request(2))
+    responses.write_bytes(api_versions_response(1) + struct.pack(">i", min(size, 3)) + b'\x00' * 20)
+
+    with WireCapture(str(requests), str(responses)) as capture:
+        assert len(capture) == 1
+        assert capture.requests_corrupt_at == len(first)
+        assert capture.responses_corrupt_at == len(api_versions_response(1))
+        assert capture.response(0).correlation_id == 1
+
+
+def test_find_by_reused_correlation_id(tmp_path):
+    requests = tmp_path / "requests.bin"
+    requests.write_bytes(api_versions_request(7) + api_versions_request(3) + api_versions_request(7))
+
+    with WireCapture(str(requests)) as capture:
+        assert capture.find_by_correlation_id(7) == [0, 2]
+        assert capture.find_by_correlation_id(3) == [1]
+        assert capture.find_by_correlation_id(5) == []
+
+
+def test_pcap(tmp_path):
+    (request_1, request_2) = (api_versions_request(1), api_versions_request(2))
+    (response_1, response_2) = (api_versions_response(1), api_versions_response(2))
+    client_seq = 1000
+    broker_seq = 2 ** 32 - 4  # sequence numbers wrap around within the first response
+    path = tmp_path / "capture.pcap"
+    path.write_bytes(pcap([
+        (100.0, True, client_seq - 1, b'', True),
+        (100.0, False, broker_seq - 1, b'', True),
+        (100.001, True, client_seq, request_1),
+        (100.002, True, client_seq, request_1[:5]),  # retransmission
+        (100.004, False, broker_seq, response_1[:8]),
+        (100.011, False, (broker_seq + 8) % 2 ** 32, response_1[8:]),
+        # the end of request 2 arrives before its beginning
+        (100.020, True, client_seq + len(request_1) + 10, request_2[10:]),
+        (100.025, True, client_seq + len(request_1), request_2[:10]),
+        (100.055, False, (broker_seq + len(response_1)) % 2 ** 32, response_2),
+    ]) + pcap([(100.003, True, 0, api_versions_request(3))], client_port=50001)[24:])
+
+    with WireCapture.from_pcap(str(path)) as capture:
+        assert len(capture) == 2
+        assert capture.response(1).correlation_id == 2
+        assert capture.request(1).timestamp == pytest.approx(100.025)
+        assert capture.latency(0) == pytest.approx(0.010)
+        assert capture.latency(1) == pytest.approx(0.030)
+        [api] = capture.summary()
+
+    assert api.latencies.count == 2
+    assert (api.latencies.min, api.latencies.max) == (pytest.approx(0.010), pytest.approx(0.030))
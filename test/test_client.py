@@ -0,0 +1,261 @@
+import pytest
+import socket
+import struct
+import threading
+import time
+import tracemalloc
+
+import kafka.dataclass_binding
+import kafka.datatypes
+import kafka.messages
+from kafka.buffer_pool import BufferPool
+from kafka.client import SyncKafkaClient
+from kafka.fetch_session import FetchPosition, FetchSession
+from kafka.topic_partition import TopicPartition
+from kafka.hedged_client import HedgedKafkaClient, LatencyTracker
+
+
+# Answers ApiVersions requests after the given delays (one per request, the last one repeating), echoing the
+# correlation id of each request in throttle_time_ms. Each connection is closed after `requests_per_connection`
+# requests, and the next one accepted.
+def fake_broker(delays: list[float], requests_per_connection: int = 1000) -> str:
+    server = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                for i in range(requests_per_connection):
+                    header = conn.recv(4, socket.MSG_WAITALL)
+                    if len(header) < 4:
+                        break
+                    frame = conn.recv(struct.unpack(">i", header)[0], socket.MSG_WAITALL)
+                    (correlation_id,) = struct.unpack_from(">i", frame, 4)
+                    time.sleep(delays[min(i, len(delays) - 1)])
+                    body = struct.pack(">ih", correlation_id, 0) + b'\x01' + struct.pack(">i", correlation_id) + \
+                        b'\x00'
+                    conn.sendall(struct.pack(">i", len(body)) + body)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return f"127.0.0.1:{server.getsockname()[1]}"
+
+
+# Answers with the first bytes of a response only
+def stalling_broker() -> str:
+    server = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        conn, _ = server.accept()
+        with conn:
+            header = conn.recv(4, socket.MSG_WAITALL)
+            frame = conn.recv(struct.unpack(">i", header)[0], socket.MSG_WAITALL)
+            conn.sendall(struct.pack(">i", 100) + frame[4:8])
+            conn.recv(1)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return f"127.0.0.1:{server.getsockname()[1]}"
+
+
+# Answers every request with the same body, after Response Header v1 with the given tagged fields
+def fixed_response_broker(body: bytes, header_tag_buffer: bytes = b'\x00') -> str:
+    server = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        conn, _ = server.accept()
+        with conn:
+            while True:
+                header = conn.recv(4, socket.MSG_WAITALL)
+                if len(header) < 4:
+                    return
+                frame = conn.recv(struct.unpack(">i", header)[0], socket.MSG_WAITALL)
+                conn.sendall(struct.pack(">i", 4 + len(header_tag_buffer) + len(body)) + frame[4:8] +
+                             header_tag_buffer)
+                conn.sendall(body)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return f"127.0.0.1:{server.getsockname()[1]}"
+
+
+def api_versions_request() -> kafka.messages.ApiVersionsV3ApiRequest:
+    return kafka.messages.ApiVersionsV3ApiRequest(
+        client_software_name=kafka.datatypes.CompactString("unit-tests"),
+        client_software_version=kafka.datatypes.CompactString("1.0.0"),
+        tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+    )
+
+
+def test_late_responses_are_discarded():
+    client = SyncKafkaClient(fake_broker([0.3, 0]))
+
+    with pytest.raises(TimeoutError):
+        client.send(api_versions_request(), timeout=0.05)
+    # the response to the first request arrives first and must not be mistaken for this one
+    response = client.send(api_versions_request(), timeout=2)
+    client.close()
+
+    assert response.throttle_time_ms.val == 1
+
+
+def test_hedged_request_goes_to_the_other_broker():
+    client = HedgedKafkaClient(f"{fake_broker([1])},{fake_broker([0])}", default_hedge_delay=0.02)
+
+    start = time.monotonic()
+    response = client.send(api_versions_request(), timeout=2, hedge=True)
+    elapsed = time.monotonic() - start
+    client.close()
+
+    assert response.error_code.val == 0
+    assert elapsed < 0.5
+    assert (client.hedges, client.hedge_wins) == (1, 1)
+
+
+def test_fast_responses_are_not_hedged():
+    client = HedgedKafkaClient(f"{fake_broker([0])},{fake_broker([0])}", default_hedge_delay=0.5)
+
+    for _ in range(4):
+        client.send(api_versions_request(), timeout=2, hedge=True)
+    client.close()
+
+    assert client.hedges == 0
+
+
+def test_only_read_only_requests_are_hedged():
+    client = HedgedKafkaClient(f"{fake_broker([0])},{fake_broker([0])}")
+    request = kafka.messages.MetadataV12ApiRequest(
+        topics=kafka.datatypes.CompactArray(None),
+        allow_auto_topic_creation=kafka.datatypes.Boolean(True),
+        include_topic_authorized_operations=kafka.datatypes.Boolean(False),
+        tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+    )
+
+    with pytest.raises(Exception):
+        client.send(request, hedge=True)
+    client.close()
+
+
+def test_broken_connections_are_replaced():
+    client = HedgedKafkaClient(fake_broker([0], requests_per_connection=1))
+
+    assert client.send(api_versions_request(), timeout=2).throttle_time_ms.val == 0
+    with pytest.raises(OSError):
+        client.send(api_versions_request(), timeout=2)
+    assert client.send(api_versions_request(), timeout=2).throttle_time_ms.val == 0
+    client.close()
+
+
+def test_partly_received_response_blocks_no_hedge():
+    client = HedgedKafkaClient(f"{stalling_broker()},{fake_broker([0])}", default_hedge_delay=0.02)
+
+    response = client.send(api_versions_request(), timeout=2, hedge=True)
+
+    assert response.error_code.val == 0
+    assert client.hedge_wins == 1
+    client.close()
+
+
+def test_latencies_are_tracked_per_api_of_read_only_requests():
+    response = kafka.messages.MetadataV12ApiResponse(
+        kafka.datatypes.Int32(0), kafka.datatypes.CompactArray([]), kafka.datatypes.CompactNullableString(None),
+        kafka.datatypes.Int32(-1), kafka.datatypes.CompactArray([]), kafka.datatypes.EMPTY_TAG_BUFFER
+    )
+    metadata_broker = fixed_response_broker(kafka.dataclass_binding.serialize_data_class(response))
+    metadata = HedgedKafkaClient(metadata_broker, default_hedge_delay=0.5, min_samples=5)
+    slow = HedgedKafkaClient(fake_broker([0.03]), default_hedge_delay=0.5, min_samples=5)
+
+    for _ in range(5):
+        slow.send(api_versions_request(), timeout=2)
+        metadata.send(kafka.messages.MetadataV12ApiRequest(
+            topics=kafka.datatypes.CompactArray(None),
+            allow_auto_topic_creation=kafka.datatypes.Boolean(True),
+            include_topic_authorized_operations=kafka.datatypes.Boolean(False),
+            tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+        ), timeout=2)
+    slow.close()
+    metadata.close()
+
+    assert 0.03 <= slow.hedge_delay(18) < 0.5
+    assert slow.hedge_delay(3) == 0.5
+    # requests that may create topics can't be hedged, their latencies are left out
+    assert metadata.hedge_delay(3) == 0.5
+
+
+def test_reconnecting_waits_no_longer_than_the_deadline():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(0)
+    client = HedgedKafkaClient(f"127.0.0.1:{server.getsockname()[1]}")
+    conn, _ = server.accept()
+    conn.close()
+    with pytest.raises(OSError):
+        client.send(api_versions_request(), timeout=2)
+    # with a full accept backlog, connecting again neither succeeds nor fails
+    backlog = [socket.socket() for _ in range(4)]
+    for sock in backlog:
+        sock.setblocking(False)
+        sock.connect_ex(server.getsockname())
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        client.send(api_versions_request(), timeout=0.2)
+    elapsed = time.monotonic() - start
+    client.close()
+    for sock in [server] + backlog:
+        sock.close()
+
+    assert elapsed < 1
+
+
+def test_latency_percentile():
+    tracker = LatencyTracker(window=100)
+    for i in range(1, 101):
+        tracker.record(i / 1000)
+
+    assert tracker.percentile(95) == 0.095
+    assert tracker.percentile(50) == 0.05
+
+
+def test_large_responses_are_decoded_out_of_the_pooled_buffer():
+    records = b'r' * (1024 * 1024)
+    response = kafka.messages.FetchV12ApiResponse
+    body = kafka.dataclass_binding.serialize_data_class(response(
+        kafka.datatypes.Int32(0), kafka.datatypes.Int16(0), kafka.datatypes.Int32(0),
+        kafka.datatypes.CompactArray([response.Topic(kafka.datatypes.CompactString("t"), kafka.datatypes.CompactArray([
+            response.Topic.Partition(
+                kafka.datatypes.Int32(0), kafka.datatypes.Int16(0), kafka.datatypes.Int64(1), kafka.datatypes.Int64(1),
+                kafka.datatypes.Int64(0), kafka.datatypes.CompactArray([]), kafka.datatypes.Int32(-1),
+                kafka.datatypes.CompactRecords(records), kafka.datatypes.EMPTY_TAG_BUFFER
+            )
+        ]), kafka.datatypes.EMPTY_TAG_BUFFER)]),
+        kafka.datatypes.EMPTY_TAG_BUFFER
+    ))
+    pool = BufferPool()
+    client = SyncKafkaClient(fixed_response_broker(body), pool)
+    session = FetchSession()
+    session.set_position(TopicPartition("t", 0), FetchPosition(0))
+    request = session.build_request()
+    client.send(request)  # fills the pool
+    misses = pool.stats().misses
+
+    tracemalloc.start()
+    for _ in range(5):
+        assert client.send(request).responses.val[0].partitions.val[0].records.val == records
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    client.close()
+
+    # frames cycle through the pooled buffers, and the records are the only copy of the frame made
+    assert pool.stats().misses == misses
+    assert peak < 1.5 * len(records)
+
+
+def test_send_raw_skips_response_header_tagged_fields():
+    body = struct.pack(">ih", 0, 0) + b'\x00'  # HeartbeatV4ApiResponse
+    client = SyncKafkaClient(fixed_response_broker(body, header_tag_buffer=b'\x01\x00\x02ab'))
+
+    response = client.send_raw(kafka.messages.HeartbeatV4ApiRequest(
+        kafka.datatypes.CompactString("group"), kafka.datatypes.Int32(1), kafka.datatypes.CompactString("member"),
+        kafka.datatypes.CompactNullableString(None), kafka.datatypes.EMPTY_TAG_BUFFER
+    ), timeout=2)
+    client.close()
+
+    assert response == body
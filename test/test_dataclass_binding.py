@@ -1,4 +1,5 @@
 import pytest
+import uuid
 
 import bitstring
 
@@ -31,3 +32,87 @@ def test():
     assert class2.a.val == [kafka.datatypes.Int32(1), kafka.datatypes.Int32(2)]
     assert class2.b.attr1 == kafka.datatypes.Int16(3)
     assert class2.b.attr2 == kafka.datatypes.Int32(4)
+
+
+def metadata_response() -> kafka.messages.MetadataV12ApiResponse:
+    partition = kafka.messages.MetadataV12ApiResponse.Topic.Partition(
+        error_code=kafka.datatypes.Int16(0),
+        partition_index=kafka.datatypes.Int32(0),
+        leader_id=kafka.datatypes.Int32(1),
+        leader_epoch=kafka.datatypes.Int32(3),
+        replica_nodes=kafka.datatypes.CompactArray([kafka.datatypes.Int32(1), kafka.datatypes.Int32(2)]),
+        isr_nodes=kafka.datatypes.CompactArray([kafka.datatypes.Int32(1)]),
+        offline_replicas=kafka.datatypes.CompactArray([]),
+        tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+    )
+    topic = kafka.messages.MetadataV12ApiResponse.Topic(
+        error_code=kafka.datatypes.Int16(0),
+        name=kafka.datatypes.CompactNullableString("orders"),
+        topic_id=kafka.datatypes.Uuid(uuid.UUID("0b9a5ad2-3f5a-4d5b-9d8e-1f4a6b1c2d3e")),
+        is_internal=kafka.datatypes.Boolean(False),
+        partitions=kafka.datatypes.CompactArray([partition]),
+        topic_authorized_operations=kafka.datatypes.Int32(0),
+        tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+    )
+    return kafka.messages.MetadataV12ApiResponse(
+        throttle_time_ms=kafka.datatypes.Int32(0),
+        brokers=kafka.datatypes.CompactArray([]),
+        cluster_id=kafka.datatypes.CompactNullableString(None),
+        controller_id=kafka.datatypes.Int32(1),
+        topics=kafka.datatypes.CompactArray([topic]),
+        tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+    )
+
+
+def test_metadata_v12_response_roundtrip():
+    response = metadata_response()
+
+    stream = bitstring.BitStream(kafka.dataclass_binding.serialize_data_class(response))
+    decoded = kafka.dataclass_binding.dataclass_deserializer(kafka.messages.MetadataV12ApiResponse)(stream)
+
+    assert decoded == response
+
+
+def test_deserializers_are_compiled_once():
+    kafka.dataclass_binding.precompile(kafka.messages.MetadataV12ApiResponse)
+    deserializer = kafka.dataclass_binding.dataclass_deserializer(kafka.messages.MetadataV12ApiResponse)
+
+    assert kafka.dataclass_binding.dataclass_deserializer(kafka.messages.MetadataV12ApiResponse) is deserializer
+    assert kafka.messages.MetadataV12ApiResponse.Topic in kafka.dataclass_binding._deserializers
+
+
+def test_metadata_v12_response_buffer_deserializer():
+    response = metadata_response()
+    serialized = kafka.dataclass_binding.serialize_data_class(response)
+
+    deserializer = kafka.dataclass_binding.dataclass_buffer_deserializer(kafka.messages.MetadataV12ApiResponse)
+    (decoded, offset) = deserializer(memoryview(b'\xFF' + serialized + b'\xFF'), 1)
+
+    assert decoded == response
+    assert offset == 1 + len(serialized)
+
+
+@pytest.mark.parametrize("msg", [
+    metadata_response(),
+    kafka.messages.SyncGroupV4ApiRequest(
+        group_id=kafka.datatypes.CompactString("g"),
+        generation_id=kafka.datatypes.Int32(3),
+        member_id=kafka.datatypes.CompactString("m" * 200),
+        group_instance_id=kafka.datatypes.CompactNullableString(None),
+        assignments=kafka.datatypes.CompactArray([kafka.messages.SyncGroupV4ApiRequest.Assignment(
+            kafka.datatypes.CompactString("m"), kafka.datatypes.CompactBytes(b'\x00\x01'), kafka.datatypes.TagBuffer(
+                b'\x01\x00\x01\xAA')
+        )]),
+        tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+    ),
+    kafka.messages.RequestHeaderV2(kafka.datatypes.Int16(3), kafka.datatypes.Int16(12), kafka.datatypes.Int32(-7),
+                                   kafka.datatypes.NullableString("client"), kafka.datatypes.EMPTY_TAG_BUFFER),
+])
+def test_buffer_serializer(msg):
+    size = kafka.dataclass_binding.data_class_size(msg)
+    buf = bytearray(size + 2)
+
+    end = kafka.dataclass_binding.write_data_class_into(msg, buf, 1)
+
+    assert end == 1 + size
+    assert bytes(buf[1:end]) == kafka.dataclass_binding.serialize_data_class(msg)
@@ -0,0 +1,110 @@
+import pytest
+
+import bitstring
+
+import kafka.dataclass_binding
+from kafka.datatypes import CompactArray, CompactRecords, CompactString, Int16, Int32, Int64, EMPTY_TAG_BUFFER
+from kafka.fetch_session import FetchPosition, FetchSession, FETCH_SESSION_ID_NOT_FOUND
+from kafka.messages import FetchV12ApiRequest, FetchV12ApiResponse
+from kafka.topic_partition import TopicPartition
+
+A0 = TopicPartition("a", 0)
+A1 = TopicPartition("a", 1)
+B0 = TopicPartition("b", 0)
+
+
+def response(session_id: int, partitions: dict[TopicPartition, int], error_code: int = 0) -> FetchV12ApiResponse:
+    topics = {}
+    for tp, high_watermark in partitions.items():
+        topics.setdefault(tp.topic, []).append(FetchV12ApiResponse.Topic.Partition(
+            partition_index=Int32(tp.partition),
+            error_code=Int16(0),
+            high_watermark=Int64(high_watermark),
+            last_stable_offset=Int64(high_watermark),
+            log_start_offset=Int64(0),
+            aborted_transactions=CompactArray(None),
+            preferred_read_replica=Int32(-1),
+            records=CompactRecords(b'records'),
+            tag_buffer=EMPTY_TAG_BUFFER
+        ))
+    return FetchV12ApiResponse(
+        throttle_time_ms=Int32(0),
+        error_code=Int16(error_code),
+        session_id=Int32(session_id),
+        responses=CompactArray([
+            FetchV12ApiResponse.Topic(CompactString(topic), CompactArray(partitions), EMPTY_TAG_BUFFER)
+            for topic, partitions in topics.items()
+        ]),
+        tag_buffer=EMPTY_TAG_BUFFER
+    )
+
+
+def requested(request: FetchV12ApiRequest) -> set[TopicPartition]:
+    return {TopicPartition(topic.topic.val, partition.partition.val)
+            for topic in request.topics.val for partition in topic.partitions.val}
+
+
+def forgotten(request: FetchV12ApiRequest) -> set[TopicPartition]:
+    return {TopicPartition(topic.topic.val, partition.val)
+            for topic in request.forgotten_topics_data.val for partition in topic.partitions.val}
+
+
+def test_incremental_requests_only_carry_changes():
+    session = FetchSession()
+    for tp in (A0, A1, B0):
+        session.set_position(tp, FetchPosition(fetch_offset=0))
+
+    full = session.build_request()
+    assert (full.session_id.val, full.session_epoch.val) == (0, 0)
+    assert requested(full) == {A0, A1, B0}
+    session.handle_response(response(42, {A0: 10, A1: 20, B0: 30}))
+    assert (session.session_id, session.epoch) == (42, 1)
+
+    # nothing changed
+    incremental = session.build_request()
+    assert (incremental.session_id.val, incremental.session_epoch.val) == (42, 1)
+    assert requested(incremental) == set()
+    assert forgotten(incremental) == set()
+    session.handle_response(response(42, {A1: 25}))
+    assert session.partition_states[A0].high_watermark == 10
+    assert session.partition_states[A1].high_watermark == 25
+
+    session.set_position(A1, FetchPosition(fetch_offset=25))
+    session.remove_partition(B0)
+    incremental = session.build_request()
+    assert incremental.session_epoch.val == 2
+    assert requested(incremental) == {A1}
+    assert forgotten(incremental) == {B0}
+
+
+def test_session_error_falls_back_to_full_request():
+    session = FetchSession()
+    session.set_position(A0, FetchPosition(fetch_offset=0))
+    session.build_request()
+    session.handle_response(response(42, {A0: 10}))
+    session.build_request()
+
+    assert session.handle_response(response(0, {}, error_code=FETCH_SESSION_ID_NOT_FOUND)) == {}
+
+    full = session.build_request()
+    assert (full.session_id.val, full.session_epoch.val) == (0, 0)
+    assert requested(full) == {A0}
+
+
+def test_sessionless_broker_gets_full_requests():
+    session = FetchSession()
+    session.set_position(A0, FetchPosition(fetch_offset=0))
+    session.build_request()
+    session.handle_response(response(0, {A0: 10}))
+
+    assert requested(session.build_request()) == {A0}
+
+
+def test_fetch_v12_response_roundtrip():
+    res = response(42, {A0: 10, B0: 30})
+
+    stream = bitstring.BitStream(kafka.dataclass_binding.serialize_data_class(res))
+    decoded = kafka.dataclass_binding.dataclass_deserializer(FetchV12ApiResponse)(stream)
+
+    assert decoded.responses.val[1].partitions.val[0].records == CompactRecords(b'records')
+    assert decoded.session_id == Int32(42)
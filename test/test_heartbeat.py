@@ -0,0 +1,198 @@
+import socket
+import struct
+import threading
+import time
+
+import bitstring
+
+import kafka.dataclass_binding
+import kafka.messages
+from kafka.datatypes import Int16, Int32, EMPTY_TAG_BUFFER
+from kafka.heartbeat import CONNECTION_ERROR, GroupMembership, HeartbeatScheduler, TimingWheel, UNKNOWN_MEMBER_ID
+
+
+# Answers Heartbeat requests with the error code set for their group, recording when they arrived. A silent one never
+# answers.
+class FakeCoordinator:
+    def __init__(self, silent: bool = False):
+        self.silent = silent
+        self.error_codes = {}
+        self.heartbeats = []  # (time, group id, generation id, member id)
+        self.server = socket.create_server(("127.0.0.1", 0))
+        threading.Thread(target=self.__accept, daemon=True).start()
+
+    def address(self) -> str: return f"127.0.0.1:{self.server.getsockname()[1]}"
+
+    def __accept(self):
+        while True:
+            conn, _ = self.server.accept()
+            threading.Thread(target=self.__serve, args=(conn,), daemon=True).start()
+
+    def __serve(self, conn: socket.socket):
+        with conn:
+            while True:
+                size = conn.recv(4, socket.MSG_WAITALL)
+                if len(size) < 4:
+                    return
+                stream = bitstring.BitStream(conn.recv(struct.unpack(">i", size)[0], socket.MSG_WAITALL))
+                header = kafka.dataclass_binding.dataclass_deserializer(kafka.messages.RequestHeaderV2)(stream)
+                request = kafka.dataclass_binding.dataclass_deserializer(kafka.messages.HeartbeatV4ApiRequest)(stream)
+                self.heartbeats.append((time.monotonic(), request.group_id.val, request.generation_id.val,
+                                        request.member_id.val))
+                if self.silent:
+                    continue
+                body = kafka.dataclass_binding.serialize_data_class(kafka.messages.HeartbeatV4ApiResponse(
+                    Int32(0), Int16(self.error_codes.get(request.group_id.val, 0)), EMPTY_TAG_BUFFER
+                ))
+                response_header = header.correlation_id.val.to_bytes(4, "big") + b'\x00'
+                conn.sendall(struct.pack(">i", len(response_header) + len(body)) + response_header + body)
+
+
+def test_timing_wheel():
+    wheel = TimingWheel(tick=1.0, size=4, start=0.0)
+    wheel.schedule(2.5, "a")
+    wheel.schedule(6.0, "b")  # wraps around to the slot of tick 2
+    wheel.schedule(0.0, "c")  # already due, fired on the next tick
+
+    assert wheel.advance(0.5) == []
+    assert wheel.advance(1.0) == ["c"]
+    assert wheel.next_tick_time() == 2.0
+    assert wheel.advance(3.0) == ["a"]
+    assert wheel.advance(5.9) == []
+    assert wheel.advance(10.0) == ["b"]
+
+
+def test_heartbeats_on_schedule():
+    coordinator = FakeCoordinator()
+    scheduler = HeartbeatScheduler(tick=0.005)
+    scheduler.register(GroupMembership("g1", "m1", 1, coordinator.address(), 0.05))
+    scheduler.register(GroupMembership("g2", "m2", 3, coordinator.address(), 0.1))
+    scheduler.start()
+    try:
+        time.sleep(0.33)
+        scheduler.update_generation("g1", 2, "m1-bis")
+        time.sleep(0.12)
+    finally:
+        scheduler.stop()
+
+    g1 = [beat for beat in coordinator.heartbeats if beat[1] == "g1"]
+    g2 = [beat for beat in coordinator.heartbeats if beat[1] == "g2"]
+    assert 7 <= len(g1) <= 9
+    assert 3 <= len(g2) <= 5
+    assert all(beat[2:] == (3, "m2") for beat in g2)
+    assert g1[0][2:] == (1, "m1") and g1[-1][2:] == (2, "m1-bis")
+
+    stats = scheduler.stats()
+    assert stats.sent == len(coordinator.heartbeats)
+    assert stats.failed == 0
+    assert 0 <= stats.jitter_p50 <= stats.jitter_p99 <= stats.jitter_max < 0.05
+
+
+def test_heartbeat_errors():
+    coordinator = FakeCoordinator()
+    coordinator.error_codes["g1"] = UNKNOWN_MEMBER_ID
+    errors = []
+    scheduler = HeartbeatScheduler(tick=0.005, on_error=lambda membership, error_code:
+                                   errors.append((membership.group_id, error_code)))
+    scheduler.register(GroupMembership("g1", "m1", 1, coordinator.address(), 0.02))
+    scheduler.register(GroupMembership("g2", "m2", 1, coordinator.address(), 0.02))
+    scheduler.start()
+    try:
+        time.sleep(0.15)
+    finally:
+        scheduler.stop()
+
+    # the member isn't in the group anymore, heartbeats for it stop after the first error
+    assert errors == [("g1", UNKNOWN_MEMBER_ID)]
+    assert [beat[1] for beat in coordinator.heartbeats].count("g1") == 1
+    assert scheduler.stats().failed == 1
+
+
+def test_silent_coordinator_delays_no_other_group():
+    coordinator = FakeCoordinator()
+    silent_coordinator = FakeCoordinator(silent=True)
+    errors = []
+    scheduler = HeartbeatScheduler(tick=0.005, request_timeout=0.15, on_error=lambda membership, error_code:
+                                   errors.append((membership.group_id, error_code)))
+    scheduler.register(GroupMembership("g1", "m1", 1, coordinator.address(), 0.05))
+    scheduler.register(GroupMembership("g2", "m2", 1, silent_coordinator.address(), 0.05))
+    scheduler.start()
+    try:
+        time.sleep(0.53)
+    finally:
+        scheduler.stop()
+
+    # heartbeats of g1 keep their cadence while those of g2 time out, the coordinator being reconnected to after a
+    # backoff, during which heartbeats of g2 fail right away
+    assert 9 <= [beat[1] for beat in coordinator.heartbeats].count("g1") <= 11
+    assert 5 <= [beat[1] for beat in silent_coordinator.heartbeats].count("g2") <= 11
+    assert set(errors) == {("g2", CONNECTION_ERROR)}
+    assert 6 <= len(errors) <= 11
+
+    stats = scheduler.stats()
+    assert stats.failed == len(errors)
+    assert stats.jitter_max < 0.05
+
+
+# Listens with a full accept backlog: connecting to it neither succeeds nor fails. Returns the address along with the
+# sockets to keep open.
+def unreachable_coordinator() -> tuple[str, list[socket.socket]]:
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(0)
+    sockets = [server]
+    for _ in range(4):
+        sockets.append(socket.socket())
+        sockets[-1].setblocking(False)
+        sockets[-1].connect_ex(server.getsockname())
+    return f"127.0.0.1:{server.getsockname()[1]}", sockets
+
+
+def test_unreachable_coordinator_delays_no_other_group():
+    coordinator = FakeCoordinator()
+    (unreachable, sockets) = unreachable_coordinator()
+    errors = []
+    scheduler = HeartbeatScheduler(tick=0.005, request_timeout=0.2, on_error=lambda membership, error_code:
+                                   errors.append((membership.group_id, error_code)))
+    scheduler.register(GroupMembership("g1", "m1", 1, coordinator.address(), 0.05))
+    scheduler.register(GroupMembership("g2", "m2", 1, unreachable, 0.05))
+    scheduler.start()
+    try:
+        time.sleep(0.53)
+    finally:
+        scheduler.stop()
+        for sock in sockets:
+            sock.close()
+
+    assert 9 <= len(coordinator.heartbeats) <= 11
+    assert set(errors) == {("g2", CONNECTION_ERROR)}
+    stats = scheduler.stats()
+    assert stats.sent == len(coordinator.heartbeats)
+    assert stats.jitter_max < 0.05
+
+
+def test_failed_coordinators_are_reconnected_to_after_a_backoff():
+    server = socket.create_server(("127.0.0.1", 0))
+    connections = []
+
+    def accept():
+        while True:
+            conn, _ = server.accept()
+            connections.append(conn)
+            conn.close()
+
+    threading.Thread(target=accept, daemon=True).start()
+    errors = []
+    scheduler = HeartbeatScheduler(tick=0.005, reconnect_backoff=0.1, reconnect_backoff_max=0.2,
+                                   on_error=lambda membership, error_code: errors.append(error_code))
+    scheduler.register(GroupMembership("g1", "m1", 1, f"127.0.0.1:{server.getsockname()[1]}", 0.02))
+    scheduler.start()
+    try:
+        time.sleep(0.5)
+    finally:
+        scheduler.stop()
+
+    # connecting again after 0.1s, then every 0.2s, rather than for every heartbeat
+    assert 2 <= len(connections) <= 4
+    assert set(errors) == {CONNECTION_ERROR}
+    assert len(errors) >= 20
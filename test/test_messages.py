@@ -1,4 +1,9 @@
 import pytest
+import subprocess
+import sys
+import uuid
+
+import bitstring
 
 import kafka.datatypes
 import kafka.messages
@@ -41,3 +46,75 @@ def test_response_type():
     )
 
     assert req.response_type() == kafka.messages.ApiVersionsV3ApiResponse
+
+
+def test_data_class_size_matches_serialized_length():
+    req = kafka.messages.MetadataV12ApiRequest(
+        topics=kafka.datatypes.CompactArray([
+            kafka.messages.MetadataV12ApiRequest.Topic(
+                topic_id=kafka.datatypes.Uuid(uuid.UUID(int=7)),
+                name=kafka.datatypes.CompactNullableString("topic-" + "x" * 200),  # 2 bytes varint length
+                tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+            ),
+            kafka.messages.MetadataV12ApiRequest.Topic(
+                topic_id=kafka.datatypes.Uuid(uuid.UUID(int=8)),
+                name=kafka.datatypes.CompactNullableString(None),
+                tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+            ),
+        ]),
+        allow_auto_topic_creation=kafka.datatypes.Boolean(False),
+        include_topic_authorized_operations=kafka.datatypes.Boolean(True),
+        tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+    )
+
+    serialized = kafka.dataclass_binding.serialize_data_class(req)
+
+    # [topics] => 1 + (16 + 2 + 206 + 1) + (16 + 1 + 1), booleans => 2, tag buffer => 1
+    assert kafka.dataclass_binding.data_class_size(req) == len(serialized) == 247
+
+
+def test_sync_group_v4_request_round_trip():
+    req = kafka.messages.SyncGroupV4ApiRequest(
+        group_id=kafka.datatypes.CompactString("g"),
+        generation_id=kafka.datatypes.Int32(3),
+        member_id=kafka.datatypes.CompactString("m"),
+        group_instance_id=kafka.datatypes.CompactNullableString(None),
+        assignments=kafka.datatypes.CompactArray([
+            kafka.messages.SyncGroupV4ApiRequest.Assignment(
+                member_id=kafka.datatypes.CompactString("m"),
+                assignment=kafka.datatypes.CompactBytes(b'\x00\x01\x02'),
+                tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+            )
+        ]),
+        tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+    )
+
+    serialized = kafka.dataclass_binding.serialize_data_class(req)
+    decoded = kafka.dataclass_binding.dataclass_deserializer(kafka.messages.SyncGroupV4ApiRequest)(
+        bitstring.BitStream(serialized))
+
+    assert kafka.dataclass_binding.data_class_size(req) == len(serialized) == 18
+    assert decoded.assignments.val[0].assignment.val == b'\x00\x01\x02'
+    assert decoded.generation_id.val == 3
+
+
+def test_find_request_type():
+    for (api_key, api_version), name in kafka.messages._REQUESTS.items():
+        request_type = kafka.messages.find_request_type(api_key, api_version)
+        request = request_type.__new__(request_type)
+        assert request_type.__name__ == name
+        assert (request.request_api_key(), request.request_api_version()) == (api_key, api_version)
+        assert request.response_type().__name__ in kafka.messages._MODULES
+
+    assert kafka.messages.find_request_type(0, 9) is None
+
+
+def test_messages_are_imported_on_first_access():
+    code = "import sys, kafka.client, kafka.messages; " \
+           "assert 'kafka.messages.fetch' not in sys.modules; " \
+           "kafka.messages.FetchV12ApiRequest; " \
+           "assert 'kafka.messages.fetch' in sys.modules and 'kafka.messages.metadata' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+    with pytest.raises(AttributeError):
+        kafka.messages.FetchV99ApiRequest
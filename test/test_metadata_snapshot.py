@@ -0,0 +1,128 @@
+import pytest
+import uuid
+
+from kafka.datatypes import Boolean, CompactArray, CompactNullableString, CompactString, Int16, Int32, Uuid, \
+    EMPTY_TAG_BUFFER
+from kafka.messages import MetadataV12ApiResponse
+from kafka.metadata_snapshot import MetadataSnapshot
+from kafka.topic_partition import TopicPartition
+
+TOPIC_IDS = {"orders": uuid.UUID(int=1), "payments": uuid.UUID(int=2), "audit": uuid.UUID(int=3)}
+
+
+def broker(node_id: int, host: str = None) -> MetadataV12ApiResponse.Broker:
+    return MetadataV12ApiResponse.Broker(
+        node_id=Int32(node_id),
+        host=CompactString(host or f"broker-{node_id}"),
+        port=Int32(9092),
+        rack=CompactNullableString(None),
+        tag_buffer=EMPTY_TAG_BUFFER
+    )
+
+
+def partition(index: int, leader: int, epoch: int, isr: list[int]) -> MetadataV12ApiResponse.Topic.Partition:
+    return MetadataV12ApiResponse.Topic.Partition(
+        error_code=Int16(0),
+        partition_index=Int32(index),
+        leader_id=Int32(leader),
+        leader_epoch=Int32(epoch),
+        replica_nodes=CompactArray([Int32(1), Int32(2), Int32(3)]),
+        isr_nodes=CompactArray([Int32(node) for node in isr]),
+        offline_replicas=CompactArray([]),
+        tag_buffer=EMPTY_TAG_BUFFER
+    )
+
+
+def topic(name: str, partitions: list, error_code: int = 0) -> MetadataV12ApiResponse.Topic:
+    return MetadataV12ApiResponse.Topic(
+        error_code=Int16(error_code),
+        name=CompactNullableString(name),
+        topic_id=Uuid(TOPIC_IDS[name]),
+        is_internal=Boolean(False),
+        partitions=CompactArray(partitions),
+        topic_authorized_operations=Int32(-2147483648),
+        tag_buffer=EMPTY_TAG_BUFFER
+    )
+
+
+def response(brokers: list, topics: list, controller_id: int = 1) -> MetadataV12ApiResponse:
+    return MetadataV12ApiResponse(
+        throttle_time_ms=Int32(0),
+        brokers=CompactArray(brokers),
+        cluster_id=CompactNullableString("cluster"),
+        controller_id=Int32(controller_id),
+        topics=CompactArray(topics),
+        tag_buffer=EMPTY_TAG_BUFFER
+    )
+
+
+def test_snapshot():
+    snapshot = MetadataSnapshot.from_response(response(
+        [broker(1), broker(2)],
+        [topic("orders", [partition(0, 1, 5, [1, 2, 3]), partition(1, 2, 7, [2, 3])])]
+    ))
+
+    assert snapshot.cluster_id == "cluster"
+    assert snapshot.brokers[2].host == "broker-2"
+    orders = snapshot.topics["orders"]
+    assert orders.topic_id == TOPIC_IDS["orders"]
+    assert orders.partitions()[1].leader_epoch == 7
+    assert orders.partitions()[1].isr_nodes == (2, 3)
+    assert orders.partitions()[0].replica_nodes == (1, 2, 3)
+
+
+def test_unchanged_topics_are_skipped():
+    topics = [topic("orders", [partition(0, 1, 5, [1, 2, 3])]), topic("payments", [partition(0, 2, 1, [2])])]
+    old = MetadataSnapshot.from_response(response([broker(1), broker(2)], topics))
+    new = MetadataSnapshot.from_response(response([broker(1), broker(2)], topics))
+
+    delta = old.diff(new)
+
+    assert delta.is_empty()
+    assert delta.topics_compared == 0
+
+
+def test_topic_errors_are_reported():
+    partitions = [partition(0, 1, 5, [1, 2, 3])]
+    old = MetadataSnapshot.from_response(response([broker(1)], [topic("orders", partitions)]))
+    new = MetadataSnapshot.from_response(response([broker(1)], [topic("orders", partitions, error_code=29)]))
+
+    delta = old.diff(new)
+
+    assert not delta.is_empty()
+    assert [(c.topic, c.old.error_code, c.new.error_code) for c in delta.topic_changes] == [("orders", 0, 29)]
+    assert delta.topics_compared == 1
+
+
+def test_diff():
+    old = MetadataSnapshot.from_response(response(
+        [broker(1), broker(2), broker(3)],
+        [
+            topic("orders", [partition(0, 1, 5, [1, 2, 3]), partition(1, 2, 7, [2, 3]), partition(2, 3, 1, [3])]),
+            topic("payments", [partition(0, 2, 1, [2])]),
+            topic("audit", [partition(0, 1, 1, [1])]),
+        ]
+    ))
+    new = MetadataSnapshot.from_response(response(
+        [broker(1), broker(2, host="broker-2.new"), broker(4)],
+        [
+            topic("orders", [partition(0, 2, 6, [2, 3]), partition(1, 2, 8, [2, 3]), partition(3, 1, 0, [1])]),
+            topic("payments", [partition(0, 2, 1, [2])]),
+        ],
+        controller_id=2
+    ))
+
+    delta = old.diff(new)
+
+    assert [b.node_id for b in delta.brokers_joined] == [4]
+    assert [b.node_id for b in delta.brokers_left] == [3]
+    assert [b.host for b in delta.brokers_updated] == ["broker-2.new"]
+    assert delta.controller_changed == (1, 2)
+    assert delta.topics_deleted == ["audit"]
+    assert delta.topics_created == []
+    assert delta.topics_compared == 1  # payments is unchanged and never decoded
+    assert [c.topic_partition for c in delta.leader_changes] == [TopicPartition("orders", 0)]
+    assert [(c.old.leader_epoch, c.new.leader_epoch) for c in delta.epoch_changes] == [(7, 8)]
+    assert [c.new.isr_nodes for c in delta.isr_changes] == [(2, 3)]
+    assert delta.partitions_added == [TopicPartition("orders", 3)]
+    assert delta.partitions_removed == [TopicPartition("orders", 2)]
@@ -0,0 +1,211 @@
+import pytest
+import socket
+import struct
+import threading
+import uuid
+
+import bitstring
+
+import kafka.dataclass_binding
+import kafka.messages
+from kafka.datatypes import Boolean, CompactArray, CompactNullableString, CompactString, Int16, Int32, Int64, Uuid, \
+    EMPTY_TAG_BUFFER
+from kafka.offsets import LEADER_NOT_AVAILABLE, OffsetsClient, PartitionLag, UNKNOWN_TOPIC_OR_PARTITION
+from kafka.topic_partition import TopicPartition
+
+LEADERS = {0: 1, 1: 2, 2: 1}  # partition => node id of topic "t"
+COORDINATOR = 2
+
+
+# Brokers of a fake cluster, each answering with handle(node_id, request)
+class FakeCluster:
+    def __init__(self, node_ids: list[int]):
+        self.requests = []  # (node id, api key) of every request received
+        self.leaders = dict(LEADERS)
+        self.connections = {node_id: [] for node_id in node_ids}  # accepted, of every node
+        self.servers = {node_id: socket.create_server(("127.0.0.1", 0)) for node_id in node_ids}
+        self.ports = {node_id: server.getsockname()[1] for node_id, server in self.servers.items()}
+        for node_id, server in self.servers.items():
+            threading.Thread(target=self.__accept, args=(node_id, server), daemon=True).start()
+
+    def bootstrap(self) -> str: return f"127.0.0.1:{self.ports[1]}"
+
+    def __accept(self, node_id: int, server: socket.socket):
+        while True:
+            conn, _ = server.accept()
+            self.connections[node_id].append(conn)
+            threading.Thread(target=self.__serve, args=(node_id, conn), daemon=True).start()
+
+    # Closes every connection to a node, as a broker restart would
+    def disconnect(self, node_id: int):
+        for conn in self.connections[node_id]:
+            conn.shutdown(socket.SHUT_RDWR)
+        self.connections[node_id] = []
+
+    def __serve(self, node_id: int, conn: socket.socket):
+        with conn:
+            while True:
+                try:
+                    size = conn.recv(4, socket.MSG_WAITALL)
+                except OSError:
+                    return
+                if len(size) < 4:
+                    return
+                stream = bitstring.BitStream(conn.recv(struct.unpack(">i", size)[0], socket.MSG_WAITALL))
+                header = kafka.dataclass_binding.dataclass_deserializer(kafka.messages.RequestHeaderV2)(stream)
+                request_type = kafka.messages.find_request_type(header.request_api_key.val,
+                                                                header.request_api_version.val)
+                request = kafka.dataclass_binding.dataclass_deserializer(request_type)(stream)
+                self.requests.append((node_id, header.request_api_key.val))
+
+                body = kafka.dataclass_binding.serialize_data_class(self.handle(node_id, request))
+                response_header = header.correlation_id.val.to_bytes(4, "big")
+                if request.response_header_version() == 1:
+                    response_header += b'\x00'
+                conn.sendall(struct.pack(">i", len(response_header) + len(body)) + response_header + body)
+
+    def handle(self, node_id: int, request):
+        match request:
+            case kafka.messages.MetadataV12ApiRequest():
+                return self.metadata()
+            case kafka.messages.FindCoordinatorV3ApiRequest():
+                return kafka.messages.FindCoordinatorV3ApiResponse(
+                    Int32(0), Int16(0), CompactNullableString(None), Int32(COORDINATOR), CompactString("127.0.0.1"),
+                    Int32(self.ports[COORDINATOR]), EMPTY_TAG_BUFFER
+                )
+            case kafka.messages.ListOffsetsV7ApiRequest():
+                response = kafka.messages.ListOffsetsV7ApiResponse
+                return response(Int32(0), CompactArray([response.Topic(topic.name, CompactArray([
+                    response.Topic.Partition(p.partition_index,
+                                             Int16(0 if self.leaders[p.partition_index.val] == node_id else 6),
+                                             Int64(-1), Int64(100 + p.partition_index.val), Int32(0), EMPTY_TAG_BUFFER)
+                    for p in topic.partitions.val
+                ]), EMPTY_TAG_BUFFER) for topic in request.topics.val]), EMPTY_TAG_BUFFER)
+            case kafka.messages.OffsetFetchV7ApiRequest():
+                response = kafka.messages.OffsetFetchV7ApiResponse
+                return response(Int32(0), CompactArray([response.Topic(CompactString("t"), CompactArray([
+                    response.Topic.Partition(Int32(0), Int64(90), Int32(-1), CompactNullableString(None), Int16(0),
+                                             EMPTY_TAG_BUFFER),
+                    response.Topic.Partition(Int32(1), Int64(101), Int32(-1), CompactNullableString(None), Int16(0),
+                                             EMPTY_TAG_BUFFER),
+                    response.Topic.Partition(Int32(2), Int64(-1), Int32(-1), CompactNullableString(None), Int16(0),
+                                             EMPTY_TAG_BUFFER),
+                ]), EMPTY_TAG_BUFFER)]), Int16(0), EMPTY_TAG_BUFFER)
+            case kafka.messages.OffsetCommitV8ApiRequest():
+                response = kafka.messages.OffsetCommitV8ApiResponse
+                return response(Int32(0), CompactArray([response.Topic(topic.name, CompactArray([
+                    response.Topic.Partition(p.partition_index, Int16(0), EMPTY_TAG_BUFFER)
+                    for p in topic.partitions.val
+                ]), EMPTY_TAG_BUFFER) for topic in request.topics.val]), EMPTY_TAG_BUFFER)
+
+    def metadata(self) -> kafka.messages.MetadataV12ApiResponse:
+        response = kafka.messages.MetadataV12ApiResponse
+        return response(
+            throttle_time_ms=Int32(0),
+            brokers=CompactArray([
+                response.Broker(Int32(node_id), CompactString("127.0.0.1"), Int32(port), CompactNullableString(None),
+                                EMPTY_TAG_BUFFER)
+                for node_id, port in self.ports.items()
+            ]),
+            cluster_id=CompactNullableString("cluster"),
+            controller_id=Int32(1),
+            topics=CompactArray([response.Topic(
+                Int16(0), CompactNullableString("t"), Uuid(uuid.UUID(int=1)), Boolean(False),
+                CompactArray([
+                    response.Topic.Partition(Int16(0), Int32(index), Int32(leader), Int32(0), CompactArray([]),
+                                             CompactArray([]), CompactArray([]), EMPTY_TAG_BUFFER)
+                    for index, leader in self.leaders.items()
+                ]),
+                Int32(0), EMPTY_TAG_BUFFER
+            )]),
+            tag_buffer=EMPTY_TAG_BUFFER
+        )
+
+
+@pytest.fixture
+def cluster():
+    return FakeCluster([1, 2])
+
+
+def test_list_offsets_sends_one_request_per_leader(cluster):
+    client = OffsetsClient(cluster.bootstrap(), timeout=5)
+
+    table = client.list_offsets([TopicPartition("t", 0), TopicPartition("t", 1), TopicPartition("t", 2),
+                                 TopicPartition("missing", 0)])
+    client.close()
+
+    assert table.offsets == {TopicPartition("t", 0): 100, TopicPartition("t", 1): 101, TopicPartition("t", 2): 102}
+    assert table.errors == {TopicPartition("missing", 0): UNKNOWN_TOPIC_OR_PARTITION}
+    list_offsets_requests = sorted(node_id for node_id, api_key in cluster.requests if api_key == 2)
+    assert list_offsets_requests == [1, 2]
+
+
+def test_list_offsets_refreshes_stale_leaders(cluster):
+    client = OffsetsClient(cluster.bootstrap(), timeout=5)
+    partitions = [TopicPartition("t", 0), TopicPartition("t", 1), TopicPartition("t", 2)]
+    client.list_offsets(partitions)
+
+    # partition 1 moves to node 1, the leader of partition 2 is a node the client doesn't know
+    cluster.leaders.update({1: 1, 2: 3})
+    table = client.list_offsets(partitions)
+    client.close()
+
+    assert table.offsets == {TopicPartition("t", 0): 100, TopicPartition("t", 1): 101}
+    assert table.errors == {TopicPartition("t", 2): LEADER_NOT_AVAILABLE}
+    assert [api_key for _, api_key in cluster.requests].count(3) == 2
+    # 2 rounds to both nodes, then partition 1 alone retried on node 1
+    assert sorted(node_id for node_id, api_key in cluster.requests if api_key == 2) == [1, 1, 1, 2, 2]
+
+
+def test_lost_broker_connections_are_reestablished(cluster):
+    client = OffsetsClient(cluster.bootstrap(), timeout=5)
+    partitions = [TopicPartition("t", 0), TopicPartition("t", 1), TopicPartition("t", 2)]
+    client.list_offsets(partitions)
+
+    cluster.disconnect(2)
+    with pytest.raises(OSError):
+        client.list_offsets(partitions)
+    table = client.list_offsets(partitions)
+    client.close()
+
+    assert table.offsets == {TopicPartition("t", 0): 100, TopicPartition("t", 1): 101, TopicPartition("t", 2): 102}
+    assert len(cluster.connections[2]) == 1
+
+
+def test_lost_bootstrap_connection_is_reestablished(cluster):
+    client = OffsetsClient(cluster.bootstrap(), timeout=5)
+    client.refresh_metadata()
+
+    cluster.disconnect(1)
+    with pytest.raises(OSError):
+        client.refresh_metadata()
+    client.refresh_metadata()
+    coordinator = client.find_coordinator("group")
+    client.close()
+
+    assert coordinator == COORDINATOR
+    assert len(cluster.connections[1]) == 1
+
+
+def test_consumer_lag(cluster):
+    client = OffsetsClient(cluster.bootstrap(), timeout=5)
+
+    lag = client.consumer_lag("group")
+    client.close()
+
+    assert lag == {
+        TopicPartition("t", 0): PartitionLag(90, 100, 10),
+        TopicPartition("t", 1): PartitionLag(101, 101, 0),
+        TopicPartition("t", 2): PartitionLag(-1, 102, None),
+    }
+    assert (COORDINATOR, 9) in cluster.requests
+
+
+def test_commit_offsets(cluster):
+    client = OffsetsClient(cluster.bootstrap(), timeout=5)
+
+    errors = client.commit_offsets("group", {TopicPartition("t", 0): 5, TopicPartition("t", 1): 7})
+    client.close()
+
+    assert errors == {}
+    assert (COORDINATOR, 8) in cluster.requests
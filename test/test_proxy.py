@@ -0,0 +1,213 @@
+import pytest
+import asyncio
+import socket
+import struct
+
+import bitstring
+
+import kafka.datatypes
+import kafka.messages
+import kafka.dataclass_binding
+from kafka.proxy import KafkaProxy
+
+
+def metadata_v12_response_body() -> bytes:
+    res = kafka.messages.MetadataV12ApiResponse(
+        throttle_time_ms=kafka.datatypes.Int32(0),
+        brokers=kafka.datatypes.CompactArray([kafka.messages.MetadataV12ApiResponse.Broker(
+            node_id=kafka.datatypes.Int32(1),
+            host=kafka.datatypes.CompactString("broker-1.internal"),
+            port=kafka.datatypes.Int32(9092),
+            rack=kafka.datatypes.CompactNullableString(None),
+            tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+        )]),
+        cluster_id=kafka.datatypes.CompactNullableString("cluster"),
+        controller_id=kafka.datatypes.Int32(1),
+        topics=kafka.datatypes.CompactArray([]),
+        tag_buffer=kafka.datatypes.EMPTY_TAG_BUFFER
+    )
+    return kafka.dataclass_binding.serialize_data_class(res)
+
+
+def find_coordinator_v3_response_body() -> bytes:
+    return kafka.dataclass_binding.serialize_data_class(kafka.messages.FindCoordinatorV3ApiResponse(
+        kafka.datatypes.Int32(0), kafka.datatypes.Int16(0), kafka.datatypes.CompactNullableString(None),
+        kafka.datatypes.Int32(1), kafka.datatypes.CompactString("broker-1.internal"), kafka.datatypes.Int32(9092),
+        kafka.datatypes.EMPTY_TAG_BUFFER
+    ))
+
+
+# Answers every request with its own api key as body, except Metadata (with a tagged field in the response header) and
+# FindCoordinator which get real responses, and Fetch which gets a large one
+async def fake_broker(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            (size,) = struct.unpack(">i", await reader.readexactly(4))
+            frame = await reader.readexactly(size)
+            (api_key, _, correlation_id) = struct.unpack_from(">hhi", frame)
+            if api_key == 3:
+                body = b'\x01\x00\x02ab' + metadata_v12_response_body()
+            elif api_key == 10:
+                body = b'\x00' + find_coordinator_v3_response_body()
+            elif api_key == 1:
+                body = bytes(8 * 1024 * 1024)
+            else:
+                body = struct.pack(">h", api_key)
+            writer.write(struct.pack(">ii", 4 + len(body), correlation_id) + body)
+            await writer.drain()
+    except asyncio.IncompleteReadError:
+        writer.close()
+
+
+def request_frame(api_key: int, api_version: int, correlation_id: int, body: bytes = b'') -> bytes:
+    header = struct.pack(">hhih", api_key, api_version, correlation_id, -1) + b'\x00'
+    return struct.pack(">i", len(header) + len(body)) + header + body
+
+
+async def roundtrip(port: int, api_key: int, api_version: int, correlation_id: int, body: bytes = b'') -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request_frame(api_key, api_version, correlation_id, body))
+    (size,) = struct.unpack(">i", await reader.readexactly(4))
+    response = await reader.readexactly(size)
+    writer.close()
+    return response
+
+
+# Answers the first request of every connection like fake_broker, then closes the connection
+async def one_shot_broker(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    (size,) = struct.unpack(">i", await reader.readexactly(4))
+    frame = await reader.readexactly(size)
+    (api_key, _, correlation_id) = struct.unpack_from(">hhi", frame)
+    writer.write(struct.pack(">iih", 6, correlation_id, api_key))
+    await writer.drain()
+    writer.close()
+
+
+async def with_proxy(test, address_rewriter=None, broker_handler=fake_broker):
+    broker = await asyncio.start_server(broker_handler, "127.0.0.1", 0)
+    broker_port = broker.sockets[0].getsockname()[1]
+    proxy = KafkaProxy(f"127.0.0.1:{broker_port}", upstream_connections=1, address_rewriter=address_rewriter)
+    server = await proxy.start("127.0.0.1", 0)
+    try:
+        await test(proxy, server.sockets[0].getsockname()[1])
+    finally:
+        await proxy.close()
+        broker.close()
+
+
+def test_clients_are_multiplexed_onto_one_upstream_connection():
+    async def test(proxy, port):
+        # both clients use the same correlation id, the proxy must tell their responses apart
+        responses = await asyncio.gather(roundtrip(port, 18, 3, 7), roundtrip(port, 19, 7, 7))
+
+        assert responses[0] == struct.pack(">ih", 7, 18)
+        assert responses[1] == struct.pack(">ih", 7, 19)
+        assert proxy.stats.downstream_connections == 2
+        assert proxy.stats.requests == proxy.stats.responses == 2
+
+    asyncio.run(with_proxy(test))
+
+
+def test_slow_client_delays_no_other_client():
+    async def test(proxy, port):
+        # asks for a response much larger than socket buffers, and doesn't read it
+        slow = socket.socket()
+        slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        slow.connect(("127.0.0.1", port))
+        (_, slow_writer) = await asyncio.open_connection(sock=slow)
+        slow_writer.write(request_frame(1, 12, 1))
+        await slow_writer.drain()
+        while proxy.stats.responses == 0:
+            await asyncio.sleep(0.01)
+
+        response = await asyncio.wait_for(roundtrip(port, 18, 3, 7), 2)
+
+        assert response == struct.pack(">ih", 7, 18)
+        slow_writer.close()
+
+    asyncio.run(with_proxy(test))
+
+
+def test_lost_upstream_connections_are_reestablished():
+    async def test(proxy, port):
+        # pinned to the upstream connection, but without requests in flight
+        (idle_reader, idle_writer) = await asyncio.open_connection("127.0.0.1", port)
+        await asyncio.sleep(0.01)
+
+        assert await roundtrip(port, 18, 3, 7) == struct.pack(">ih", 7, 18)
+        # the broker closed the connection after answering, so are the connections of clients pinned to it
+        assert await asyncio.wait_for(idle_reader.read(), 1) == b''
+        idle_writer.close()
+
+        while proxy.stats.upstream_reconnects == 0:
+            await asyncio.sleep(0.01)
+        assert await asyncio.wait_for(roundtrip(port, 19, 3, 8), 1) == struct.pack(">ih", 8, 19)
+
+    asyncio.run(with_proxy(test, broker_handler=one_shot_broker))
+
+
+def test_close_disconnects_clients():
+    async def test(proxy, port):
+        (reader, writer) = await asyncio.open_connection("127.0.0.1", port)
+        await asyncio.sleep(0.01)
+
+        await proxy.close()
+
+        assert await asyncio.wait_for(reader.read(), 1) == b''
+        writer.close()
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    asyncio.run(with_proxy(test))
+
+
+def test_metadata_broker_addresses_are_rewritten():
+    async def test(proxy, port):
+        response = await roundtrip(port, 3, 12, 42)
+
+        assert response[:9] == struct.pack(">i", 42) + b'\x01\x00\x02ab'
+        decoded = kafka.dataclass_binding.dataclass_deserializer(kafka.messages.MetadataV12ApiResponse)(
+            bitstring.BitStream(response[9:])
+        )
+        assert decoded.brokers.val[0].host == kafka.datatypes.CompactString("localhost")
+        assert decoded.brokers.val[0].port == kafka.datatypes.Int32(19092)
+        assert decoded.cluster_id == kafka.datatypes.CompactNullableString("cluster")
+        assert proxy.stats.rewritten_responses == 1
+
+    asyncio.run(with_proxy(test, lambda host, port: ("localhost", port + 10000)))
+
+
+def test_coordinator_address_is_rewritten():
+    async def test(proxy, port):
+        response = await roundtrip(port, 10, 3, 43)
+
+        assert response[:5] == struct.pack(">i", 43) + b'\x00'
+        (decoded, _) = kafka.dataclass_binding.dataclass_buffer_deserializer(
+            kafka.messages.FindCoordinatorV3ApiResponse
+        )(response, 5)
+        assert (decoded.node_id.val, decoded.host.val, decoded.port.val) == (1, "localhost", 19092)
+        assert proxy.stats.rewritten_responses == 1
+
+    asyncio.run(with_proxy(test, lambda host, port: ("localhost", port + 10000)))
+
+
+# Produce => header v1 (v2 from v9, with an empty TAG_BUFFER) with a null client id, null transactional_id from v3,
+# acks, timeout_ms
+@pytest.mark.parametrize("api_version,acks", [(2, 0), (2, -1), (3, 0), (3, 1), (9, 0), (9, -1)])
+def test_produce_without_acks_is_not_awaited(api_version, acks):
+    async def test(proxy, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        frame = struct.pack(">hhih", 0, api_version, 1, -1)
+        if api_version >= 9:
+            frame += b'\x00' + b'\x00'
+        elif api_version >= 3:
+            frame += struct.pack(">h", -1)
+        frame += struct.pack(">hi", acks, 30000)
+        writer.write(struct.pack(">i", len(frame)) + frame)
+        await writer.drain()
+        while proxy.stats.responses == 0:
+            await asyncio.sleep(0.01)
+        writer.close()
+
+        assert proxy.stats.dropped_responses == (1 if acks == 0 else 0)
+
+    asyncio.run(with_proxy(test))
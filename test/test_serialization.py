@@ -62,3 +62,57 @@ def test_compact_string_serialization():
 
     assert len(serialized) == 3
     assert serialized == b'\x03Hi'
+
+
+@pytest.mark.parametrize("val", [0, 1, 127, 128, 16383, 16384, 2097151, 2097152, 268435455, 268435456, 0xFFFFFFFF])
+def test_unsigned_varint_size(val):
+    stream = bitstring.BitStream()
+    kafka.serialization.write_unsigned_varint(val, stream)
+
+    assert kafka.serialization.unsigned_varint_size(val) == len(stream.tobytes())
+
+
+@pytest.mark.parametrize("val", [0, 1, 127, 128, 300, 16384, 2097152, 268435456, 0x7FFFFFFF, 0xFFFFFFFF])
+def test_unsigned_varint_round_trip(val):
+    stream = bitstring.BitStream()
+    kafka.serialization.write_unsigned_varint(val, stream)
+    stream.append("uint:8=42")
+    stream.pos = 0
+
+    assert kafka.serialization.read_unsigned_varint(stream) == val
+    assert kafka.serialization.read_uint_8(stream) == 42
+
+
+def test_unsigned_varint_too_long():
+    with pytest.raises(Exception):
+        kafka.serialization.read_unsigned_varint(bitstring.BitStream(b'\xFF\xFF\xFF\xFF\xFF\x01'))
+
+
+@pytest.mark.parametrize("val", [None, "", "Hi", "هلا"])
+def test_string_sizes(val):
+    stream = bitstring.BitStream()
+    kafka.serialization.write_nullable_string(val, stream)
+    assert kafka.serialization.nullable_string_size(val) == len(stream.tobytes())
+
+    stream = bitstring.BitStream()
+    kafka.serialization.write_compact_nullable_string(val, stream)
+    assert kafka.serialization.compact_nullable_string_size(val) == len(stream.tobytes())
+
+
+def test_tag_buffer_with_tagged_fields():
+    # 2 tagged fields: tag 0 with 2 bytes, tag 1 with 1 byte, followed by something else
+    stream = bitstring.BitStream(b'\x02\x00\x02\xAA\xBB\x01\x01\xCC\x7F')
+
+    assert kafka.serialization.read_tag_buffer(stream) == b'\x02\x00\x02\xAA\xBB\x01\x01\xCC'
+    assert kafka.serialization.read_uint_8(stream) == 0x7F
+
+
+def test_compact_nullable_string_null():
+    stream = bitstring.BitStream()
+    kafka.serialization.write_compact_nullable_string(None, stream)
+    kafka.serialization.write_compact_nullable_string("", stream)
+    stream.pos = 0
+
+    assert stream.tobytes() == b'\x00\x01'
+    assert kafka.serialization.read_compact_nullable_string(stream) is None
+    assert kafka.serialization.read_compact_nullable_string(stream) == ""
@@ -0,0 +1,127 @@
+import pytest
+
+import kafka.varint
+from kafka.varint import decode_record_run, encode_varint, encode_varlong
+
+INT_MAX = 2 ** 31 - 1
+INT_MIN = -2 ** 31
+LONG_MAX = 2 ** 63 - 1
+LONG_MIN = -2 ** 63
+
+
+# Cases & expected encodings after ByteUtilsTest in Kafka's source, at the boundaries between encoded sizes
+
+@pytest.mark.parametrize("val,encoded", [
+    (0, [0x00]),
+    (-1, [0xFF, 0xFF, 0xFF, 0xFF, 0x0F]),
+    (INT_MAX, [0xFF, 0xFF, 0xFF, 0xFF, 0x07]),
+    (INT_MIN, [0x80, 0x80, 0x80, 0x80, 0x08]),
+])
+def test_unsigned_varint(val, encoded):
+    assert kafka.varint.encode_unsigned_varint(val) == bytes(encoded)
+    assert kafka.varint.read_unsigned_varint(bytes(encoded), 0) == (val & 0xFFFFFFFF, len(encoded))
+
+
+@pytest.mark.parametrize("val,encoded", [
+    (0, [0x00]),
+    (-1, [0x01]),
+    (1, [0x02]),
+    (63, [0x7E]),
+    (-64, [0x7F]),
+    (64, [0x80, 0x01]),
+    (-65, [0x81, 0x01]),
+    (8191, [0xFE, 0x7F]),
+    (-8192, [0xFF, 0x7F]),
+    (8192, [0x80, 0x80, 0x01]),
+    (-8193, [0x81, 0x80, 0x01]),
+    (1048575, [0xFE, 0xFF, 0x7F]),
+    (-1048576, [0xFF, 0xFF, 0x7F]),
+    (1048576, [0x80, 0x80, 0x80, 0x01]),
+    (-1048577, [0x81, 0x80, 0x80, 0x01]),
+    (134217727, [0xFE, 0xFF, 0xFF, 0x7F]),
+    (-134217728, [0xFF, 0xFF, 0xFF, 0x7F]),
+    (134217728, [0x80, 0x80, 0x80, 0x80, 0x01]),
+    (-134217729, [0x81, 0x80, 0x80, 0x80, 0x01]),
+    (INT_MAX, [0xFE, 0xFF, 0xFF, 0xFF, 0x0F]),
+    (INT_MIN, [0xFF, 0xFF, 0xFF, 0xFF, 0x0F]),
+])
+def test_varint(val, encoded):
+    assert encode_varint(val) == bytes(encoded)
+    assert kafka.varint.read_varint(b'\x00' + bytes(encoded), 1) == (val, len(encoded) + 1)
+
+
+@pytest.mark.parametrize("val,encoded", [
+    (0, [0x00]),
+    (-1, [0x01]),
+    (1, [0x02]),
+    (63, [0x7E]),
+    (-64, [0x7F]),
+    (64, [0x80, 0x01]),
+    (-65, [0x81, 0x01]),
+    (2199023255551, [0xFE, 0xFF, 0xFF, 0xFF, 0xFF, 0x7F]),
+    (-2199023255552, [0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0x7F]),
+    (2199023255552, [0x80, 0x80, 0x80, 0x80, 0x80, 0x80, 0x01]),
+    (-2199023255553, [0x81, 0x80, 0x80, 0x80, 0x80, 0x80, 0x01]),
+    (LONG_MAX, [0xFE, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0x01]),
+    (LONG_MIN, [0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0x01]),
+])
+def test_varlong(val, encoded):
+    assert encode_varlong(val) == bytes(encoded)
+    assert kafka.varint.read_varlong(memoryview(bytes(encoded)), 0) == (val, len(encoded))
+
+
+def test_invalid_varint():
+    with pytest.raises(Exception, match="Varint is too long"):
+        kafka.varint.read_varint(bytes([0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0x01]), 0)
+
+
+def test_invalid_varlong():
+    with pytest.raises(Exception, match="Varlong is too long"):
+        kafka.varint.read_varlong(bytes([0xFF] * 10 + [0x01]), 0)
+
+
+def mk_record(timestamp_delta: int,
+              offset_delta: int,
+              key: None | bytes,
+              value: None | bytes,
+              headers: list[tuple[str, None | bytes]] = ()) -> bytes:
+    body = b'\x00' + encode_varlong(timestamp_delta) + encode_varint(offset_delta)
+    for data in (key, value):
+        body += encode_varint(-1) if data is None else encode_varint(len(data)) + data
+    body += encode_varint(len(headers))
+    for header_key, header_value in headers:
+        body += encode_varint(len(header_key)) + header_key.encode()
+        body += encode_varint(-1) if header_value is None else encode_varint(len(header_value)) + header_value
+    return encode_varint(len(body)) + body
+
+
+def test_decode_record_run():
+    records = [
+        mk_record(0, 0, None, b'v'),
+        mk_record(10_000_000_000, 1, b'k' * 300, b'x' * 70, [("h", b'1'), ("nil", None)]),
+        mk_record(-5, 70_000, b'', None),
+    ]
+    buf = b'\xAA\xBB' + b''.join(records) + b'\xCC'
+
+    run = decode_record_run(buf, 3, 2)
+
+    assert len(run) == 3
+    assert list(run.record_offsets) == [2, 2 + len(records[0]), 2 + len(records[0]) + len(records[1])]
+    assert run.end == len(buf) - 1
+    assert list(run.timestamp_deltas) == [0, 10_000_000_000, -5]
+    assert list(run.offset_deltas) == [0, 1, 70_000]
+    assert [run.key(i) for i in range(3)] == [None, b'k' * 300, b'']
+    assert [run.value(i) for i in range(3)] == [b'v', b'x' * 70, None]
+    assert list(run.header_counts) == [0, 2, 0]
+    assert run.headers(1) == [("h", b'1'), ("nil", None)]
+    assert run.headers(0) == []
+
+
+def test_decode_record_run_invalid_size():
+    record = bytearray(mk_record(0, 0, b'k', b'v'))
+    record[0] += 2  # claims 1 more byte than the record holds
+
+    with pytest.raises(Exception, match="Invalid record size"):
+        decode_record_run(bytes(record) + b'\x00\x00', 1)
+    with pytest.raises(Exception, match="Invalid record size"):
+        decode_record_run(bytes(record), 1)  # past the end of the buffer